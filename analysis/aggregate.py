@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""analysis.aggregate
+
+One-pass, mergeable aggregates over pipeline results.
+
+``AggregateAccumulator`` is updated as each result is produced.  For every
+metric it keeps a count, exact sums of the values and their squares (for
+mean and variance), min/max and a t-digest sketch for approximate
+quantiles.  It also keeps per-genre totals taken from the preference
+profile's genre distribution.
+
+The full state serialises to JSON (``to_state``/``from_state``).  Shards of
+a corpus can be aggregated separately and their states combined with
+``merge``.  Everything except the quantiles merges exactly: the result is the
+same bits as one pass over all rows.
+
+    python -m analysis.aggregate shard1.state.json shard2.state.json -o agg.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+from fractions import Fraction
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+STATE_VERSION = 1
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+class ExactSum:
+    """Running float sum kept as exact non-overlapping partials (Shewchuk).
+
+    The value is correctly rounded, so it is the same however the inputs are
+    ordered or split across merged shards.  Infinities and NaN are summed
+    separately and propagate as in a plain running sum.
+    """
+
+    __slots__ = ("partials", "special")
+
+    def __init__(self) -> None:
+        self.partials: List[float] = []
+        self.special = 0.0
+
+    def add(self, x: float) -> None:
+        if not math.isfinite(x):
+            self.special += x
+            return
+        partials = self.partials
+        i = 0
+        for y in partials:
+            if abs(x) < abs(y):
+                x, y = y, x
+            hi = x + y
+            lo = y - (hi - x)
+            if lo:
+                partials[i] = lo
+                i += 1
+            x = hi
+        partials[i:] = [x]
+
+    def merge(self, other: "ExactSum") -> None:
+        for x in other.partials:
+            self.add(x)
+        self.special += other.special
+
+    @property
+    def value(self) -> float:
+        return math.fsum(self.partials) + self.special
+
+    def to_state(self) -> List[Any]:
+        return [list(self.partials), self.special]
+
+    @classmethod
+    def from_state(cls, state: Sequence[Any]) -> "ExactSum":
+        total = cls()
+        partials, special = state
+        for x in partials:
+            total.add(float(x))
+        total.special = float(special)
+        return total
+
+
+class TDigest:
+    """A merging t-digest (Dunning & Ertl) with the ``k1`` scale function."""
+
+    def __init__(self, compression: float = 100.0):
+        self.compression = float(compression)
+        self.means: List[float] = []
+        self.weights: List[float] = []
+        self._pending: List[Tuple[float, float]] = []
+        self._pending_limit = max(64, int(5 * self.compression))
+
+    def add(self, value: float, weight: float = 1.0) -> None:
+        self._pending.append((value, weight))
+        if len(self._pending) >= self._pending_limit:
+            self._compress()
+
+    def merge(self, other: "TDigest") -> None:
+        other._compress()
+        self._pending.extend(zip(other.means, other.weights))
+        self._compress()
+
+    def _compress(self) -> None:
+        if not self._pending:
+            return
+        items = sorted(list(zip(self.means, self.weights)) + self._pending)
+        self._pending = []
+        total = sum(w for _, w in items)
+        scale = self.compression / (2.0 * math.pi)
+
+        def q_limit(done: float) -> float:
+            k = scale * math.asin(2.0 * min(1.0, done / total) - 1.0) + 1.0
+            return total * (math.sin(min(k / scale, math.pi / 2)) + 1.0) / 2.0
+
+        means: List[float] = []
+        weights: List[float] = []
+        cur_mean, cur_weight = items[0]
+        done = 0.0
+        limit = q_limit(done)
+        for mean, weight in items[1:]:
+            if done + cur_weight + weight <= limit:
+                cur_weight += weight
+                cur_mean += (mean - cur_mean) * weight / cur_weight
+            else:
+                means.append(cur_mean)
+                weights.append(cur_weight)
+                done += cur_weight
+                limit = q_limit(done)
+                cur_mean, cur_weight = mean, weight
+        means.append(cur_mean)
+        weights.append(cur_weight)
+        self.means, self.weights = means, weights
+
+    def quantile(self, q: float, lo: float, hi: float) -> float:
+        """Estimate the ``q`` quantile; ``lo``/``hi`` are the exact min/max."""
+        self._compress()
+        if not self.means:
+            return math.nan
+        total = sum(self.weights)
+        target = q * total
+        cumulative = 0.0
+        prev_centre, prev_mean = 0.0, lo
+        for mean, weight in zip(self.means, self.weights):
+            centre = cumulative + weight / 2.0
+            if target < centre:
+                if centre == prev_centre:
+                    return mean
+                frac = (target - prev_centre) / (centre - prev_centre)
+                return prev_mean + frac * (mean - prev_mean)
+            cumulative += weight
+            prev_centre, prev_mean = centre, mean
+        if total == prev_centre:
+            return hi
+        frac = (target - prev_centre) / (total - prev_centre)
+        return prev_mean + frac * (hi - prev_mean)
+
+    def to_state(self) -> Dict[str, Any]:
+        self._compress()
+        return {"compression": self.compression, "centroids": [[m, w] for m, w in zip(self.means, self.weights)]}
+
+    @classmethod
+    def from_state(cls, state: Mapping[str, Any]) -> "TDigest":
+        digest = cls(state.get("compression", 100.0))
+        for mean, weight in state.get("centroids", []):
+            digest.means.append(float(mean))
+            digest.weights.append(float(weight))
+        return digest
+
+
+_SPLIT = 134217729.0  # 2**27 + 1, Veltkamp splitting constant
+
+
+def _square_parts(x: float) -> Tuple[float, float]:
+    """``x*x`` as a rounded product plus its exact rounding error (Dekker)."""
+    c = _SPLIT * x
+    hi = c - (c - x)
+    lo = x - hi
+    p = x * x
+    return p, ((hi * hi - p) + 2.0 * hi * lo) + lo * lo
+
+
+def _exact(total: ExactSum) -> Fraction:
+    return sum((Fraction(x) for x in total.partials), Fraction(0))
+
+
+class RunningStats:
+    """Count, exact sums, variance, min/max and a quantile sketch.
+
+    ``total`` sums every value and backs the aggregate's ``mean_*`` keys.
+    Non-finite values are counted in ``nonfinite`` and left out of the
+    moments, extremes and sketch.  The variance comes from exact sums of the
+    values and their squares, so every field but the quantiles is identical
+    however the rows were sharded.
+    """
+
+    __slots__ = ("count", "total", "squares", "n", "min", "max", "nonfinite", "digest")
+
+    def __init__(self, compression: float = 100.0):
+        self.count = 0
+        self.total = ExactSum()
+        self.squares = ExactSum()
+        self.n = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.nonfinite = 0
+        self.digest = TDigest(compression)
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total.add(value)
+        if not math.isfinite(value):
+            self.nonfinite += 1
+            return
+        self.n += 1
+        square, error = _square_parts(value)
+        self.squares.add(square)
+        if error:
+            self.squares.add(error)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.digest.add(value)
+
+    def merge(self, other: "RunningStats") -> None:
+        self.count += other.count
+        self.total.merge(other.total)
+        self.squares.merge(other.squares)
+        self.nonfinite += other.nonfinite
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.digest.merge(other.digest)
+
+    def summary(self) -> Dict[str, Any]:
+        if not self.n:
+            return {"count": 0, "nonfinite": self.nonfinite}
+        n = self.n
+        finite_sum = _exact(self.total)
+        variance = float((_exact(self.squares) - finite_sum * finite_sum / n) / (n - 1)) if n > 1 else 0.0
+        return {
+            "count": n,
+            "nonfinite": self.nonfinite,
+            "mean": float(finite_sum / n),
+            "variance": variance,
+            "stddev": math.sqrt(variance),
+            "min": self.min,
+            "max": self.max,
+            "quantiles": {
+                f"p{round(q * 100):02d}": self.digest.quantile(q, self.min, self.max) for q in QUANTILES
+            },
+        }
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total": self.total.to_state(),
+            "squares": self.squares.to_state(),
+            "n": self.n,
+            "min": self.min if self.n else None,
+            "max": self.max if self.n else None,
+            "nonfinite": self.nonfinite,
+            "digest": self.digest.to_state(),
+        }
+
+    @classmethod
+    def from_state(cls, state: Mapping[str, Any]) -> "RunningStats":
+        stats = cls()
+        stats.count = int(state["count"])
+        stats.total = ExactSum.from_state(state["total"])
+        stats.squares = ExactSum.from_state(state["squares"])
+        stats.n = int(state["n"])
+        stats.min = math.inf if state.get("min") is None else float(state["min"])
+        stats.max = -math.inf if state.get("max") is None else float(state["max"])
+        stats.nonfinite = int(state.get("nonfinite", 0))
+        stats.digest = TDigest.from_state(state.get("digest", {}))
+        return stats
+
+
+METRICS = ("psych", "music", "music_energy", "tension", "expression")
+
+
+def _metric_values(r: Any) -> Tuple[float, ...]:
+    score = r.score
+    return (
+        score.psych,
+        score.music,
+        score.preference_profile.get("music_energy", 0.0),
+        score.correlations.get("tension", 0.0),
+        score.correlations.get("expression", 0.0),
+    )
+
+
+class AggregateAccumulator:
+    """Running aggregates for the aggregate JSON, updated one result at a time."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.stats: Dict[str, RunningStats] = {key: RunningStats() for key in METRICS}
+        # genre -> rows mentioning it / summed genre_distribution share
+        self.genre_rows: Dict[str, int] = {}
+        self.genre_share: Dict[str, ExactSum] = {}
+
+    def add(self, r: Any) -> None:
+        self.count += 1
+        for stats, value in zip(self.stats.values(), _metric_values(r)):
+            stats.add(value)
+        distribution = r.score.preference_profile.get("genre_distribution") or {}
+        for genre, share in distribution.items():
+            total = self.genre_share.get(genre)
+            if total is None:
+                total = self.genre_share[genre] = ExactSum()
+                self.genre_rows[genre] = 0
+            self.genre_rows[genre] += 1
+            total.add(share)
+
+    def merge(self, other: "AggregateAccumulator") -> "AggregateAccumulator":
+        self.count += other.count
+        for key, stats in self.stats.items():
+            stats.merge(other.stats[key])
+        for genre, rows in other.genre_rows.items():
+            self.genre_rows[genre] = self.genre_rows.get(genre, 0) + rows
+            self.genre_share.setdefault(genre, ExactSum()).merge(other.genre_share[genre])
+        return self
+
+    def as_dict(self) -> Dict[str, Any]:
+        if not self.count:
+            return {"count": 0}
+        agg: Dict[str, Any] = {"count": self.count}
+        for key, stats in self.stats.items():
+            agg[f"mean_{key}"] = stats.total.value / self.count
+        agg["stats"] = {key: stats.summary() for key, stats in self.stats.items()}
+        shares = {genre: total.value for genre, total in self.genre_share.items()}
+        agg["genres"] = {
+            genre: {"rows": self.genre_rows[genre], "share": share, "mean_share": share / self.count}
+            for genre, share in sorted(shares.items(), key=lambda item: (-item[1], item[0]))
+        }
+        return agg
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "version": STATE_VERSION,
+            "count": self.count,
+            "metrics": {key: stats.to_state() for key, stats in self.stats.items()},
+            "genres": {
+                genre: [rows, self.genre_share[genre].to_state()] for genre, rows in self.genre_rows.items()
+            },
+        }
+
+    @classmethod
+    def from_state(cls, state: Mapping[str, Any]) -> "AggregateAccumulator":
+        if state.get("version") != STATE_VERSION:
+            raise ValueError(f"unsupported aggregate state version: {state.get('version')!r}")
+        acc = cls()
+        acc.count = int(state["count"])
+        for key in METRICS:
+            acc.stats[key] = RunningStats.from_state(state["metrics"][key])
+        for genre, (rows, share) in state.get("genres", {}).items():
+            acc.genre_rows[genre] = int(rows)
+            acc.genre_share[genre] = ExactSum.from_state(share)
+        return acc
+
+    def write(self, path: str, state_path: Optional[str] = None) -> None:
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(self.as_dict(), fh, ensure_ascii=False, indent=2)
+        if state_path:
+            self.write_state(state_path)
+
+    def write_state(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(self.to_state(), fh, ensure_ascii=False)
+
+    @classmethod
+    def read_state(cls, path: str) -> "AggregateAccumulator":
+        with open(path, "r", encoding="utf-8") as fh:
+            return cls.from_state(json.load(fh))
+
+
+def merge_states(paths: Iterable[str]) -> AggregateAccumulator:
+    """Merge serialised accumulator states into one accumulator."""
+    acc = AggregateAccumulator()
+    for path in paths:
+        acc.merge(AggregateAccumulator.read_state(path))
+    return acc
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    p = argparse.ArgumentParser(description="Merge aggregate states written with --aggregate-state")
+    p.add_argument("states", nargs="+", help="State JSON files")
+    p.add_argument("-o", "--output", required=True, help="Aggregate JSON to write")
+    p.add_argument("--state", help="Also write the merged state here")
+    args = p.parse_args(argv)
+    merge_states(args.states).write(args.output, state_path=args.state)
+
+
+if __name__ == "__main__":
+    main()
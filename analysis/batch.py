@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""analysis.batch
+
+The profile and correlation stages over a whole frame, as NumPy arrays.
+
+:func:`profile_batch` computes, for every row of a batch, what
+``derive_preference_profile``, ``derive_personality_profile``,
+``feedback_adjust_preference`` and ``build_correlation_matrix`` in
+:mod:`analysis.pipeline` compute for one row.  Those per-row functions stay
+the reference implementation, and :meth:`analysis.pipeline.Pipeline.process_row`
+still uses them.
+
+The scalar inputs (lengths, scores, counts) become one array per column.
+The genre weights and scenario vectors become :class:`SparseRows`, CSR
+matrices over a genre and a scenario vocabulary shared by the batch.  Each
+row keeps its entries in the order of the per-row dicts, because the
+periodicity and synchronicity weigh entries by position.
+
+Row sums use ``np.bincount``, which adds in entry order, like ``sum()`` over
+the dict values; ``min``/``max`` keep Python's NaN behaviour.  On Python
+3.11 the results are therefore equal to the per-row functions, bit for bit.
+On 3.12+, where ``sum()`` of floats is compensated, they agree to
+floating-point tolerance.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analysis.lut import table_signatures
+from analysis.msd import MsdMatchBatch
+
+
+class _Labels(Dict[str, int]):
+    """Label -> id; unseen labels get the next id on lookup."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.names: List[str] = []
+
+    def __missing__(self, label: str) -> int:
+        lid = self[label] = len(self.names)
+        self.names.append(label)
+        return lid
+
+
+class SparseRows:
+    """Rows of ``{label: value}`` as a CSR matrix over a shared label vocabulary.
+
+    ``indices[indptr[i]:indptr[i + 1]]`` are ids into ``labels`` for the
+    entries of row ``i``, in the row's own order, and ``data`` their values.
+    """
+
+    __slots__ = ("labels", "indptr", "indices", "data", "_rows")
+
+    def __init__(self, labels: List[str], indptr: np.ndarray, indices: np.ndarray, data: np.ndarray):
+        self.labels = labels
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self._rows: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_dicts(cls, rows: Sequence[Mapping[str, float]]) -> "SparseRows":
+        ids = _Labels()
+        indices: List[int] = []
+        data: List[float] = []
+        lengths = np.zeros(len(rows), dtype=np.int64)
+        for i, row in enumerate(rows):
+            indices.extend(map(ids.__getitem__, row))
+            data.extend(row.values())
+            lengths[i] = len(row)
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        return cls(ids.names, indptr, np.array(indices, dtype=np.int64), np.array(data, dtype=np.float64))
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    @property
+    def rows(self) -> np.ndarray:
+        """The row of each entry."""
+        if self._rows is None:
+            self._rows = np.repeat(np.arange(len(self)), np.diff(self.indptr))
+        return self._rows
+
+    def positions(self) -> np.ndarray:
+        """Each entry's position within its row."""
+        return np.arange(len(self.data)) - self.indptr[self.rows]
+
+    def row_sums(self, data: Optional[np.ndarray] = None) -> np.ndarray:
+        """Per-row sums of ``data`` (default: the values), added in entry order."""
+        return np.bincount(self.rows, weights=self.data if data is None else data, minlength=len(self))
+
+    def normalised(self, data: Optional[np.ndarray] = None) -> np.ndarray:
+        """``data`` divided by its row sums (rows summing to zero are left as they are)."""
+        data = self.data if data is None else data
+        totals = self.row_sums(data)
+        return data / np.where(totals == 0, 1.0, totals)[self.rows]
+
+    def with_data(self, data: np.ndarray) -> "SparseRows":
+        out = SparseRows(self.labels, self.indptr, self.indices, data)
+        out._rows = self._rows
+        return out
+
+    def to_dicts(self) -> List[Dict[str, float]]:
+        labels = self.labels
+        keys = [labels[i] for i in self.indices.tolist()]
+        values = self.data.tolist()
+        bounds = self.indptr.tolist()
+        return [dict(zip(keys[s:e], values[s:e])) for s, e in zip(bounds[:-1], bounds[1:])]
+
+
+def _tag_text(tag: Any) -> str:
+    return str(tag or "").lower()
+
+
+def _entries(
+    matches: Sequence[Mapping[str, Any]], labels: _Labels
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[Any]]:
+    """The genre entries of ``matches``, read as ``derive_preference_profile`` reads them.
+
+    Returns which matches have a tag, and their genre ids, weights and tokens.
+    """
+    raw = [m.get("tag") for m in matches]
+    kept = matches
+    if not all(raw):
+        present = [bool(_tag_text(tag)) for tag in raw]
+        has_tag = np.array(present, dtype=bool)
+        kept = [m for m, ok in zip(matches, present) if ok]
+        raw = [tag for tag, ok in zip(raw, present) if ok]
+    else:
+        has_tag = np.ones(len(raw), dtype=bool)
+    # lower-case each distinct tag once
+    genre_ids: Dict[Any, int] = {}
+    for tag in dict.fromkeys(raw):
+        genre_ids[tag] = labels[_tag_text(tag)]
+    genres = np.fromiter(map(genre_ids.__getitem__, raw), dtype=np.int64, count=len(raw))
+    weights = np.fromiter(map(float, [m.get("weight", 1.0) for m in kept]), dtype=np.float64, count=len(kept))
+    return has_tag, genres, weights, [m.get("token", "") for m in kept]
+
+
+def _genre_entries(
+    matches: Sequence[Sequence[Mapping[str, Any]]], labels: _Labels
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[Any]]:
+    """Every row's genre entries, in match order: rows, genre ids, weights, tokens."""
+    if isinstance(matches, MsdMatchBatch):
+        return _batch_genre_entries(matches, labels)
+    counts = np.fromiter(map(len, matches), dtype=np.int64, count=len(matches))
+    has_tag, genres, weights, tokens = _entries([m for row in matches for m in row], labels)
+    return np.repeat(np.arange(len(matches)), counts)[has_tag], genres, weights, tokens
+
+
+def _batch_genre_entries(
+    batch: MsdMatchBatch, labels: _Labels
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[Any]]:
+    # the entries of each matched token once, then gathered for the rows that have it
+    codes = np.unique(batch.row_tokens)
+    per_code = [batch.token_matches(code) for code in codes.tolist()]
+    lengths = np.fromiter(map(len, per_code), dtype=np.int64, count=len(per_code))
+    has_tag, genres, weights, tokens = _entries([m for ms in per_code for m in ms], labels)
+    code_ptr = np.zeros(len(batch.tokens) + 1, dtype=np.int64)
+    code_ptr[codes + 1] = np.bincount(np.repeat(np.arange(len(codes)), lengths)[has_tag], minlength=len(codes))
+    np.cumsum(code_ptr, out=code_ptr)
+    starts = code_ptr[batch.row_tokens]
+    counts = code_ptr[batch.row_tokens + 1] - starts
+    ends = np.cumsum(counts)
+    take = np.arange(int(ends[-1]) if len(ends) else 0) - np.repeat(ends - counts - starts, counts)
+    rows = np.repeat(np.repeat(np.arange(len(batch)), np.diff(batch.row_ptr)), counts)
+    return rows, genres[take], weights[take], [tokens[t] for t in take.tolist()]
+
+
+def genre_weights(
+    matches: Sequence[Sequence[Mapping[str, Any]]],
+    scenario_vectors: Sequence[Mapping[str, float]],
+) -> SparseRows:
+    """Each row's summed genre weights, genres in order of first match.
+
+    A match's weight counts 1.5 times when its token is one of the row's
+    scenario keys, as in ``derive_preference_profile``.
+    """
+    n = len(scenario_vectors)
+    labels = _Labels()
+    rows, genres, weights, tokens = _genre_entries(matches, labels)
+    keys = set().union(*scenario_vectors)
+    if len(rows) and keys:
+        candidates = np.flatnonzero(np.fromiter(map(keys.__contains__, tokens), dtype=bool, count=len(tokens)))
+        tied = [j for j in candidates.tolist() if tokens[j] in scenario_vectors[rows[j]]]
+        if tied:
+            weights[tied] *= 1.5
+    # one group per (row, genre), numbered in order of first appearance
+    width = max(1, len(labels.names))
+    groups, uniques = pd.factorize(rows * width + genres)
+    uniques = np.asarray(uniques, dtype=np.int64)
+    data = np.bincount(groups, weights=weights, minlength=len(uniques))
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(uniques // width, minlength=n), out=indptr[1:])
+    return SparseRows(labels.names, indptr, uniques % width, data)
+
+
+def _vocabulary_sizes(features: Sequence[Any]) -> np.ndarray:
+    sizes = []
+    for f in features:
+        ids = getattr(f, "token_ids", None)
+        sizes.append(len(set(f.words if ids is None else ids)))
+    return np.array(sizes, dtype=np.int64)
+
+
+def _at_most(limit: float, values: np.ndarray) -> np.ndarray:
+    # min(limit, x): NaN compares false, so min() keeps the limit
+    return np.where(values < limit, values, limit)
+
+
+def _at_least(limit: float, values: np.ndarray) -> np.ndarray:
+    return np.where(values > limit, values, limit)
+
+
+class ProfileBatch:
+    """The profiles of a batch of rows; see :func:`profile_batch`.
+
+    The per-row results are built as dicts on request:
+    :meth:`preference_profiles` (after the personality feedback),
+    :meth:`personality_profiles` and :meth:`correlations`.
+    """
+
+    def __init__(
+        self,
+        features: Sequence[Any],
+        scores: Sequence[Any],
+        scenario_vectors: Sequence[Mapping[str, float]],
+        matches: Sequence[Sequence[Mapping[str, Any]]],
+    ):
+        n = len(features)
+        num_chars = np.fromiter((f.num_chars for f in features), dtype=np.int64, count=n)
+        self.num_words = np.fromiter((f.num_words for f in features), dtype=np.int64, count=n)
+        self.avg_word_len = np.fromiter((f.avg_word_len or 0.0 for f in features), dtype=np.float64, count=n)
+        psych = np.fromiter((s.psych for s in scores), dtype=np.float64, count=n)
+        music = np.fromiter((s.music for s in scores), dtype=np.float64, count=n)
+        self.music_energy = np.where(np.isfinite(music), music, 0.0) + 0.0  # no -0.0, like ``music or 0.0``
+        self.lexical_density = np.divide(
+            self.num_words, num_chars, out=np.zeros(n, dtype=np.float64), where=num_chars != 0
+        )
+        self.vocabulary_size = _vocabulary_sizes(features)
+        if isinstance(matches, MsdMatchBatch):
+            self.match_count = matches.match_counts()
+        else:
+            self.match_count = np.fromiter(map(len, matches), dtype=np.int64, count=n)
+
+        # personality
+        self.openness = _at_most(1.0, self.vocabulary_size / 200.0 + self.lexical_density)
+        self.conscientiousness = _at_most(1.0, self.num_words / 500.0)
+        self.extraversion = _at_most(1.0, self.music_energy / 10.0 + self.avg_word_len / 10.0)
+        self.agreeableness = _at_most(1.0, psych / 10.0 + self.lexical_density)
+        self.neuroticism = _at_least(0.0, 1.0 - self.agreeableness)
+
+        # preference, with the personality feedback
+        genres = genre_weights(matches, scenario_vectors)
+        distribution = genres.normalised()
+        distribution *= (1.0 + self.openness * 0.2)[genres.rows]
+        self.genres = genres.with_data(genres.normalised(distribution))
+        scenarios = SparseRows.from_dicts(scenario_vectors)
+        emphasis = scenarios.normalised()
+        emphasis *= (1.0 + self.agreeableness * 0.1)[scenarios.rows]
+        self.scenarios = scenarios.with_data(scenarios.normalised(emphasis))
+
+    def __len__(self) -> int:
+        return len(self.num_words)
+
+    def preference_profiles(self) -> List[Dict[str, Any]]:
+        columns = zip(
+            self.scenarios.to_dicts(),
+            self.genres.to_dicts(),
+            self.music_energy.tolist(),
+            self.lexical_density.tolist(),
+            self.vocabulary_size.tolist(),
+            self.match_count.tolist(),
+        )
+        return [
+            {
+                "scenario_vector": scenario_vector,
+                "genre_distribution": genre_distribution,
+                "music_energy": music_energy,
+                "lexical_density": lexical_density,
+                "vocabulary_size": vocabulary_size,
+                "msd_match_count": match_count,
+            }
+            for scenario_vector, genre_distribution, music_energy, lexical_density, vocabulary_size, match_count
+            in columns
+        ]
+
+    def personality_profiles(self) -> List[Dict[str, Any]]:
+        names = ("openness", "conscientiousness", "extraversion", "agreeableness", "neuroticism", "avg_word_len")
+        columns = [getattr(self, name).tolist() for name in names]
+        return [dict(zip(names, values)) for values in zip(*columns)]
+
+    def correlations(self, tables: Sequence[Any]) -> List[Dict[str, Any]]:
+        genres, scenarios = self.genres, self.scenarios
+        periodicity = genres.row_sums(genres.data * (genres.positions() + 1))
+        synchronicity = scenarios.row_sums((scenarios.positions() + 1) * scenarios.data)
+        tension = _at_least(0.0, self.neuroticism - self.agreeableness)
+        expression = self.openness + self.agreeableness
+        signatures = table_signatures(tables)
+        extra = {f"table_{idx}_signature": signature for idx, signature in enumerate(signatures)}
+        tables_loaded = len(tables)
+        out = []
+        for p, has_genres, s, has_scenarios, t, e in zip(
+            periodicity.tolist(), np.diff(genres.indptr).tolist(),
+            synchronicity.tolist(), np.diff(scenarios.indptr).tolist(),
+            tension.tolist(), expression.tolist(),
+        ):
+            correlations = {
+                # sum() of nothing is the int 0
+                "periodicity": p if has_genres else 0,
+                "synchronicity": s if has_scenarios else 0,
+                "tension": t,
+                "expression": e,
+                "tables_loaded": tables_loaded,
+            }
+            correlations.update(extra)
+            out.append(correlations)
+        return out
+
+
+def profile_batch(
+    features: Sequence[Any],
+    scores: Sequence[Any],
+    scenario_vectors: Sequence[Mapping[str, float]],
+    matches: Sequence[Sequence[Mapping[str, Any]]],
+) -> ProfileBatch:
+    """Profile every row of a batch at once.
+
+    The arguments are per-row sequences, as for the per-row functions:
+    feature records, score records, scenario vectors and MSD match lists
+    (or an :class:`~analysis.msd.MsdMatchBatch`).
+    """
+    return ProfileBatch(features, scores, scenario_vectors, matches)
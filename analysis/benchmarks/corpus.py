@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""analysis.benchmarks.corpus
+
+Deterministic synthetic inputs for the benchmarks: a survey CSV, a mapping
+YAML, ``.cls`` and CSV MSD sources and JSON/CSV LUT files.  The same
+``seed`` and sizes always produce byte-identical files.
+
+Survey texts mix mapping keywords (single words and phrases) with common
+words.  A few MSD titles are such words, and most survey artists and songs
+exist in the MSD CSV, so keyword scoring, lyric fallback lookups and
+artist/song lookups all get hits.
+
+    python -m analysis.benchmarks.corpus --out /tmp/corpus --rows 100000 --msd-rows 500000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+from typing import Dict, List, NamedTuple
+
+TAGS = ["Rock", "Pop", "Electronic", "Jazz", "Rap", "Country", "Blues", "Latin", "Reggae", "Folk"]
+
+CATEGORIES: Dict[str, Dict[str, float]] = {
+    "psych": {"happy": 1.0, "anxious": 2.0, "sad": 1.5, "lonely": 1.0, "calm": 0.5, "restless": 1.5},
+    "music": {"bass": 1.0, "rhythm": 0.5, "piano": 1.0, "dance": 2.0, "guitar": 1.0, "drum solo": 2.0},
+    "emotion": {"love": 1.0, "anger": 1.5, "joy": 1.0, "heart break": 2.0},
+}
+FILLER = (
+    "the a and of to in it is was for on with as at by this that from they we you "
+    "night day city road home friends morning summer winter light dark time life "
+    "feel think know want need play listen hear sing song music album track band"
+).split()
+
+
+class CorpusPaths(NamedTuple):
+    survey: str
+    mapping: str
+    msd_cls: str
+    msd_csv: str
+    lut_json: str
+    lut_csv: str
+
+
+def _artists(count: int) -> List[str]:
+    return [f"Artist {i}" for i in range(max(1, count))]
+
+
+def write_survey(path: str, rows: int, msd_rows: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    artists = _artists(msd_rows // 20)
+    keywords = [kw for cat in CATEGORIES.values() for kw in cat]
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write("respondent,text,artist,song,Q5_party,Q5_study\n")
+        for i in range(rows):
+            words = []
+            for _ in range(rng.randint(5, 80)):
+                roll = rng.random()
+                if roll < 0.15:
+                    words.append(rng.choice(keywords))
+                else:
+                    words.append(rng.choice(FILLER))
+            artist = rng.choice(artists) if rng.random() < 0.8 else f"Unknown {i}"
+            song = f"Song {rng.randrange(max(1, msd_rows))}" if rng.random() < 0.6 else f"Untitled {i}"
+            party = rng.randint(0, 3) if rng.random() < 0.9 else ""
+            study = rng.randint(0, 3) if rng.random() < 0.9 else ""
+            fh.write(f"{i},{' '.join(words)},{artist},{song},{party},{study}\n")
+
+
+def write_cls(path: str, rows: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write("# synthetic msd_tagtraum_cd2.cls\n")
+        for i in range(rows):
+            fh.write(f"TR{i:016X}\t{rng.choice(TAGS)}\n")
+
+
+def write_csv(path: str, rows: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    artists = _artists(rows // 20)
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write("track,artist,title,tag,weight\n")
+        for i in range(rows):
+            # a few one-word titles ("Home", "Night") that lyric words match
+            title = rng.choice(FILLER).title() if rng.random() < 0.02 else f"Song  {i}"
+            fh.write(f"TRC{i:015X},{rng.choice(artists)},{title},{rng.choice(TAGS)},{rng.random():.3f}\n")
+
+
+def write_luts(json_path: str, csv_path: str, rows: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    genres = [t.lower() for t in TAGS]
+    with open(json_path, "w", encoding="utf-8") as fh:
+        json.dump({"tension": {g: round(rng.random(), 3) for g in genres}}, fh)
+    with open(csv_path, "w", encoding="utf-8") as fh:
+        fh.write("genre,arousal,valence\n")
+        for i in range(rows):
+            fh.write(f"{genres[i % len(genres)]}{i // len(genres) or ''},{rng.random():.3f},{rng.random():.3f}\n")
+
+
+def write_mapping(path: str, msd_paths: List[str], lut_paths: List[str]) -> None:
+    lines = ["categories:"]
+    for cat, keywords in CATEGORIES.items():
+        lines.append(f"  {cat}:")
+        lines.extend(f"    {kw}: {weight}" for kw, weight in keywords.items())
+    lines += ["crossmap:", "  emotion: psych", "msd_paths:"]
+    lines.extend(f"  - {json.dumps(p)}" for p in msd_paths)
+    lines.append("lut_files:")
+    lines.extend(f"  - {json.dumps(p)}" for p in lut_paths)
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write("\n".join(lines) + "\n")
+
+
+def generate_corpus(out_dir: str, rows: int = 10_000, msd_rows: int = 100_000, lut_rows: int = 1_000,
+                    seed: int = 0) -> CorpusPaths:
+    """Write every corpus file into ``out_dir``; the mapping uses absolute paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    out_dir = os.path.abspath(out_dir)
+    paths = CorpusPaths(*(os.path.join(out_dir, name) for name in (
+        "survey.csv", "mapping.yaml", "msd.cls", "msd.csv", "lut.json", "lut.csv",
+    )))
+    write_survey(paths.survey, rows, msd_rows, seed)
+    write_cls(paths.msd_cls, msd_rows, seed + 1)
+    write_csv(paths.msd_csv, msd_rows, seed + 2)
+    write_luts(paths.lut_json, paths.lut_csv, lut_rows, seed + 3)
+    write_mapping(paths.mapping, [paths.msd_cls, paths.msd_csv], [paths.lut_json, paths.lut_csv])
+    return paths
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Generate a synthetic benchmark corpus")
+    p.add_argument("--out", required=True, help="Output directory")
+    p.add_argument("--rows", type=int, default=10_000, help="Survey rows")
+    p.add_argument("--msd-rows", type=int, default=100_000, help="Rows per MSD source")
+    p.add_argument("--lut-rows", type=int, default=1_000, help="Rows in the CSV LUT")
+    p.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = p.parse_args()
+    for path in generate_corpus(args.out, args.rows, args.msd_rows, args.lut_rows, args.seed):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""analysis.benchmarks.msd_ingest
+
+Throughput and memory benchmark for ``load_msd_index`` against the original
+row-wise, dict-of-payloads loader, on synthetic ``.cls`` and CSV sources.
+
+    python -m analysis.benchmarks.msd_ingest --rows 500000 --check
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import re
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Mapping, Sequence
+
+import pandas as pd
+
+from analysis.benchmarks.corpus import write_cls, write_csv
+from analysis.msd import load_msd_index
+
+
+def _legacy_normalise_token(value: Any) -> str:
+    if not value:
+        return ""
+    return re.sub(r"\s+", " ", value).strip().lower()
+
+
+def legacy_load_msd_index(paths: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+    """The ``iterrows``/per-line loader that ``load_msd_index`` replaced."""
+    index: Dict[str, Dict[str, Any]] = {}
+    for path in paths:
+        ext = os.path.splitext(path)[1].lower()
+        if ext in {".csv", ".tsv"}:
+            df = pd.read_csv(path, sep="," if ext == ".csv" else "\t")
+            for _, row in df.iterrows():
+                tokens = {
+                    _legacy_normalise_token(str(row.get("track", ""))),
+                    _legacy_normalise_token(str(row.get("artist", ""))),
+                    _legacy_normalise_token(str(row.get("title", ""))),
+                }
+                tokens.discard("")
+                if not tokens:
+                    continue
+                payload = {
+                    "tag": row.get("tag") or row.get("genre"),
+                    "weight": float(row.get("weight", 1.0)),
+                    "path": path,
+                    "raw": row.to_dict(),
+                }
+                for token in tokens:
+                    index.setdefault(token, {"matches": []})["matches"].append(payload)
+        else:
+            with open(path, "r", encoding="utf-8", errors="ignore") as fh:
+                for line in fh:
+                    line = line.strip()
+                    if not line or line.startswith("#"):
+                        continue
+                    parts = re.split(r"[\s,]+", line)
+                    if len(parts) < 2:
+                        continue
+                    track_id, tag = parts[0], parts[1]
+                    index.setdefault(_legacy_normalise_token(track_id), {"matches": []})["matches"].append({
+                        "tag": tag,
+                        "weight": 1.0,
+                        "path": path,
+                        "raw": {"track": track_id, "tag": tag},
+                    })
+    return index
+
+
+def _time(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _retained_mib(fn: Callable[[], Any]) -> float:
+    """Memory still allocated by ``fn``'s return value, in MiB."""
+    tracemalloc.start()
+    result = fn()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current / (1 << 20)
+
+
+def _same(a: Mapping[str, Any], b: Mapping[str, Any], sample: List[str]) -> bool:
+    if set(a) != set(b):
+        return False
+    for token in sample:
+        left = [(m["tag"], m["weight"], m["path"], m["raw"]) for m in a[token]["matches"]]
+        right = [(m["tag"], m["weight"], m["path"], m["raw"]) for m in b[token]["matches"]]
+        if left != right:
+            return False
+    return True
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Benchmark MSD index ingestion")
+    p.add_argument("--rows", type=int, default=200_000, help="Rows per synthetic source")
+    p.add_argument("--repeat", type=int, default=3, help="Best-of repetitions")
+    p.add_argument("--check", action="store_true", help="Verify both loaders build the same index")
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = {
+            "cls": os.path.join(tmp, "msd.cls"),
+            "csv": os.path.join(tmp, "msd.csv"),
+        }
+        write_cls(sources["cls"], args.rows)
+        write_csv(sources["csv"], args.rows)
+        print(
+            f"{'source':<8}{'legacy rows/s':>16}{'columnar rows/s':>18}{'speedup':>10}"
+            f"{'legacy MiB':>13}{'compact MiB':>14}"
+        )
+        for name, path in sources.items():
+            legacy = _time(lambda: legacy_load_msd_index([path]), args.repeat)
+            columnar = _time(lambda: load_msd_index([path]), args.repeat)
+            legacy_mib = _retained_mib(lambda: legacy_load_msd_index([path]))
+            compact_mib = _retained_mib(lambda: load_msd_index([path]))
+            print(
+                f"{name:<8}{args.rows / legacy:>16,.0f}{args.rows / columnar:>18,.0f}{legacy / columnar:>9.1f}x"
+                f"{legacy_mib:>13.1f}{compact_mib:>14.1f}"
+            )
+            if args.check:
+                old = legacy_load_msd_index([path])
+                new = load_msd_index([path])
+                sample = random.Random(1).sample(sorted(old), min(1000, len(old)))
+                print(f"{'':<8}index identical: {_same(old, new, sample)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""analysis.benchmarks.startup
+
+CLI start-up cost, measured with ``python -X importtime`` in fresh
+interpreters.
+
+Each scenario runs ``--repeat`` times.  The best total import time and wall
+time are reported, along with the heaviest packages imported.  Two checks
+catch regressions:
+
+* ``--forbid`` lists modules that must not be imported by a scenario
+  (by default jinja2, yaml, orjson and sqlite3 for ``import analysis.pipeline``).
+  This check is machine independent.
+* ``--baseline FILE`` compares against numbers saved with ``--save FILE`` on
+  the same machine.  The run fails when a scenario is slower by more than
+  ``--tolerance``.
+
+    python -m analysis.benchmarks.startup --repeat 5 --save /tmp/startup.json
+    python -m analysis.benchmarks.startup --baseline /tmp/startup.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+SCENARIOS: Dict[str, List[str]] = {
+    "import analysis.pipeline": ["-c", "import analysis.pipeline"],
+    "cli --help": ["-m", "analysis.cli", "--help"],
+}
+DEFAULT_FORBID = {"import analysis.pipeline": ["jinja2", "yaml", "orjson", "sqlite3"]}
+
+
+def _repo_root() -> str:
+    return os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_importtime(stderr: str) -> Dict[str, Tuple[int, int, int]]:
+    """Map module name -> (self us, cumulative us, nesting depth)."""
+    modules: Dict[str, Tuple[int, int, int]] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative), depth)
+    return modules
+
+
+def run_scenario(args: Sequence[str]) -> Tuple[float, Dict[str, Tuple[int, int, int]]]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [_repo_root(), env.get("PYTHONPATH")]))
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    return time.perf_counter() - start, parse_importtime(proc.stderr)
+
+
+def measure(repeat: int) -> Dict[str, Dict[str, object]]:
+    results: Dict[str, Dict[str, object]] = {}
+    for name, args in SCENARIOS.items():
+        best_wall = float("inf")
+        best_import = float("inf")
+        modules: Dict[str, Tuple[int, int, int]] = {}
+        for _ in range(repeat):
+            wall, mods = run_scenario(args)
+            total = sum(cum for _, cum, depth in mods.values() if depth == 0) / 1e6
+            best_wall = min(best_wall, wall)
+            if total < best_import:
+                best_import, modules = total, mods
+        # heaviest packages, wherever in the import tree they were first loaded
+        top = sorted(((cum, mod) for mod, (_, cum, _) in modules.items() if "." not in mod), reverse=True)[:8]
+        results[name] = {
+            "wall_s": best_wall,
+            "import_s": best_import,
+            "top": [[mod, cum / 1e6] for cum, mod in top],
+            "modules": sorted(modules),
+        }
+    return results
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Benchmark CLI start-up / import time")
+    p.add_argument("--repeat", type=int, default=5, help="Best-of repetitions per scenario")
+    p.add_argument("--forbid", action="append", metavar="MODULE",
+                   help="Module that must not be imported by 'import analysis.pipeline' (repeatable)")
+    p.add_argument("--baseline", help="JSON from --save to compare against")
+    p.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown vs the baseline (fraction)")
+    p.add_argument("--save", help="Write the measurements to this JSON file")
+    args = p.parse_args(argv)
+
+    results = measure(max(1, args.repeat))
+    forbid = DEFAULT_FORBID if args.forbid is None else {"import analysis.pipeline": args.forbid}
+    failed = False
+    for name, res in results.items():
+        print(f"{name:<28}{res['import_s'] * 1000:>9.1f} ms imports{res['wall_s'] * 1000:>9.1f} ms wall")
+        for mod, seconds in res["top"]:  # type: ignore[union-attr]
+            print(f"    {mod:<36}{seconds * 1000:>9.1f} ms")
+        loaded = set(res["modules"])  # type: ignore[arg-type]
+        for mod in forbid.get(name, []):
+            if mod in loaded:
+                print(f"FAIL: {name} imports {mod}")
+                failed = True
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        for name, res in results.items():
+            if name not in baseline:
+                continue
+            for key in ("import_s", "wall_s"):
+                limit = baseline[name][key] * (1 + args.tolerance)
+                if res[key] > limit:  # type: ignore[operator]
+                    print(f"FAIL: {name} {key} {res[key]:.3f}s > {limit:.3f}s (baseline {baseline[name][key]:.3f}s)")
+                    failed = True
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
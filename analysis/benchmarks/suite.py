@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""analysis.benchmarks.suite
+
+Per-stage and end-to-end pipeline benchmarks on a synthetic corpus (see
+:mod:`analysis.benchmarks.corpus`).
+
+Each stage runs over every survey row.  Its inputs come from the stages
+before it, computed once up front, so the timing covers that stage only.
+The best of ``--repeat`` runs gives the throughput.  Peak memory is traced
+with ``tracemalloc`` in a separate run, so tracing does not slow the timed
+ones.  The end-to-end benchmark is a full ``Pipeline.run`` with JSONL and
+aggregate output.
+
+Results can be saved (``--save``) and later compared with ``--baseline``.
+A stage fails when its throughput drops by more than ``--tolerance`` or its
+peak memory grows by more than ``--memory-tolerance``.  Baselines are
+machine specific: save one on the machine that runs the comparison.
+
+    python -m analysis.benchmarks.suite --rows 5000 --save bench.json
+    python -m analysis.benchmarks.suite --rows 5000 --baseline bench.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from analysis.batch import profile_batch
+from analysis.benchmarks.corpus import generate_corpus
+from analysis.pipeline import (
+    Pipeline,
+    build_correlation_matrix,
+    build_scenario_vector,
+    derive_personality_profile,
+    derive_preference_profile,
+    extract_feature_record,
+    feedback_adjust_preference,
+    load_csv,
+    lookup_msd,
+    score_record_from_ids,
+)
+
+
+class Context(NamedTuple):
+    pipeline: Pipeline
+    corpus: Any
+    out_dir: str
+    frame: Any
+    rows: List[Any]
+    texts: List[str]
+    features: List[Any]
+    scores: List[Any]
+    scenarios: List[Dict[str, float]]
+    matches: List[List[Dict[str, Any]]]
+    preferences: List[Dict[str, Any]]
+    personalities: List[Dict[str, Any]]
+
+
+def build_context(corpus: Any, out_dir: str) -> Context:
+    """Load the corpus and precompute every stage's inputs."""
+    pipeline = Pipeline(mapping_path=corpus.mapping)
+    cfg = pipeline.cfg
+    frame = load_csv(corpus.survey)
+    rows = [row for _, row in frame.iterrows()]
+    texts = [str(row["text"]) for row in rows]
+    features = [extract_feature_record(t) for t in texts]
+    scores = [score_record_from_ids(f.token_ids, cfg) for f in features]
+    scenarios = [build_scenario_vector(row, cfg.scenario_weights) for row in rows]
+    matches = [_lookup(pipeline, row, text) for row, text in zip(rows, texts)]
+    preferences = [derive_preference_profile(*args) for args in zip(scores, scenarios, matches, features)]
+    personalities = [derive_personality_profile(*args) for args in zip(features, scores, preferences)]
+    return Context(pipeline, corpus, out_dir, frame, rows, texts, features, scores, scenarios, matches,
+                   preferences, personalities)
+
+
+def _lookup(pipeline: Pipeline, row: Any, text: str) -> List[Dict[str, Any]]:
+    artist = row.get("artist") or row.get("respondent_artist")
+    song = row.get("song") or row.get("song_name")
+    return lookup_msd(artist, song, row.get("lyrics") or text, pipeline.msd_index)
+
+
+def _profile_batch(ctx: Context) -> None:
+    profiles = profile_batch(ctx.features, ctx.scores, ctx.scenarios, ctx.matches)
+    profiles.preference_profiles()
+    profiles.personality_profiles()
+    profiles.correlations(ctx.pipeline.lut_tables)
+
+
+def _end_to_end(ctx: Context) -> None:
+    Pipeline(mapping_path=ctx.corpus.mapping).run({
+        "input": ctx.corpus.survey,
+        "jsonl": os.path.join(ctx.out_dir, "bench.jsonl"),
+        "aggregate": os.path.join(ctx.out_dir, "bench.aggregate.json"),
+        "chunk_size": 1000,
+    })
+
+
+STAGES: Dict[str, Callable[[Context], Any]] = {
+    "extract_features": lambda ctx: [extract_feature_record(t) for t in ctx.texts],
+    "score_mapping": lambda ctx: [score_record_from_ids(f.token_ids, ctx.pipeline.cfg) for f in ctx.features],
+    "scenario_vector": lambda ctx: [
+        build_scenario_vector(row, ctx.pipeline.cfg.scenario_weights) for row in ctx.rows
+    ],
+    "lookup_msd": lambda ctx: [_lookup(ctx.pipeline, row, t) for row, t in zip(ctx.rows, ctx.texts)],
+    "lookup_msd_batch": lambda ctx: list(ctx.pipeline.lookup_frame(ctx.frame)),
+    "profiles": lambda ctx: [
+        feedback_adjust_preference(derive_preference_profile(s, sv, m, f), p)
+        for s, sv, m, f, p in zip(ctx.scores, ctx.scenarios, ctx.matches, ctx.features, ctx.personalities)
+    ],
+    "correlations": lambda ctx: [
+        build_correlation_matrix(pref, pers, ctx.pipeline.lut_tables)
+        for pref, pers in zip(ctx.preferences, ctx.personalities)
+    ],
+    "profile_batch": _profile_batch,
+    "process_row": lambda ctx: [ctx.pipeline.process_row(i, row) for i, row in enumerate(ctx.rows)],
+    "process_frame": lambda ctx: ctx.pipeline.process_frame(ctx.frame),
+    "end_to_end": _end_to_end,
+}
+
+
+def _best_time(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _peak_mib(fn: Callable[[], Any]) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1 << 20)
+
+
+def run_suite(ctx: Context, stages: Sequence[str], repeat: int) -> Dict[str, Dict[str, float]]:
+    n = len(ctx.rows)
+    results: Dict[str, Dict[str, float]] = {}
+    for name in stages:
+        fn = STAGES[name]
+        seconds = _best_time(lambda: fn(ctx), repeat)
+        results[name] = {
+            "seconds": seconds,
+            "rows_per_s": n / seconds if seconds else float("inf"),
+            "peak_mib": _peak_mib(lambda: fn(ctx)),
+        }
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Any], tolerance: float,
+            memory_tolerance: float) -> List[str]:
+    """Return a failure message per regressed stage."""
+    failures = []
+    for name, res in results.items():
+        base = baseline.get("stages", {}).get(name)
+        if not base:
+            continue
+        floor = base["rows_per_s"] * (1 - tolerance)
+        if res["rows_per_s"] < floor:
+            failures.append(f"{name}: {res['rows_per_s']:,.0f} rows/s < {floor:,.0f} (baseline {base['rows_per_s']:,.0f})")
+        ceiling = base["peak_mib"] * (1 + memory_tolerance)
+        if res["peak_mib"] > ceiling:
+            failures.append(f"{name}: peak {res['peak_mib']:.1f} MiB > {ceiling:.1f} (baseline {base['peak_mib']:.1f})")
+    return failures
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Benchmark the pipeline stages on a synthetic corpus")
+    p.add_argument("--rows", type=int, default=5_000, help="Survey rows")
+    p.add_argument("--msd-rows", type=int, default=100_000, help="Rows per MSD source")
+    p.add_argument("--lut-rows", type=int, default=1_000, help="Rows in the CSV LUT")
+    p.add_argument("--seed", type=int, default=0, help="Corpus seed")
+    p.add_argument("--repeat", type=int, default=3, help="Best-of repetitions")
+    p.add_argument("--stage", action="append", choices=sorted(STAGES), help="Only run these stages (repeatable)")
+    p.add_argument("--save", help="Write the results (with the corpus parameters) to this JSON file")
+    p.add_argument("--baseline", help="JSON from --save to compare against")
+    p.add_argument("--tolerance", type=float, default=0.15, help="Allowed throughput drop (fraction)")
+    p.add_argument("--memory-tolerance", type=float, default=0.25, help="Allowed peak memory growth (fraction)")
+    args = p.parse_args(argv)
+
+    params = {"rows": args.rows, "msd_rows": args.msd_rows, "lut_rows": args.lut_rows, "seed": args.seed}
+    stages = args.stage or list(STAGES)
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = generate_corpus(tmp, **params)
+        ctx = build_context(corpus, tmp)
+        results = run_suite(ctx, stages, max(1, args.repeat))
+
+    print(f"{'stage':<20}{'seconds':>10}{'rows/s':>14}{'peak MiB':>11}")
+    for name, res in results.items():
+        print(f"{name:<20}{res['seconds']:>10.3f}{res['rows_per_s']:>14,.0f}{res['peak_mib']:>11.1f}")
+
+    failures: List[str] = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        if baseline.get("params") != params:
+            print(f"warning: baseline corpus {baseline.get('params')} differs from {params}", file=sys.stderr)
+        failures = compare(results, baseline, args.tolerance, args.memory_tolerance)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as fh:
+            json.dump({"params": params, "stages": results}, fh, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
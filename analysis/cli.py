@@ -1,15 +1,33 @@
 #!/usr/bin/env python3
 import argparse
+import inspect
 import sys
 import traceback
 
 def parse_args():
     p = argparse.ArgumentParser(description="Analysis CLI")
-    p.add_argument("--input", "-i", type=str, help="Input file or directory", required=False)
+    p.add_argument("--input", "-i", type=str, help="Input CSV, directory of CSVs or glob (files are read in parallel as one stream)", required=False)
     p.add_argument("--mapping", type=str, help="Pipeline configuration YAML")
-    p.add_argument("--jsonl", action="store_true", help="Output JSONL")
+    p.add_argument("--jsonl", nargs="?", const=True, help="Output JSONL, optionally to PATH (.jsonl.gz/.jsonl.zst are compressed)")
+    p.add_argument("--jsonl-encoder", choices=("auto", "json", "orjson"), default="auto", help="JSONL encoder; auto uses orjson for compressed output")
+    p.add_argument("--parquet", nargs="?", const=True, help="Output typed result columns as Parquet row groups, optionally to PATH (needs pyarrow)")
+    p.add_argument("--arrow", nargs="?", const=True, help="Output typed result columns as an Arrow IPC file, optionally to PATH (needs pyarrow)")
     p.add_argument("--aggregate", action="store_true", help="Aggregate results")
-    p.add_argument("--html", action="store_true", help="Generate HTML output")
+    p.add_argument("--aggregate-state", type=str, help="Also save the mergeable aggregate state (merge with python -m analysis.aggregate)")
+    p.add_argument("--html", nargs="?", const=True, help="Generate HTML output, optionally to PATH")
+    p.add_argument("--html-page-size", type=int, help="Stream a paginated HTML report (index plus N rows per page)")
+    p.add_argument("--html-text-limit", type=int, default=280, help="Truncate texts to N characters in the paginated report")
+    p.add_argument("--chunk-size", type=int, help="Stream the input in chunks of N rows; memory stays flat")
+    p.add_argument("--msd-cache", type=str, help="SQLite file caching the compiled MSD index")
+    p.add_argument("--workers", type=int, help="Run the per-row pipeline in N processes (output order is unchanged)")
+    p.add_argument("--validate", action="store_true", help="Validate every result against the pydantic models")
+    p.add_argument("--drop-words", action="store_true", help="Drop the per-row word lists after scoring")
+    p.add_argument("--result-cache", type=str, help="SQLite result store; unchanged rows are reused on later runs")
+    p.add_argument("--result-cache-size", type=float, help="Evict least recently used results above this many MiB (default 1024)")
+    p.add_argument("--memo-size", type=float, help="Memoise repeated texts and artist/song lookups in up to this many MiB (default 128; 0 disables)")
+    p.add_argument("--profile", nargs="?", const=True, help="Write stage timings, rows/s and MSD hit counts as JSON, optionally to PATH")
+    p.add_argument("--cprofile", type=str, help="Dump cProfile stats for the run to PATH (snakeviz, flameprof, pstats)")
+    p.add_argument("--flamegraph", type=str, help="Write sampled folded stacks to PATH (flamegraph.pl, speedscope)")
     return p.parse_args()
 
 def main():
@@ -24,10 +42,12 @@ def main():
             traceback.print_exc()
             sys.exit(1)
     try:
-        pipeline = Pipeline(mapping_path=args.mapping)
-        try:
+        pipeline = Pipeline(mapping_path=args.mapping, msd_cache=args.msd_cache)
+        # only a run() without parameters is called bare; a TypeError raised
+        # inside the run (e.g. by pyarrow) must surface as it is
+        if inspect.signature(pipeline.run).parameters:
             pipeline.run(args)
-        except TypeError:
+        else:
             pipeline.run()
     except Exception:
         print("Pipeline failed:", file=sys.stderr)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""analysis.fuzzy
+
+Approximate string matching for MSD artist/title tokens.
+
+:class:`TrigramIndex` keeps an inverted list of key ids per character
+trigram, in CSR arrays built with a few vectorised passes (no per-key
+Python sets).  Similarity is the Dice coefficient of the trigram sets,
+``2 |A & B| / (|A| + |B|)``.
+
+A query needs ``T`` shared trigrams to reach ``min_score`` with a key of any
+length.  Its posting lists are split DivideSkip style:
+
+* the ``L`` longest lists are skipped at first;
+* keys are counted over the short lists, and those seen fewer than ``T - L``
+  times cannot qualify;
+* the survivors, after a length filter, are checked against the long lists
+  by binary search.
+
+Trigrams such as ``" th"`` that occur in a large share of the keys
+therefore cost a ``searchsorted`` over a few candidates instead of a scan.
+"""
+from __future__ import annotations
+
+import math
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+FUZZY_METHODS = ("trigram",)
+DEFAULT_TOP_K = 3
+DEFAULT_MIN_SCORE = 0.6
+
+# keys per vectorised block when building
+_BUILD_BLOCK = 65536
+# DivideSkip's mu: larger values skip fewer long lists
+_SKIP_MU = 0.05
+_KEY_BITS = 40
+
+
+def _gram_codes(token: str) -> List[int]:
+    """Distinct trigrams of ``token`` as ints, padded so short words still have some."""
+    p = f"  {token} "
+    return list(dict.fromkeys(
+        (ord(p[i]) << 42) | (ord(p[i + 1]) << 21) | ord(p[i + 2]) for i in range(len(p) - 2)
+    ))
+
+
+class TrigramIndex:
+    """Top-k approximate lookup of normalised tokens; see the module docstring.
+
+    ``top_k`` and ``min_score`` are the defaults for :meth:`query`.
+    """
+
+    def __init__(self, keys: Iterable[str], top_k: int = DEFAULT_TOP_K, min_score: float = DEFAULT_MIN_SCORE):
+        self.top_k = top_k
+        self.min_score = min_score
+        self.keys: List[str] = list(dict.fromkeys(k for k in keys if k))
+        codes: List[np.ndarray] = []
+        owners: List[np.ndarray] = []
+        for start in range(0, len(self.keys), _BUILD_BLOCK):
+            block = [f"  {k} " for k in self.keys[start:start + _BUILD_BLOCK]]
+            lengths = np.fromiter(map(len, block), dtype=np.int64, count=len(block))
+            width = int(lengths.max())
+            # one row of code points per key, NUL padded
+            chars = np.array(block, dtype=f"<U{width}").view(np.uint32).reshape(len(block), width).astype(np.int64)
+            grams = (chars[:, :-2] << 42) | (chars[:, 1:-1] << 21) | chars[:, 2:]
+            valid = np.arange(width - 2)[None, :] < (lengths - 2)[:, None]
+            codes.append(grams[valid])
+            owners.append(np.repeat(np.arange(start, start + len(block), dtype=np.int64), lengths - 2))
+        if codes:
+            gram_ids, uniques = pd.factorize(np.concatenate(codes))
+            # sorting (gram, key) pairs groups the postings and puts duplicates side by side
+            pairs = (gram_ids.astype(np.int64) << _KEY_BITS) | np.concatenate(owners)
+            pairs.sort()
+            distinct = np.ones(len(pairs), dtype=bool)
+            distinct[1:] = pairs[1:] != pairs[:-1]
+            pairs = pairs[distinct]
+            grams_col = pairs >> _KEY_BITS
+            keys_col = pairs & ((1 << _KEY_BITS) - 1)
+            n_grams = len(uniques)
+        else:
+            grams_col = keys_col = np.zeros(0, dtype=np.int64)
+            uniques, n_grams = [], 0
+        self._gram_ids = dict(zip(np.asarray(uniques).tolist(), range(n_grams)))
+        self._indices = keys_col.astype(np.uint32)
+        self._indptr = np.zeros(n_grams + 1, dtype=np.int64)
+        np.cumsum(np.bincount(grams_col, minlength=n_grams), out=self._indptr[1:])
+        self._sizes = np.bincount(keys_col, minlength=len(self.keys))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def query(
+        self, token: str, k: Optional[int] = None, min_score: Optional[float] = None
+    ) -> List[Tuple[str, float]]:
+        """Up to ``k`` ``(key, score)`` pairs with ``score >= min_score``, best first.
+
+        Ties are broken by key order, so results are deterministic.
+        """
+        k = self.top_k if k is None else k
+        min_score = self.min_score if min_score is None else min_score
+        grams = _gram_codes(token)
+        n = len(grams)
+        if not n or not self.keys or k <= 0:
+            return []
+        min_score = min(max(min_score, 1e-9), 1.0)
+        # |A & B| >= t (|A| + |B|) / 2 and |B| >= |A & B|
+        needed = max(1, math.ceil(min_score * n / (2.0 - min_score) - 1e-9))
+        gram_ids = np.fromiter((self._gram_ids.get(g, -1) for g in grams), dtype=np.int64, count=n)
+        gram_ids = gram_ids[gram_ids >= 0]
+        if len(gram_ids) < needed:
+            return []
+        starts, ends = self._indptr[gram_ids], self._indptr[gram_ids + 1]
+        order = np.argsort(ends - starts, kind="stable")
+        starts, ends = starts[order].tolist(), ends[order].tolist()
+        longest = ends[-1] - starts[-1]
+        skip = min(needed - 1, int(needed / (_SKIP_MU * math.log2(max(2, longest)) + 1)))
+        short = len(starts) - skip
+
+        seen = np.concatenate([self._indices[s:e] for s, e in zip(starts[:short], ends[:short])])
+        if len(seen) * 8 > len(self.keys):
+            counts = np.bincount(seen, minlength=len(self.keys))
+            candidates = np.flatnonzero(counts >= needed - skip)
+            common = counts[candidates]
+        else:
+            candidates, common = np.unique(seen, return_counts=True)
+            keep = common >= needed - skip
+            candidates, common = candidates[keep], common[keep]
+        sizes = self._sizes[candidates]
+        keep = (sizes >= needed) & (sizes * min_score <= (2.0 - min_score) * n + 1e-9)
+        candidates, common = candidates[keep], common[keep]
+        for s, e in zip(starts[short:], ends[short:]):
+            posting = self._indices[s:e]
+            pos = np.searchsorted(posting, candidates)
+            inside = pos < len(posting)
+            common[inside] += posting[pos[inside]] == candidates[inside]
+
+        scores = 2.0 * common / (n + self._sizes[candidates])
+        keep = scores >= min_score
+        candidates, scores = candidates[keep], scores[keep]
+        top = np.lexsort((candidates, -scores))[:k]
+        return [(self.keys[key], score) for key, score in zip(candidates[top].tolist(), scores[top].tolist())]
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""analysis.io.arrow
+
+Columnar result output: Parquet files and Arrow IPC files, via ``pyarrow``.
+
+Results are buffered ``batch_size`` at a time and converted column by column
+into one record batch.  Each batch is one Parquet row group (zstd compressed)
+or one IPC record batch, so memory stays bounded on streamed runs.  IPC
+output uses the Arrow file format (what ``pandas.read_feather`` reads) and
+is left uncompressed, so ``pyarrow.memory_map`` + ``pyarrow.ipc.open_file``
+read it without copying.
+
+The schema is fixed (:func:`result_schema`), one column per value:
+
+* ``id``, ``text``; the features ``num_chars``, ``num_words``,
+  ``avg_word_len`` and ``words`` (``list<string>``);
+* the scores ``psych`` and ``music``; the mapping details as
+  ``category_scores`` (``map<string, double>``), ``category_hits``
+  (``map<string, map<string, int64>>``) and ``scenarios``;
+* ``msd_matches``, a list of ``token``/``tag``/``weight``/``path`` structs
+  (``query``/``score`` for fuzzy matches, ``raw`` as a JSON string; a
+  numeric tag is written as text and a blank one as null);
+* the preference profile: ``scenario_vector`` and ``genre_distribution``
+  (``map<string, double>``), ``music_energy``, ``lexical_density``,
+  ``vocabulary_size`` and ``msd_match_count``;
+* the personality traits ``openness`` ... ``neuroticism`` and
+  ``personality_avg_word_len``;
+* the correlations ``periodicity``, ``synchronicity``, ``tension``,
+  ``expression``, ``tables_loaded`` and ``table_signatures``
+  (``list<int64>``, the ``table_N_signature`` values in order).
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from analysis.io.jsonl import as_dict, json_default
+
+ARROW_FORMATS = ("parquet", "ipc")
+DEFAULT_BATCH_SIZE = 65536
+
+# (column, section of the result, key, arrow type name)
+_SCALARS: Tuple[Tuple[str, str, str, str], ...] = (
+    ("num_chars", "features", "num_chars", "int64"),
+    ("num_words", "features", "num_words", "int64"),
+    ("avg_word_len", "features", "avg_word_len", "float64"),
+    ("psych", "score", "psych", "float64"),
+    ("music", "score", "music", "float64"),
+    ("music_energy", "preference_profile", "music_energy", "float64"),
+    ("lexical_density", "preference_profile", "lexical_density", "float64"),
+    ("vocabulary_size", "preference_profile", "vocabulary_size", "int64"),
+    ("msd_match_count", "preference_profile", "msd_match_count", "int64"),
+    ("openness", "personality_profile", "openness", "float64"),
+    ("conscientiousness", "personality_profile", "conscientiousness", "float64"),
+    ("extraversion", "personality_profile", "extraversion", "float64"),
+    ("agreeableness", "personality_profile", "agreeableness", "float64"),
+    ("neuroticism", "personality_profile", "neuroticism", "float64"),
+    ("personality_avg_word_len", "personality_profile", "avg_word_len", "float64"),
+    ("periodicity", "correlations", "periodicity", "float64"),
+    ("synchronicity", "correlations", "synchronicity", "float64"),
+    ("tension", "correlations", "tension", "float64"),
+    ("expression", "correlations", "expression", "float64"),
+    ("tables_loaded", "correlations", "tables_loaded", "int64"),
+)
+_DETAIL_KEYS = ("scenarios", "msd_matches")
+_MATCH_FIELDS = ("token", "tag", "weight", "path", "query", "score")
+
+
+def _pyarrow(path: str) -> Any:
+    try:
+        import pyarrow
+    except ImportError as exc:
+        raise RuntimeError(f"writing {path} requires the 'pyarrow' package") from exc
+    return pyarrow
+
+
+def result_schema(pa: Any = None) -> Any:
+    """The ``pyarrow.Schema`` of the result columns (see the module docstring)."""
+    if pa is None:
+        import pyarrow as pa
+    weights = pa.map_(pa.string(), pa.float64())
+    match = pa.struct([
+        ("token", pa.string()),
+        ("tag", pa.string()),
+        ("weight", pa.float64()),
+        ("path", pa.string()),
+        ("query", pa.string()),
+        ("score", pa.float64()),
+        ("raw", pa.string()),
+    ])
+    scalars = {name: getattr(pa, type_name)() for name, _, _, type_name in _SCALARS}
+    fields = [
+        ("id", pa.int64()),
+        ("text", pa.string()),
+        *[(name, scalars[name]) for name in ("num_chars", "num_words", "avg_word_len")],
+        ("words", pa.list_(pa.string())),
+        ("psych", scalars["psych"]),
+        ("music", scalars["music"]),
+        ("category_scores", weights),
+        ("category_hits", pa.map_(pa.string(), pa.map_(pa.string(), pa.int64()))),
+        ("scenarios", weights),
+        ("msd_matches", pa.list_(match)),
+        ("scenario_vector", weights),
+        ("genre_distribution", weights),
+        *[(name, scalars[name]) for name, _, _, _ in _SCALARS[5:]],
+        ("table_signatures", pa.list_(pa.int64())),
+    ]
+    return pa.schema(fields)
+
+
+def _text(value: Any) -> Optional[str]:
+    # MSD tags come from CSV cells: NaN when blank, floats when numeric
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    return str(value)
+
+
+def _str_keys(mapping: Dict[Any, Any]) -> Dict[str, Any]:
+    # map<string, ...> columns; YAML keys such as 1990 load as ints
+    return {k if isinstance(k, str) else str(k): v for k, v in mapping.items()}
+
+
+def _match_struct(match: Dict[str, Any]) -> Dict[str, Any]:
+    out = {key: match.get(key) for key in _MATCH_FIELDS}
+    out["tag"] = _text(out["tag"])
+    raw = match.get("raw")
+    out["raw"] = None if raw is None else json.dumps(raw, ensure_ascii=False, default=json_default)
+    return out
+
+
+def result_columns(rows: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """Python lists per result column for a batch of result dicts."""
+    cols: Dict[str, List[Any]] = {name: [] for name in (
+        "id", "text", "words", "category_scores", "category_hits", "scenarios", "msd_matches",
+        "scenario_vector", "genre_distribution", "table_signatures",
+    )}
+    for name, _, _, _ in _SCALARS:
+        cols[name] = []
+    scalars = [(cols[name], section, key) for name, section, key, _ in _SCALARS]
+    for row in rows:
+        score = row.get("score") or {}
+        details = score.get("details") or {}
+        sections = {
+            "features": row.get("features") or {},
+            "score": score,
+            "preference_profile": score.get("preference_profile") or {},
+            "personality_profile": score.get("personality_profile") or {},
+            "correlations": score.get("correlations") or {},
+        }
+        for col, section, key in scalars:
+            col.append(sections[section].get(key))
+        pref = sections["preference_profile"]
+        corr = sections["correlations"]
+        cols["id"].append(row.get("id"))
+        cols["text"].append(row.get("text"))
+        cols["words"].append(sections["features"].get("words"))
+        categories = [(cat, d) for cat, d in details.items() if cat not in _DETAIL_KEYS and isinstance(d, dict)]
+        cols["category_scores"].append({str(cat): d.get("score") for cat, d in categories})
+        cols["category_hits"].append({str(cat): _str_keys(d.get("hits") or {}) for cat, d in categories})
+        cols["scenarios"].append(details.get("scenarios") or {})
+        cols["msd_matches"].append([_match_struct(m) for m in details.get("msd_matches") or ()])
+        cols["scenario_vector"].append(pref.get("scenario_vector") or {})
+        cols["genre_distribution"].append(pref.get("genre_distribution") or {})
+        cols["table_signatures"].append([corr[f"table_{i}_signature"] for i in range(corr.get("tables_loaded") or 0)
+                                         if f"table_{i}_signature" in corr])
+    return cols
+
+
+class ArrowResultWriter:
+    """Incremental Parquet (``format="parquet"``) or Arrow IPC (``"ipc"``) writer.
+
+    ``compression`` applies to Parquet only (default ``"zstd"``).
+    """
+
+    def __init__(self, path: str, format: str = "parquet", batch_size: int = DEFAULT_BATCH_SIZE,
+                 compression: Optional[str] = "zstd"):
+        if format not in ARROW_FORMATS:
+            raise ValueError(f"unknown columnar format: {format}")
+        self._pa = pa = _pyarrow(path)
+        self.path = path
+        self.format = format
+        self.schema = result_schema(pa)
+        self._batch_size = max(1, int(batch_size))
+        self._batch: List[Dict[str, Any]] = []
+        self._sink = None
+        if format == "parquet":
+            import pyarrow.parquet as pq
+
+            self._writer: Any = pq.ParquetWriter(path, self.schema, compression=compression)
+        else:
+            self._sink = pa.OSFile(path, "wb")
+            self._writer = pa.ipc.new_file(self._sink, self.schema)
+
+    def write(self, result: Any) -> None:
+        self._batch.append(as_dict(result))
+        if len(self._batch) >= self._batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._batch and self._writer is not None:
+            cols = result_columns(self._batch)
+            pa = self._pa
+            arrays = [pa.array(cols[field.name], type=field.type) for field in self.schema]
+            self._writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+            self._batch = []
+
+    def close(self) -> None:
+        if self._writer is None:
+            return
+        try:
+            self.flush()
+        finally:
+            self._writer.close()
+            self._writer = None
+            if self._sink is not None:
+                self._sink.close()
+                self._sink = None
+
+    def __enter__(self) -> "ArrowResultWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""analysis.io.digest
+
+Stable file fingerprints used to key on-disk caches.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+from typing import NamedTuple
+
+_BLOCK_SIZE = 1 << 20
+
+
+class FileSignature(NamedTuple):
+    path: str
+    size: int
+    mtime_ns: int
+
+
+def file_signature(path: str) -> FileSignature:
+    """Return the absolute path, size and modification time of ``path``."""
+    st = os.stat(path)
+    return FileSignature(os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+
+def file_digest(path: str) -> str:
+    """Return the hex SHA-1 of the file contents, read in 1 MiB blocks."""
+    h = hashlib.sha1()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(_BLOCK_SIZE), b""):
+            h.update(block)
+    return h.hexdigest()
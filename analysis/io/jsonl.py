@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""analysis.io.jsonl
+
+Batched, buffered JSONL writer with optional gzip/zstd compression.
+
+Results are converted to dicts as they arrive and serialised ``batch_size``
+at a time into one large write.  The output is compressed when the path ends
+in ``.gz`` or ``.zst``/``.zstd`` (the latter needs the ``zstandard`` package).
+
+Encoders:
+
+* ``"json"`` – the standard library encoder; lines are byte-for-byte what
+  ``json.dumps(obj, ensure_ascii=False)`` produces.
+* ``"orjson"`` – much faster, but compact (no spaces after ``,``/``:``) and
+  writes non-finite floats as ``null``.  Falls back to ``"json"`` when
+  ``orjson`` is not installed.
+* ``"auto"`` (default) – ``"orjson"`` for compressed output, ``"json"`` for
+  plain files so uncompressed output keeps the established format.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+from typing import IO, Any, Callable, Dict, List, Optional
+
+_BUFFER_SIZE = 1 << 20
+COMPRESSED_SUFFIXES = (".gz", ".zst", ".zstd")
+
+
+def as_dict(obj: Any) -> Dict[str, Any]:
+    """Plain dict for a pydantic model (v1 or v2), a pipeline record or a dict."""
+    if isinstance(obj, dict):
+        return obj
+    dump = getattr(obj, "model_dump", None)
+    return dump() if dump is not None else obj.dict()
+
+
+def open_output(path: str) -> IO[bytes]:
+    """Open ``path`` for buffered binary writing, compressing by extension."""
+    lower = path.lower()
+    if lower.endswith(".gz"):
+        return gzip.open(path, "wb", compresslevel=6)
+    if lower.endswith((".zst", ".zstd")):
+        try:
+            import zstandard
+        except ImportError as exc:
+            raise RuntimeError(f"writing {path} requires the 'zstandard' package") from exc
+        raw = open(path, "wb")
+        return zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=True)
+    return open(path, "wb", buffering=_BUFFER_SIZE)
+
+
+def json_default(value: Any) -> Any:
+    """``default=`` hook for the JSON encoders used across the package.
+
+    numpy/pandas scalars become the equivalent Python values; anything else
+    is written as its ``str()``.
+    """
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def make_encoder(name: str) -> Callable[[List[Dict[str, Any]]], bytes]:
+    """Return a function serialising a batch of dicts into JSONL bytes."""
+    orjson = None
+    if name == "orjson":
+        try:  # optional fast encoder, imported only when selected
+            import orjson
+        except ImportError:  # pragma: no cover - depends on the environment
+            pass
+    if orjson is not None:
+        options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+        dumps = orjson.dumps
+
+        def encode_orjson(batch: List[Dict[str, Any]]) -> bytes:
+            return b"".join(dumps(obj, default=json_default, option=options) for obj in batch)
+
+        return encode_orjson
+    if name not in ("json", "orjson"):
+        raise ValueError(f"unknown JSONL encoder: {name}")
+    encode = json.JSONEncoder(ensure_ascii=False, default=json_default).encode
+
+    def encode_json(batch: List[Dict[str, Any]]) -> bytes:
+        return "".join(encode(obj) + "\n" for obj in batch).encode("utf-8")
+
+    return encode_json
+
+
+class JsonlWriter:
+    """Incremental JSONL writer; see the module docstring for the options."""
+
+    def __init__(self, path: str, encoder: str = "auto", batch_size: int = 512):
+        self.path = path
+        if encoder == "auto":
+            encoder = "orjson" if path.lower().endswith(COMPRESSED_SUFFIXES) else "json"
+        self._encode = make_encoder(encoder)
+        self._batch_size = max(1, int(batch_size))
+        self._batch: List[Dict[str, Any]] = []
+        self._fh: Optional[IO[bytes]] = open_output(path)
+
+    def write(self, result: Any) -> None:
+        self._batch.append(as_dict(result))
+        if len(self._batch) >= self._batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._batch and self._fh is not None:
+            self._fh.write(self._encode(self._batch))
+            self._batch = []
+
+    def close(self) -> None:
+        if self._fh is None:
+            return
+        try:
+            self.flush()
+        finally:
+            self._fh.close()
+            self._fh = None
+
+    def __enter__(self) -> "JsonlWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""analysis.io.jsonstream
+
+Incremental readers for JSON Lines files and large top-level JSON arrays or
+objects.  Only one buffer of text (plus the element being decoded) is held in
+memory at a time, so multi-GB dumps can be consumed entry by entry.  Entries
+are yielded with their byte offset and length in the file, so callers can
+re-read an entry later instead of keeping its text.
+"""
+from __future__ import annotations
+
+import json
+from typing import IO, Any, Iterator, Tuple
+
+_BUFFER_SIZE = 1 << 20
+_WHITESPACE = " \t\n\r"
+# characters that may follow a complete value in valid JSON
+_DELIMITERS = _WHITESPACE + ",:]}"
+# a decode error this close to the end of the buffer may be a value cut short
+# by the buffer (e.g. a partial literal or \uXXXX escape) rather than bad input
+_TRUNCATION_SLACK = 16
+_decoder = json.JSONDecoder()
+
+
+def iter_jsonl(path: str) -> Iterator[Tuple[Any, int, int]]:
+    """Yield ``(value, offset, length)`` for every non-blank line of a JSON Lines file.
+
+    ``offset`` and ``length`` locate the line's bytes in the file.
+    """
+    offset = 0
+    with open(path, "rb") as fh:
+        for lineno, line in enumerate(fh, 1):
+            start = offset
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                value = json.loads(line)
+            except ValueError as exc:
+                raise ValueError(f"malformed JSON on line {lineno} of {path}: {exc}") from exc
+            yield value, start, len(line)
+
+
+class _Reader:
+    """A sliding text buffer over ``fh`` with JSON token helpers.
+
+    ``fh`` must be opened as UTF-8 with ``newline=""`` so that :meth:`tell`
+    counts the bytes of the file itself.
+    """
+
+    def __init__(self, fh: IO[str], name: str):
+        self.fh = fh
+        self.name = name
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        # byte offset in the file of buf[self._counted]
+        self._offset = 0
+        self._counted = 0
+
+    def _byte_offset(self, index: int) -> int:
+        # callers only ask for positions at or after self._counted
+        return self._offset + len(self.buf[self._counted:index].encode("utf-8"))
+
+    def tell(self) -> int:
+        """Byte offset in the file of the current position."""
+        self._offset = self._byte_offset(self.pos)
+        self._counted = self.pos
+        return self._offset
+
+    def error(self, message: str, index: int) -> ValueError:
+        return ValueError(f"malformed JSON in {self.name} at byte {self._byte_offset(index)}: {message}")
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        # grow with the pending text so one oversized value costs O(n), not O(n^2)
+        chunk = self.fh.read(max(_BUFFER_SIZE, len(self.buf) - self.pos))
+        if not chunk:
+            self.eof = True
+            return False
+        self.tell()
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = self._counted = 0
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character ('' at end of input)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise self.error(f"expected {char!r}", self.pos)
+        self.pos += 1
+
+    def value(self) -> Tuple[Any, int, int]:
+        """Decode the next JSON value; returns it with its byte offset and length."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as exc:
+                # only an error at the end of the buffer can be fixed by more
+                # input; anything else fails here, at the bad token
+                truncated = (
+                    exc.msg.startswith("Unterminated string")
+                    or exc.pos >= len(self.buf) - _TRUNCATION_SLACK
+                )
+                if truncated and self._fill():
+                    continue
+                raise self.error(exc.msg, exc.pos) from None
+            # a value not yet followed by a delimiter (e.g. "12" of "12.5"
+            # split across chunks) may continue in the next chunk
+            if (end == len(self.buf) or self.buf[end] not in _DELIMITERS) and self._fill():
+                continue
+            start = self.tell()
+            self.pos = end
+            return value, start, self.tell() - start
+
+
+def iter_json_entries(path: str) -> Iterator[Tuple[str, Any, int, int]]:
+    """Stream the top level of a JSON document.
+
+    Yields ``("item", value, offset, length)`` for each element of a top-level
+    array, ``("pair", (key, value), offset, length)`` for each member of a
+    top-level object and ``("value", value, offset, length)`` for any other
+    document.  ``offset`` and ``length`` locate the bytes of ``value`` in the
+    file.  Malformed input raises :class:`ValueError` naming the byte offset
+    of the bad token.
+    """
+    with open(path, "r", encoding="utf-8", newline="") as fh:
+        reader = _Reader(fh, path)
+        first = reader.peek()
+        if first not in ("[", "{"):
+            value, offset, length = reader.value()
+            yield "value", value, offset, length
+            return
+        closing = "]" if first == "[" else "}"
+        reader.pos += 1
+        if reader.peek() == closing:
+            return
+        while True:
+            if first == "[":
+                value, offset, length = reader.value()
+                yield "item", value, offset, length
+            else:
+                if reader.peek() != '"':
+                    raise reader.error("expected a string key", reader.pos)
+                key, _, _ = reader.value()
+                reader.expect(":")
+                value, offset, length = reader.value()
+                yield "pair", (key, value), offset, length
+            char = reader.peek()
+            if char == ",":
+                reader.pos += 1
+                continue
+            if char == closing:
+                return
+            raise reader.error(f"expected ',' or {closing!r}", reader.pos)
+
+
+def load_json(path: str) -> Any:
+    """``json.load`` replacement that builds arrays/objects incrementally.
+
+    ``.jsonl`` files are read line by line into a list.
+    """
+    if path.lower().endswith(".jsonl"):
+        return [value for value, _, _ in iter_jsonl(path)]
+    items: list = []
+    members: dict = {}
+    kind = None
+    for kind, value, _, _ in iter_json_entries(path):
+        if kind == "value":
+            return value
+        if kind == "item":
+            items.append(value)
+        else:
+            key, member = value
+            members[key] = member
+    if kind is None:
+        # empty container: tell [] and {} apart
+        with open(path, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    return items if kind == "item" else members
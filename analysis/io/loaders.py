@@ -1,16 +1,43 @@
 #!/usr/bin/env python3
 """analysis.io.loaders
 
-Small helper to load CSV files into pandas DataFrames and normalize headers
-by stripping surrounding whitespace from column names.
+Helpers to load CSV inputs into pandas DataFrames.
+
+:func:`load_csv` reads one file and strips header whitespace.  The pipeline
+input layer is :func:`iter_csv_frames`:
+
+* ``--input`` may be a file, a directory (its ``*.csv`` files, optionally
+  compressed) or a glob; :func:`resolve_input_paths` expands it in sorted
+  order.
+* A ``columns`` callback maps each file's header to the columns to read and
+  their dtypes, so unused columns are never parsed.  The dtype
+  :data:`NUMERIC` reads a column as text and converts it to numbers when
+  every value parses, like pandas' own inference, without failing on stray
+  text answers.
+* Whole files are read with the ``pyarrow`` engine when it is installed
+  (it does not support chunked reads, which use the C engine).
+* Several files are read by a pool of threads, ahead of the consumer, and
+  yielded in path order as one stream of frames.
 """
 from __future__ import annotations
 
+import glob
+import importlib.util
 import os
-from typing import Optional
+import queue
+import threading
+from typing import Any, Callable, Iterator, List, Mapping, Optional, Sequence
 
 import pandas as pd
 
+NUMERIC = "numeric"
+CSV_SUFFIXES = (".csv", ".csv.gz", ".csv.bz2", ".csv.xz", ".csv.zst")
+DEFAULT_READ_THREADS = 4
+# frames each reader thread may hold before the consumer takes them
+_READ_AHEAD = 2
+
+ColumnSelector = Callable[[Sequence[str]], Mapping[str, str]]
+
 
 def load_csv(path: str, *, encoding: Optional[str] = None, **kwargs) -> pd.DataFrame:
     """Load a CSV file into a pandas DataFrame and strip header whitespace.
@@ -36,3 +63,133 @@ def load_csv(path: str, *, encoding: Optional[str] = None, **kwargs) -> pd.DataF
         df.columns = [c.strip() if isinstance(c, str) else c for c in df.columns]
 
     return df
+
+
+def is_glob(path: str) -> bool:
+    return any(ch in path for ch in "*?[")
+
+
+def resolve_input_paths(path: str) -> List[str]:
+    """The CSV files named by ``path``: a file, a directory or a glob."""
+    if os.path.isdir(path):
+        paths = [
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.lower().endswith(CSV_SUFFIXES) and os.path.isfile(os.path.join(path, name))
+        ]
+    elif is_glob(path) and not os.path.exists(path):
+        paths = [p for p in glob.glob(path) if os.path.isfile(p)]
+    elif os.path.exists(path):
+        return [path]
+    else:
+        raise FileNotFoundError(f"Input path does not exist: {path}")
+    if not paths:
+        raise FileNotFoundError(f"No CSV input files match: {path}")
+    return sorted(paths)
+
+
+def read_header(path: str) -> List[str]:
+    return pd.read_csv(path, nrows=0).columns.tolist()
+
+
+def _numeric(col: pd.Series) -> pd.Series:
+    values = pd.to_numeric(col, errors="coerce")
+    # keep the text when some values are not numbers (they would become NaN)
+    return values if values.isna().sum() == col.isna().sum() else col
+
+
+def read_csv_columns(
+    path: str,
+    columns: Optional[ColumnSelector] = None,
+    chunk_size: Optional[int] = None,
+) -> Iterator[pd.DataFrame]:
+    """Yield ``path`` as one frame, or in frames of ``chunk_size`` rows.
+
+    With ``columns``, only the columns it selects from the header are read,
+    in header order, with the dtypes it gives.  Without it every column is
+    read with pandas' type inference.
+    """
+    kwargs: dict = {}
+    numeric: List[str] = []
+    if columns is not None:
+        header = read_header(path)
+        selected = columns(header)
+        usecols = [c for c in header if c in selected]
+        numeric = [c for c in usecols if selected[c] == NUMERIC]
+        kwargs = {"usecols": usecols, "dtype": {c: "str" if c in numeric else selected[c] for c in usecols}}
+
+    def finish(df: pd.DataFrame) -> pd.DataFrame:
+        if columns is not None:
+            if df.columns.tolist() != kwargs["usecols"]:
+                df = df[kwargs["usecols"]]  # the pyarrow engine keeps usecols order
+            for c in numeric:
+                df[c] = _numeric(df[c])
+        return df
+
+    if chunk_size:
+        with pd.read_csv(path, chunksize=chunk_size, **kwargs) as reader:
+            for chunk in reader:
+                yield finish(chunk)
+        return
+    if importlib.util.find_spec("pyarrow") is not None:
+        kwargs["engine"] = "pyarrow"
+    yield finish(pd.read_csv(path, **kwargs))
+
+
+def _put(q: "queue.Queue[Any]", item: Any, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def iter_csv_frames(
+    paths: Sequence[str],
+    columns: Optional[ColumnSelector] = None,
+    chunk_size: Optional[int] = None,
+    threads: int = DEFAULT_READ_THREADS,
+) -> Iterator[pd.DataFrame]:
+    """Frames of every file in ``paths``, in order (see :func:`read_csv_columns`).
+
+    With more than one file and ``threads`` above one, up to ``threads``
+    files are read at once, each up to a couple of frames ahead.
+    """
+    if threads <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield from read_csv_columns(path, columns, chunk_size)
+        return
+    # deferred: only multi-file reads need a thread pool
+    from concurrent.futures import ThreadPoolExecutor
+
+    stop = threading.Event()
+    queues: List["queue.Queue[Any]"] = [queue.Queue(maxsize=_READ_AHEAD) for _ in paths]
+    done = object()
+
+    def read(path: str, q: "queue.Queue[Any]") -> None:
+        try:
+            for df in read_csv_columns(path, columns, chunk_size):
+                if not _put(q, df, stop):
+                    return
+        except BaseException as exc:
+            _put(q, exc, stop)
+            return
+        _put(q, done, stop)
+
+    # files start in path order, so the one being consumed is always running
+    pool = ThreadPoolExecutor(max_workers=min(threads, len(paths)), thread_name_prefix="csv-reader")
+    try:
+        for path, q in zip(paths, queues):
+            pool.submit(read, path, q)
+        for q in queues:
+            while True:
+                item = q.get()
+                if item is done:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+    finally:
+        stop.set()
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""analysis.lut
+
+Registry of the lookup/register tables listed in ``MappingConfig.lut_files``.
+
+Each file's SHA-1 is computed once when the registry is built, and its
+signature is derived from that digest.  The signature is stable across
+processes and runs (unlike ``hash(str(table))``) and costs nothing per row.
+Tables passed as plain objects are signed from a canonical JSON form of
+their contents instead; see :func:`table_signatures`.
+Table contents are only parsed when first accessed.  CSV/TSV tables are read
+memory-mapped, or Arrow-backed when ``pyarrow`` is installed.
+"""
+from __future__ import annotations
+
+import hashlib
+import importlib.util
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from analysis.io.digest import file_digest
+from analysis.io.jsonstream import load_json
+
+
+def _csv_options() -> Dict[str, Any]:
+    if importlib.util.find_spec("pyarrow") is not None:
+        return {"engine": "pyarrow", "dtype_backend": "pyarrow"}
+    return {"memory_map": True}
+
+
+def _signature(digest: bytes) -> int:
+    # a signed 64-bit int, like the ``hash()`` values it replaces
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+def _canonical(value: Any) -> Any:
+    # json.dumps fallback: DataFrames by column, numpy values as Python ones
+    if hasattr(value, "columns") and hasattr(value, "to_dict"):
+        return value.to_dict(orient="list")
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def table_signature(table: Any) -> int:
+    """Stable signature of an in-memory table (for callers without a registry).
+
+    Taken from the table's JSON with sorted keys, so equal contents give
+    equal signatures whatever their key order or container types.
+    """
+    try:
+        text = json.dumps(table, sort_keys=True, separators=(",", ":"), default=_canonical)
+    except (TypeError, ValueError):  # keys of mixed types cannot be sorted
+        text = repr(table)
+    return _signature(hashlib.sha1(text.encode("utf-8")).digest())
+
+
+def read_table(path: str) -> Any:
+    """Parse one LUT file according to its extension.
+
+    yaml and pandas are imported here, on first use, rather than at startup.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in {".json", ".jsonl"}:
+        # .jsonl -> list of records; large documents are built incrementally
+        return load_json(path)
+    if ext in {".yml", ".yaml"}:
+        import yaml
+
+        with open(path, "r", encoding="utf-8") as fh:
+            return yaml.safe_load(fh)
+    if ext in {".csv", ".tsv"}:
+        import pandas as pd
+
+        return pd.read_csv(path, sep="," if ext == ".csv" else "\t", **_csv_options())
+    # For TTL/OWL or unknown formats we keep the raw text
+    with open(path, "r", encoding="utf-8", errors="ignore") as fh:
+        return fh.read()
+
+
+class LutTable:
+    """One LUT file: its digest and signature, and its contents on demand.
+
+    A file that cannot be read (e.g. a directory or one without read
+    permission) has no digest; it becomes the ``{"error": ...}`` table at
+    once and is signed like an in-memory table.
+    """
+
+    __slots__ = ("path", "digest", "signature", "_data", "_loaded")
+
+    def __init__(self, path: str):
+        self.path = path
+        self._data: Any = None
+        self._loaded = False
+        try:
+            self.digest: Optional[str] = file_digest(path)
+        except OSError:
+            self.digest = None
+            self._data = {"error": f"Failed to read {path}"}
+            self._loaded = True
+            self.signature = table_signature(self._data)
+        else:
+            self.signature = _signature(bytes.fromhex(self.digest))
+
+    @property
+    def data(self) -> Any:
+        if not self._loaded:
+            try:
+                self._data = read_table(self.path)
+            except Exception:
+                self._data = {"error": f"Failed to read {self.path}"}
+            self._loaded = True
+        return self._data
+
+
+class LutRegistry(Sequence[Any]):
+    """The configured LUT files, in order; missing paths are skipped.
+
+    Indexing returns a table's parsed contents (loading it on first access),
+    as the plain list previously returned by ``load_lut_files`` did.
+    ``signatures`` holds the precomputed per-table signatures.
+    """
+
+    def __init__(self, paths: Sequence[str]):
+        self.tables: List[LutTable] = [LutTable(p) for p in paths or [] if p and os.path.exists(p)]
+        self.signatures: Tuple[int, ...] = tuple(t.signature for t in self.tables)
+
+    def __getitem__(self, idx: Any) -> Any:  # type: ignore[override]
+        if isinstance(idx, slice):
+            return [t.data for t in self.tables[idx]]
+        return self.tables[idx].data
+
+    def __len__(self) -> int:
+        return len(self.tables)
+
+    def __iter__(self) -> Iterator[Any]:
+        return (t.data for t in self.tables)
+
+
+def table_signatures(tables: Sequence[Any]) -> Sequence[int]:
+    """The ``table_N_signature`` of each table, as the correlations report them.
+
+    A :class:`LutRegistry` signs each file's bytes, which needs no parsing;
+    plain tables are signed from their parsed contents.  The two differ for
+    the same table, so a caller should stick to one form.  The pipeline
+    always passes its registry.
+    """
+    if isinstance(tables, LutRegistry):
+        return tables.signatures
+    return [table_signature(table) for table in tables]
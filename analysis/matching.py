@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""analysis.matching
+
+Compiled keyword matcher used by ``score_from_mapping``.
+
+The mapping YAML lists ``{category: {keyword: weight}}``.  Instead of counting
+every keyword against every row, the keywords are compiled once into a hash
+index from lower-cased token (or token n-gram for multi-word phrases) to the
+``(category, keyword, weight)`` entries it scores.  A row is then matched with a
+single ``Counter`` pass over its words, so the cost per row depends on the row
+length rather than on the size of the mapping.
+
+:meth:`KeywordMatcher.match_ids` does the same over a row's token ids
+(:mod:`analysis.text`): the index is translated to lower-cased token ids
+per vocabulary (see :class:`_IdTables`), and rows are matched without
+touching their strings.
+"""
+from __future__ import annotations
+
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from analysis.text import Vocabulary, current_vocabulary
+
+# (category, keyword as written in the mapping, weight)
+Entry = Tuple[str, str, float]
+
+
+class _IdTables:
+    """A matcher's token and phrase tables in the ids of one vocabulary.
+
+    Keywords are resolved with :meth:`Vocabulary.get`, so the vocabulary
+    never gains tokens that no text produced.  A keyword that is not in the
+    vocabulary cannot match yet; it stays pending until a text adds it,
+    which :meth:`refresh` notices by looking only at the tokens added since
+    its last call.
+    """
+
+    def __init__(self, matcher: "KeywordMatcher", vocab: Vocabulary):
+        self.vocab = vocab
+        self.tokens: Dict[int, List[int]] = {}
+        self.phrases: Dict[int, Dict[Tuple[int, ...], List[int]]] = {}
+        self._phrase_parts = matcher._phrases
+        # keywords and phrase words not in the vocabulary yet
+        self._pending = dict(matcher._tokens)
+        self._pending_words = {part for table in matcher._phrases.values() for parts in table for part in parts}
+        self._word_ids: Dict[str, int] = {}
+        self._seen = len(vocab)
+        self._resolve((token, vocab.get(token)) for token in [*self._pending, *self._pending_words])
+
+    def refresh(self) -> None:
+        """Resolve pending keywords against the tokens added since the last call."""
+        tokens = self.vocab.tokens
+        start, self._seen = self._seen, len(tokens)
+        if start < self._seen and (self._pending or self._pending_words):
+            self._resolve((tokens[tid], tid) for tid in range(start, self._seen))
+
+    def _resolve(self, found: Iterable[Tuple[str, Optional[int]]]) -> None:
+        new_words = False
+        for token, tid in found:
+            if tid is None:
+                continue
+            entries = self._pending.pop(token, None)
+            if entries is not None:
+                self.tokens[tid] = entries
+            if token in self._pending_words:
+                self._pending_words.discard(token)
+                self._word_ids[token] = tid
+                new_words = True
+        if new_words:
+            # only phrases whose words are all known can match
+            ids = self._word_ids
+            self.phrases = {
+                size: {
+                    tuple(ids[part] for part in parts): entries
+                    for parts, entries in table.items()
+                    if all(part in ids for part in parts)
+                }
+                for size, table in self._phrase_parts.items()
+            }
+
+
+class KeywordMatcher:
+    """Keyword/phrase index compiled from ``MappingConfig.categories``.
+
+    Single-word keywords match a word when their lower-cased forms are equal,
+    exactly like the original ``list.count`` implementation.  Keywords that
+    contain whitespace are treated as phrases and match runs of consecutive
+    words.
+    """
+
+    def __init__(self, categories: Mapping[str, Mapping[str, float]]):
+        self.categories: List[str] = list(categories)
+        self.entries: List[Entry] = []
+        self._tokens: Dict[str, List[int]] = {}
+        self._phrases: Dict[int, Dict[Tuple[str, ...], List[int]]] = {}
+        # the tables in the ids of the last vocabulary matched against
+        self._id_tables: Optional[_IdTables] = None
+        for cat, mapping in categories.items():
+            for kw, weight in mapping.items():
+                pos = len(self.entries)
+                self.entries.append((cat, kw, float(weight)))
+                kw_lower = str(kw).lower()
+                parts = tuple(kw_lower.split())
+                if len(parts) > 1:
+                    self._phrases.setdefault(len(parts), {}).setdefault(parts, []).append(pos)
+                else:
+                    self._tokens.setdefault(kw_lower, []).append(pos)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def count_hits(self, words: Sequence[str]) -> Dict[int, int]:
+        """Return ``{entry position: occurrence count}`` for the given words."""
+        word_lower = [w.lower() for w in words]
+        hits: Dict[int, int] = {}
+        for token, count in Counter(word_lower).items():
+            for pos in self._tokens.get(token, ()):
+                hits[pos] = count
+        for size, table in self._phrases.items():
+            if len(word_lower) < size:
+                continue
+            grams = Counter(
+                tuple(word_lower[i:i + size]) for i in range(len(word_lower) - size + 1)
+            )
+            for gram, count in grams.items():
+                for pos in table.get(gram, ()):
+                    hits[pos] = count
+        return hits
+
+    def _tables(self, vocab: Vocabulary) -> _IdTables:
+        if self._id_tables is None or self._id_tables.vocab is not vocab:
+            self._id_tables = _IdTables(self, vocab)
+        else:
+            self._id_tables.refresh()
+        return self._id_tables
+
+    def count_hits_ids(self, ids: Sequence[int], vocab: Optional[Vocabulary] = None) -> Dict[int, int]:
+        """:meth:`count_hits` for token ids in ``vocab`` (default: the current vocabulary)."""
+        if vocab is None:
+            vocab = current_vocabulary()
+        tables = self._tables(vocab)
+        tokens, phrases = tables.tokens, tables.phrases
+        lowered = vocab.lowered(ids)
+        hits: Dict[int, int] = {}
+        for token, count in Counter(lowered).items():
+            for pos in tokens.get(token, ()):
+                hits[pos] = count
+        for size, table in phrases.items():
+            if len(lowered) < size:
+                continue
+            grams = Counter(zip(*(lowered[i:] for i in range(size))))
+            for gram, count in grams.items():
+                for pos in table.get(gram, ()):
+                    hits[pos] = count
+        return hits
+
+    def match(self, words: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Return per-category ``{"score": float, "hits": {keyword: count}}``.
+
+        Hits are reported (and scores summed) in mapping order so the result is
+        identical to scanning every keyword in turn.
+        """
+        words = words if isinstance(words, Sequence) else list(words)
+        return self._details(self.count_hits(words))
+
+    def match_ids(self, ids: Sequence[int], vocab: Optional[Vocabulary] = None) -> Dict[str, Dict[str, Any]]:
+        """:meth:`match` for token ids in ``vocab``."""
+        return self._details(self.count_hits_ids(ids, vocab))
+
+    def _details(self, hits: Dict[int, int]) -> Dict[str, Dict[str, Any]]:
+        details: Dict[str, Dict[str, Any]] = {
+            cat: {"score": 0.0, "hits": {}} for cat in self.categories
+        }
+        for pos in sorted(hits):
+            cat, kw, weight = self.entries[pos]
+            count = hits[pos]
+            detail = details[cat]
+            detail["score"] += count * weight
+            detail["hits"][kw] = count
+        return details
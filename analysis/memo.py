@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""analysis.memo
+
+Bounded in-memory memoisation of the per-row stages.
+
+Survey inputs repeat themselves: the same lyrics, song titles and short
+answers occur thousands of times.  A :class:`LruMemo` maps a key to a value
+computed from it, and evicts the least recently used entries once their
+estimated size (:func:`approx_size`) passes ``max_bytes``.
+
+Entries are only stored on a key's second sighting: callers store keys
+repeated within a frame, and a "doorkeeper" set remembers the hashes of keys
+seen once (:meth:`LruMemo.admit`), as in TinyLFU.  Inputs without repeats
+therefore pay for a hash per key, not for keeping and evicting entries.  The
+doorkeeper holds about one hash per 2 KiB of ``max_bytes`` and is reset when
+full; it is not counted in the cap.
+
+A :class:`~analysis.pipeline.Pipeline` keeps one memo for its lifetime, so
+entries carry over from one run to the next.  With ``--workers`` each worker
+process has its own.  The memo holds two kinds of entries:
+
+* a row's text -> its feature and keyword score records;
+* a row's normalised artist/song tokens and lyrics -> the MSD tokens
+  looked up for it (see :func:`analysis.msd.lookup_msd_batch`).
+
+Both depend on the mapping config, so the memo is cleared when the config
+is reloaded.  Text entries hold token ids, so it is also cleared when the
+pipeline starts a new vocabulary (see :mod:`analysis.text`).
+``hits``/``misses``/``evictions`` count over the memo's lifetime; runs
+report their own counts in the ``--profile`` counters.
+"""
+from __future__ import annotations
+
+import sys
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Mapping, Optional, Sequence, Set, Tuple
+
+DEFAULT_MEMO_BYTES = 128 << 20
+
+# fixed costs for the size estimates below, measured with approx_size()
+_RECORD_BYTES = 250  # the entry tuple, its numbers and the details dict
+_CATEGORY_BYTES = 600  # one category's score details
+_HIT_BYTES = 85  # one keyword in a category's hits
+_LOOKUP_BYTES = 240  # key tuples and the entry list
+_ENTRY_BYTES = 64  # one (token, extra) pair
+_EXTRA_BYTES = 300  # an approximate match's query and score
+# bytes of max_bytes per doorkeeper slot (about one entry)
+_DOORKEEPER_BYTES = 2048
+
+
+def approx_size(obj: Any) -> int:
+    """Estimated memory of ``obj`` and what it holds, in bytes.
+
+    Follows dicts, lists, tuples, sets and ``__slots__`` objects; shared
+    objects are counted every time they are reached.
+    """
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, array, int, float)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        return size + sum(approx_size(k) + approx_size(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(approx_size(v) for v in obj)
+    for name in getattr(type(obj), "__slots__", ()):
+        size += approx_size(getattr(obj, name, None))
+    return size
+
+
+def text_entry_size(text: str, token_ids: Any, details: Mapping[str, Any]) -> int:
+    """:func:`approx_size` of a text's entry, estimated from its parts.
+
+    Exact sizing walks every nested dict; this runs once per new text.
+    """
+    hits = sum(len(detail.get("hits") or ()) for detail in details.values())
+    return (
+        sys.getsizeof(text) + sys.getsizeof(token_ids) + _RECORD_BYTES
+        + _CATEGORY_BYTES * len(details) + _HIT_BYTES * hits
+    )
+
+
+def lookup_entry_size(key: Tuple[Tuple[str, ...], str], entries: Sequence[Tuple[str, Any]]) -> int:
+    """:func:`approx_size` of an MSD lookup entry, estimated from its parts."""
+    tokens, lyrics = key
+    size = _LOOKUP_BYTES + sys.getsizeof(lyrics) + sum(map(sys.getsizeof, tokens))
+    for token, extra in entries:
+        size += _ENTRY_BYTES + sys.getsizeof(token) + (_EXTRA_BYTES if extra else 0)
+    return size
+
+
+class LruMemo:
+    """``key -> value`` cache bounded by estimated size; see the module docstring.
+
+    ``max_bytes <= 0`` disables it: nothing is stored.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MEMO_BYTES):
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._bytes = 0
+        self._seen: Set[int] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """The value for ``key`` (now the most recently used), or ``default``."""
+        entries = self._entries
+        if key in entries:
+            entries.move_to_end(key)
+            self.hits += 1
+            return entries[key]
+        self.misses += 1
+        return default
+
+    def admit(self, key: Hashable) -> bool:
+        """Whether to store ``key``, a miss: only if it was seen before."""
+        if not self.enabled:
+            return False
+        h = hash(key)
+        seen = self._seen
+        if h in seen:
+            return True
+        if len(seen) >= max(1024, self.max_bytes // _DOORKEEPER_BYTES):
+            seen.clear()
+        seen.add(h)
+        return False
+
+    def put(self, key: Hashable, value: Any, size: Optional[int] = None) -> None:
+        """Store ``value`` (callers check :meth:`admit` first).
+
+        ``size`` defaults to :func:`approx_size` of the key and value.
+        """
+        if size is None:
+            size = approx_size(key) + approx_size(value)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= self._sizes[key]
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        self._sizes[key] = size
+        self._bytes += size
+        self._evict()
+
+    def resize(self, max_bytes: int) -> None:
+        self.max_bytes = int(max_bytes)
+        self._evict()
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._sizes.clear()
+        self._bytes = 0
+        self._seen.clear()
+
+    def _evict(self) -> None:
+        entries, sizes = self._entries, self._sizes
+        while self._bytes > self.max_bytes and entries:
+            key, _ = entries.popitem(last=False)
+            self._bytes -= sizes.pop(key)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,1102 @@
+#!/usr/bin/env python3
+"""analysis.msd
+
+Million Song Dataset (MSD) tag index: loading, on-disk caching and lookup.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+from array import array
+from bisect import bisect_right
+from typing import TYPE_CHECKING, Any, BinaryIO, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analysis.fuzzy import FUZZY_METHODS, TrigramIndex
+from analysis.io.digest import file_digest, file_signature
+from analysis.io.jsonl import json_default
+from analysis.io.jsonstream import iter_json_entries, iter_jsonl
+from analysis.memo import LruMemo, lookup_entry_size
+from analysis.text import WORD_RE
+
+if TYPE_CHECKING:
+    import sqlite3
+
+# one ``.cls`` record per line: ``track<sep>tag ...``; comments start with '#'
+_CLS_LINE_RE = re.compile(r"^[^\S\r\n]*([^\s,#][^\s,]*)(?:[^\S\r\n]|,)+([^\s,]+)", re.M)
+_CLS_BLOCK_SIZE = 8 << 20
+_TOKEN_FIELDS = ("track", "artist", "title")
+
+
+def _normalise_token(value: Optional[str]) -> str:
+    if not value:
+        return ""
+    # collapse whitespace runs and trim; same as re.sub(r"\s+", " ", value).strip()
+    return " ".join(value.split()).lower()
+
+
+def _normalise_column(col: pd.Series) -> List[str]:
+    """:func:`_normalise_token` over a whole column; missing values become ``""``."""
+    missing = col.isna().tolist()
+    return [
+        "" if absent else " ".join(str(value).split()).lower()
+        for value, absent in zip(col.tolist(), missing)
+    ]
+
+
+class PairRaws:
+    """Raw records of ``.cls`` style sources, built on access as ``{"track", "tag"}``."""
+
+    __slots__ = ("tracks", "tags")
+
+    def __init__(self, tracks: Sequence[Any], tags: Sequence[Any]):
+        self.tracks = tracks
+        self.tags = tags
+
+    def __len__(self) -> int:
+        return len(self.tracks)
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        return {"track": self.tracks[i], "tag": self.tags[i]}
+
+
+class TableRaws:
+    """Raw records of CSV/TSV sources, kept as the parsed column arrays."""
+
+    __slots__ = ("names", "arrays")
+
+    def __init__(self, df: pd.DataFrame):
+        self.names = [str(c) for c in df.columns]
+        self.arrays = [df[c].array for c in df.columns]
+
+    def __len__(self) -> int:
+        return len(self.arrays[0]) if self.arrays else 0
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        return {name: _native(arr[i]) for name, arr in zip(self.names, self.arrays)}
+
+
+class JsonRaws:
+    """Raw records of JSON sources, re-read from the file and decoded on access.
+
+    Only each entry's byte offset and length are kept.  Like the connection of
+    :class:`CachedMsdIndex`, the file handle is opened lazily once per process.
+    """
+
+    __slots__ = ("path", "offsets", "lengths", "_fh", "_fh_pid")
+
+    def __init__(self, path: str, offsets: "array[int]", lengths: "array[int]"):
+        self.path = path
+        self.offsets = offsets
+        self.lengths = lengths
+        self._fh: Optional[BinaryIO] = None
+        self._fh_pid: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        if self._fh is None or self._fh_pid != os.getpid():
+            self._fh = open(self.path, "rb")
+            self._fh_pid = os.getpid()
+        self._fh.seek(self.offsets[i])
+        return json.loads(self._fh.read(self.lengths[i]))
+
+    def __getstate__(self) -> Tuple[str, "array[int]", "array[int]"]:
+        return self.path, self.offsets, self.lengths
+
+    def __setstate__(self, state: Tuple[str, "array[int]", "array[int]"]) -> None:
+        self.__init__(*state)
+
+    def close(self) -> None:
+        if self._fh is not None and self._fh_pid == os.getpid():
+            self._fh.close()
+        self._fh = None
+
+
+def _native(value: Any) -> Any:
+    # numpy scalars -> the equivalent Python objects
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class MsdColumns:
+    """Column-oriented contents of one MSD source file.
+
+    ``tokens`` holds one normalised token array per key field, named in
+    ``fields`` (default: track, artist, title in that order); row ``i`` of the
+    source is described by ``tokens[*][i]``, ``tags[i]``, ``weights[i]`` and
+    ``raws[i]``.  ``raws`` only has to support indexing, so sources can build
+    raw records on demand.
+    """
+
+    __slots__ = ("path", "tokens", "fields", "tags", "weights", "raws")
+
+    def __init__(
+        self,
+        path: str,
+        tokens: List[Sequence[str]],
+        tags: Sequence[Any],
+        weights: Sequence[float],
+        raws: Sequence[Any],
+        fields: Optional[Sequence[str]] = None,
+    ):
+        self.path = path
+        self.tokens = tokens
+        self.fields = tuple(fields) if fields is not None else _TOKEN_FIELDS[:len(tokens)]
+        self.tags = tags
+        self.weights = weights
+        self.raws = raws
+
+    def name_tokens(self) -> List[str]:
+        """Distinct artist/title tokens (track ids excluded), sorted."""
+        names = set()
+        for col, field in zip(self.tokens, self.fields):
+            if field != "track":
+                names.update(col)
+        names.discard("")
+        return sorted(names)
+
+    def __len__(self) -> int:
+        return len(self.tags)
+
+    def posting_runs(self) -> Tuple[List[str], List[int], List[int], List[int]]:
+        """Group rows by token in one sort.
+
+        Returns ``(tokens, starts, ends, rows)`` where the rows of
+        ``tokens[k]`` are ``rows[starts[k]:ends[k]]`` in file order.  A row is
+        listed once per distinct token even when e.g. its artist and title
+        normalise to the same string; empty tokens are dropped.
+        """
+        n = len(self)
+        if not n or not self.tokens:
+            return [], [], [], []
+        tokens = np.concatenate([np.asarray(col, dtype=object) for col in self.tokens])
+        rows = np.tile(np.arange(n), len(self.tokens))
+        keep = tokens != ""
+        codes, uniques = pd.factorize(tokens[keep])
+        rows = rows[keep]
+        if not len(codes):
+            return [], [], [], []
+        order = np.lexsort((rows, codes))
+        codes, rows = codes[order], rows[order]
+        # drop (token, row) duplicates, now adjacent
+        distinct = np.ones(len(codes), dtype=bool)
+        distinct[1:] = (codes[1:] != codes[:-1]) | (rows[1:] != rows[:-1])
+        codes, rows = codes[distinct], rows[distinct]
+        bounds = np.flatnonzero(np.diff(codes)) + 1
+        starts = [0] + bounds.tolist()
+        ends = bounds.tolist() + [len(codes)]
+        return uniques[codes[starts]].tolist(), starts, ends, rows.tolist()
+
+    def postings(self) -> Dict[str, List[int]]:
+        """Return ``{token: row numbers}``; see :meth:`posting_runs`."""
+        tokens, starts, ends, rows = self.posting_runs()
+        return {token: rows[start:end] for token, start, end in zip(tokens, starts, ends)}
+
+
+def _read_json_source(path: str) -> MsdColumns:
+    """Stream a JSON/JSONL source entry by entry.
+
+    ``.jsonl`` files hold one entry per line; ``.json`` files hold an array of
+    entries or a ``{track: tag}`` mapping.  Entries are reduced to their index
+    columns as they are decoded; only each entry's byte offset and length are
+    kept for lazy ``raw`` records, so neither the parsed document nor its text
+    is held in memory.
+    """
+    if path.lower().endswith(".jsonl"):
+        stream: Iterator[Tuple[str, Any, int, int]] = (
+            ("item", value, offset, length) for value, offset, length in iter_jsonl(path)
+        )
+    else:
+        stream = iter_json_entries(path)
+    tokens: List[List[str]] = [[], [], []]
+    tags: List[Any] = []
+    weights: List[float] = []
+    offsets = array("Q")
+    lengths = array("Q")
+    keys: List[str] = []
+    mapping = False
+    for kind, value, offset, length in stream:
+        if kind == "pair":
+            mapping = True
+            key, tag = value
+            entry: Mapping[str, Any] = {"track": key, "tag": tag}
+            keys.append(key)
+        elif kind == "item" and isinstance(value, dict):
+            entry = value
+            offsets.append(offset)
+            lengths.append(length)
+        else:
+            raise ValueError(f"unsupported MSD entry at byte {offset} of {path}: {type(value).__name__} {kind}")
+        for col, field in zip(tokens, _TOKEN_FIELDS):
+            col.append(_normalise_token(entry.get(field)))
+        tags.append(entry.get("tag") or entry.get("genre"))
+        weights.append(float(entry.get("weight", 1.0)))
+    raws: Sequence[Any] = PairRaws(keys, tags) if mapping else JsonRaws(path, offsets, lengths)
+    return MsdColumns(path, tokens, tags, weights, raws)
+
+
+def _read_table_source(path: str, sep: str) -> MsdColumns:
+    df = pd.read_csv(path, sep=sep)
+    n = len(df)
+    fields = [field for field in _TOKEN_FIELDS if field in df.columns]
+    tokens = [_normalise_column(df[field]) for field in fields]
+    tags = df["tag"].tolist() if "tag" in df.columns else [None] * n
+    if "genre" in df.columns:
+        tags = [tag or genre for tag, genre in zip(tags, df["genre"].tolist())]
+    if "weight" in df.columns:
+        weights = df["weight"].astype(float).tolist()
+    else:
+        weights = [1.0] * n
+    return MsdColumns(path, tokens, tags, weights, TableRaws(df), fields)
+
+
+def _read_cls_source(path: str) -> MsdColumns:
+    track_ids: List[str] = []
+    tags: List[str] = []
+    # a handful of distinct genres: share one string object per tag
+    interned: Dict[str, str] = {}
+    with open(path, "r", encoding="utf-8", errors="ignore") as fh:
+        tail = ""
+        while True:
+            block = fh.read(_CLS_BLOCK_SIZE)
+            if not block:
+                block, tail = tail, ""
+            else:
+                block = tail + block
+                cut = block.rfind("\n") + 1
+                block, tail = block[:cut], block[cut:]
+            for track_id, tag in _CLS_LINE_RE.findall(block):
+                track_ids.append(track_id)
+                tags.append(interned.setdefault(tag, tag))
+            if not block and not tail:
+                break
+    tokens = [[track_id.lower() for track_id in track_ids]]
+    return MsdColumns(path, tokens, tags, [1.0] * len(tags), PairRaws(track_ids, tags))
+
+
+def _read_msd_source(path: str) -> MsdColumns:
+    """Read a single MSD source file into columns."""
+    _, ext = os.path.splitext(path)
+    ext = ext.lower()
+    if ext in {".json", ".jsonl"}:
+        return _read_json_source(path)
+    if ext in {".csv", ".tsv"}:
+        return _read_table_source(path, "," if ext == ".csv" else "\t")
+    # fall back to .cls style: track tag ...
+    return _read_cls_source(path)
+
+
+class MsdIndex(Mapping[str, Dict[str, Any]]):
+    """Memory-compact in-memory MSD index.
+
+    Records are stored column-wise: an interned tag id and a weight per record
+    in flat arrays, the path once per source, and the source's raw records in
+    whatever compact form its reader produced.  Tokens map to record ids in a
+    single CSR structure (``indptr``/``indices``), so a record that is indexed
+    under its track id, artist and title is stored once.  Match payloads,
+    including ``raw``, are only materialised when a token is looked up.
+
+    ``index.get(token)`` returns ``{"matches": [payload, ...]}`` exactly like
+    the plain dictionary index did, and ``"__errors__"`` lists unreadable
+    sources.
+    """
+
+    def __init__(self) -> None:
+        self._token_ids: Dict[str, int] = {}
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._indices = np.zeros(0, dtype=np.uint32)
+        self._pending: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._tags: List[Any] = []
+        self._tag_ids: Dict[Any, int] = {}
+        self._record_tags = array("I")
+        self._weights = array("d")
+        # parallel lists: first record id, path and raw store of each source
+        self._source_starts: List[int] = []
+        self._source_paths: List[str] = []
+        self._source_raws: List[Sequence[Any]] = []
+        # artist/title tokens, for the approximate-match index
+        self._names: set = set()
+        self.errors: Dict[str, int] = {}
+
+    @classmethod
+    def from_paths(cls, paths: Sequence[str]) -> "MsdIndex":
+        index = cls()
+        for path in paths or []:
+            if not path:
+                continue
+            if not os.path.exists(path):
+                continue
+            try:
+                columns = _read_msd_source(path)
+            except Exception:
+                # For robustness we simply skip unreadable files, leaving a
+                # clue in the index for later debugging.
+                index.errors[path] = index.errors.get(path, 0) + 1
+                continue
+            index.add_source(columns)
+        index._compact()
+        return index
+
+    def _intern_tag(self, tag: Any) -> int:
+        try:
+            tag_id = self._tag_ids.get(tag)
+        except TypeError:  # unhashable tag (e.g. a JSON list)
+            self._tags.append(tag)
+            return len(self._tags) - 1
+        if tag_id is None:
+            tag_id = self._tag_ids[tag] = len(self._tags)
+            self._tags.append(tag)
+        return tag_id
+
+    def add_source(self, columns: MsdColumns) -> None:
+        """Append the records of one source; its matches follow earlier sources."""
+        tokens, starts, ends, rows = columns.posting_runs()
+        offset = len(self._weights)
+        self._source_starts.append(offset)
+        self._source_paths.append(columns.path)
+        self._source_raws.append(columns.raws)
+        self._record_tags.extend(self._intern_tag(tag) for tag in columns.tags)
+        self._weights.extend(columns.weights)
+        self._names.update(columns.name_tokens())
+        if not tokens:
+            return
+        token_ids = self._token_ids
+        ids = np.fromiter(
+            (token_ids.setdefault(token, len(token_ids)) for token in tokens),
+            dtype=np.int64,
+            count=len(tokens),
+        )
+        lengths = np.asarray(ends, dtype=np.int64) - np.asarray(starts, dtype=np.int64)
+        self._pending.append((np.repeat(ids, lengths), np.asarray(rows, dtype=np.int64) + offset))
+
+    def _compact(self) -> None:
+        """Fold pending postings into the CSR arrays (stable: keeps source order)."""
+        if not self._pending:
+            return
+        n_tokens = len(self._token_ids)
+        counts = np.diff(self._indptr)
+        old_tokens = np.repeat(np.arange(len(counts)), counts)
+        token_col = np.concatenate([old_tokens] + [t for t, _ in self._pending])
+        record_col = np.concatenate([self._indices.astype(np.int64)] + [r for _, r in self._pending])
+        order = np.argsort(token_col, kind="stable")
+        self._indices = record_col[order].astype(np.uint32)
+        self._indptr = np.zeros(n_tokens + 1, dtype=np.int64)
+        np.cumsum(np.bincount(token_col, minlength=n_tokens), out=self._indptr[1:])
+        self._pending = []
+
+    def record_ids(self, token: str) -> np.ndarray:
+        """Record ids indexed under ``token`` (empty when unknown)."""
+        self._compact()
+        token_id = self._token_ids.get(token)
+        if token_id is None:
+            return self._indices[:0]
+        return self._indices[self._indptr[token_id]:self._indptr[token_id + 1]]
+
+    def name_tokens(self) -> List[str]:
+        """Sorted artist/title tokens (the keys of the approximate-match index)."""
+        return sorted(self._names)
+
+    @property
+    def document_count(self) -> int:
+        """Number of MSD records."""
+        return len(self._weights)
+
+    def document_frequencies(self, tokens: Sequence[str]) -> np.ndarray:
+        """Number of records indexed under each token (0 when unknown).
+
+        Read off the CSR offsets, so the statistics cost nothing to build.
+        """
+        self._compact()
+        token_ids = self._token_ids
+        ids = np.fromiter((token_ids.get(t, -1) for t in tokens), dtype=np.int64, count=len(tokens))
+        out = np.zeros(len(tokens), dtype=np.int64)
+        known = ids >= 0
+        out[known] = self._indptr[ids[known] + 1] - self._indptr[ids[known]]
+        return out
+
+    def payload(self, record_id: int) -> Dict[str, Any]:
+        source = bisect_right(self._source_starts, record_id) - 1
+        return {
+            "tag": self._tags[self._record_tags[record_id]],
+            "weight": self._weights[record_id],
+            "path": self._source_paths[source],
+            "raw": self._source_raws[source][record_id - self._source_starts[source]],
+        }
+
+    def get(self, token: str, default: Any = None) -> Any:  # type: ignore[override]
+        if token == "__errors__":
+            return dict(self.errors) if self.errors else default
+        ids = self.record_ids(token)
+        if not len(ids):
+            return default
+        return {"matches": [self.payload(record_id) for record_id in ids.tolist()]}
+
+    def __getitem__(self, token: str) -> Dict[str, Any]:
+        info = self.get(token)
+        if info is None:
+            raise KeyError(token)
+        return info
+
+    def __contains__(self, token: object) -> bool:
+        if token == "__errors__":
+            return bool(self.errors)
+        return token in self._token_ids
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._token_ids
+        if self.errors:
+            yield "__errors__"
+
+    def __len__(self) -> int:
+        return len(self._token_ids) + (1 if self.errors else 0)
+
+
+def load_msd_index(paths: Sequence[str], cache: Optional[str] = None) -> Mapping[str, Dict[str, Any]]:
+    """Load MSD (Million Song Dataset) tag/classification information.
+
+    The loader is intentionally flexible – it accepts the original
+    ``msd_tagtraum_cd2.cls`` format (tab or whitespace separated track id and
+    tag), CSV/TSV files, or JSON documents with either a mapping or list of
+    entries.  The result maps a normalised token (track id, artist name, or
+    song title) to ``{"matches": [...]}`` with metadata describing the tag hits
+    and provenance path; it is a compact :class:`MsdIndex`.
+
+    When ``cache`` names an SQLite file the compiled index is persisted there
+    and a :class:`CachedMsdIndex` is returned instead; see that class for the
+    invalidation rules.
+    """
+
+    if cache:
+        return CachedMsdIndex(cache, paths)
+    return MsdIndex.from_paths(paths)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    -- every record of the source, indexed or not (see document_count)
+    record_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS records (
+    source_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (source_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tokens (
+    token TEXT NOT NULL,
+    source_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tokens_by_token ON tokens (token);
+CREATE TABLE IF NOT EXISTS token_stats (
+    token TEXT NOT NULL,
+    source_id INTEGER NOT NULL,
+    df INTEGER NOT NULL,
+    PRIMARY KEY (token, source_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS name_tokens (
+    token TEXT NOT NULL,
+    source_id INTEGER NOT NULL,
+    PRIMARY KEY (token, source_id)
+) WITHOUT ROWID;
+"""
+# PRAGMA user_version of the cache layout; older caches are rebuilt once
+_CACHE_VERSION = 2
+_CACHE_TABLES = ("tokens", "token_stats", "name_tokens", "records", "sources")
+
+
+class CachedMsdIndex(Mapping[str, Dict[str, Any]]):
+    """MSD index persisted in an SQLite file and queried on demand.
+
+    Each source file is stored under its absolute path together with its size,
+    modification time and SHA-1.  On open, a source whose size and mtime match
+    the stored values is used as-is; otherwise its content hash is compared and
+    only a source whose content actually changed is re-parsed.  Opening a warm
+    cache therefore costs one ``stat`` per source, and lookups read only the
+    rows for the requested token.
+
+    The object behaves like the dictionary returned by :func:`load_msd_index`
+    (``index.get(token)["matches"]``), including the ``"__errors__"`` entry for
+    sources that could not be parsed.  Connections are opened per process so
+    the index can be used after ``fork``.
+    """
+
+    def __init__(self, db_path: str, paths: Sequence[str]):
+        self.db_path = db_path
+        self._conn_pid: Optional[int] = None
+        self._conn_obj: Optional[sqlite3.Connection] = None
+        # source id -> (position in ``paths``, path as configured)
+        self._sources: Dict[int, Tuple[int, str]] = {}
+        self._errors: Dict[str, int] = {}
+        self._sync([p for p in paths or [] if p and os.path.exists(p)])
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        if self._conn_obj is None or self._conn_pid != os.getpid():
+            import sqlite3  # deferred: only --msd-cache runs need it
+
+            self._conn_obj = sqlite3.connect(self.db_path)
+            self._conn_pid = os.getpid()
+        return self._conn_obj
+
+    def _sync(self, paths: Sequence[str]) -> None:
+        conn = self._conn
+        if conn.execute("PRAGMA user_version").fetchone()[0] < _CACHE_VERSION:
+            # an older layout: drop it and re-parse every source
+            with conn:
+                for table in _CACHE_TABLES:
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.execute(f"PRAGMA user_version = {_CACHE_VERSION}")
+        conn.executescript(_SCHEMA)
+        for position, path in enumerate(paths):
+            sig = file_signature(path)
+            row = conn.execute(
+                "SELECT id, size, mtime_ns, digest FROM sources WHERE path = ?", (sig.path,)
+            ).fetchone()
+            if row is not None and (row[1], row[2]) == (sig.size, sig.mtime_ns):
+                self._sources[row[0]] = (position, path)
+                continue
+            digest = file_digest(path)
+            if row is not None and row[3] == digest:
+                # touched but unchanged
+                with conn:
+                    conn.execute(
+                        "UPDATE sources SET size = ?, mtime_ns = ? WHERE id = ?",
+                        (sig.size, sig.mtime_ns, row[0]),
+                    )
+                self._sources[row[0]] = (position, path)
+                continue
+            source_id = self._rebuild_source(path, sig.size, sig.mtime_ns, digest, row)
+            if source_id is not None:
+                self._sources[source_id] = (position, path)
+
+    def _rebuild_source(
+        self, path: str, size: int, mtime_ns: int, digest: str, stale: Optional[Tuple[Any, ...]]
+    ) -> Optional[int]:
+        conn = self._conn
+        try:
+            with conn:
+                if stale is not None:
+                    conn.execute("DELETE FROM tokens WHERE source_id = ?", (stale[0],))
+                    conn.execute("DELETE FROM token_stats WHERE source_id = ?", (stale[0],))
+                    conn.execute("DELETE FROM name_tokens WHERE source_id = ?", (stale[0],))
+                    conn.execute("DELETE FROM records WHERE source_id = ?", (stale[0],))
+                    conn.execute("DELETE FROM sources WHERE id = ?", (stale[0],))
+                columns = _read_msd_source(path)
+                cur = conn.execute(
+                    "INSERT INTO sources (path, size, mtime_ns, digest, record_count) VALUES (?, ?, ?, ?, ?)",
+                    (os.path.abspath(path), size, mtime_ns, digest, len(columns)),
+                )
+                source_id = cur.lastrowid
+                postings = columns.postings()
+                indexed = sorted({row for rows in postings.values() for row in rows})
+                conn.executemany(
+                    "INSERT INTO records VALUES (?, ?, ?)",
+                    (
+                        (source_id, seq, json.dumps(
+                            {"tag": columns.tags[seq], "weight": columns.weights[seq], "raw": columns.raws[seq]},
+                            default=json_default,
+                        ))
+                        for seq in indexed
+                    ),
+                )
+                if isinstance(columns.raws, JsonRaws):
+                    columns.raws.close()
+                conn.executemany(
+                    "INSERT INTO tokens VALUES (?, ?, ?)",
+                    ((token, source_id, seq) for token, rows in postings.items() for seq in rows),
+                )
+                conn.executemany(
+                    "INSERT INTO token_stats VALUES (?, ?, ?)",
+                    ((token, source_id, len(rows)) for token, rows in postings.items()),
+                )
+                conn.executemany(
+                    "INSERT INTO name_tokens VALUES (?, ?)",
+                    ((token, source_id) for token in columns.name_tokens()),
+                )
+        except Exception:
+            # same contract as load_msd_index: skip the source, note the error
+            self._errors[path] = self._errors.get(path, 0) + 1
+            return None
+        return source_id
+
+    def get(self, token: str, default: Any = None) -> Any:  # type: ignore[override]
+        if token == "__errors__":
+            return dict(self._errors) if self._errors else default
+        if not self._sources:
+            return default
+        rows = self._conn.execute(
+            "SELECT r.source_id, r.seq, r.payload FROM tokens t "
+            "JOIN records r ON r.source_id = t.source_id AND r.seq = t.seq "
+            "WHERE t.token = ?",
+            (token,),
+        ).fetchall()
+        rows = [r for r in rows if r[0] in self._sources]
+        if not rows:
+            return default
+        rows.sort(key=lambda r: (self._sources[r[0]][0], r[1]))
+        matches = []
+        for source_id, _, payload in rows:
+            stored = json.loads(payload)
+            matches.append({
+                "tag": stored["tag"],
+                "weight": stored["weight"],
+                "path": self._sources[source_id][1],
+                "raw": stored["raw"],
+            })
+        return {"matches": matches}
+
+    def __getitem__(self, token: str) -> Dict[str, Any]:
+        info = self.get(token)
+        if info is None:
+            raise KeyError(token)
+        return info
+
+    def name_tokens(self) -> List[str]:
+        """Sorted artist/title tokens of the configured sources."""
+        if not self._sources:
+            return []
+        ids = ",".join(str(i) for i in self._sources)
+        rows = self._conn.execute(
+            f"SELECT DISTINCT token FROM name_tokens WHERE source_id IN ({ids}) ORDER BY token"
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    @property
+    def document_count(self) -> int:
+        """Number of MSD records, including those without tokens (as :class:`MsdIndex`)."""
+        if not self._sources:
+            return 0
+        ids = ",".join(str(i) for i in self._sources)
+        return self._conn.execute(f"SELECT SUM(record_count) FROM sources WHERE id IN ({ids})").fetchone()[0]
+
+    def document_frequencies(self, tokens: Sequence[str]) -> np.ndarray:
+        """Records per token over the configured sources, from ``token_stats``."""
+        out = np.zeros(len(tokens), dtype=np.int64)
+        if not self._sources or not len(tokens):
+            return out
+        positions: Dict[str, List[int]] = {}
+        for i, token in enumerate(tokens):
+            positions.setdefault(token, []).append(i)
+        ids = ",".join(str(i) for i in self._sources)
+        unique = list(positions)
+        for start in range(0, len(unique), 500):
+            batch = unique[start:start + 500]
+            marks = ",".join("?" * len(batch))
+            rows = self._conn.execute(
+                f"SELECT token, SUM(df) FROM token_stats WHERE token IN ({marks}) AND source_id IN ({ids}) "
+                "GROUP BY token",
+                batch,
+            ).fetchall()
+            for token, df in rows:
+                out[positions[token]] = df
+        return out
+
+    def __contains__(self, token: object) -> bool:
+        if token == "__errors__":
+            return bool(self._errors)
+        if not isinstance(token, str) or not self._sources:
+            return False
+        ids = ",".join(str(i) for i in self._sources)
+        return bool(self._conn.execute(
+            f"SELECT EXISTS (SELECT 1 FROM tokens WHERE token = ? AND source_id IN ({ids}))", (token,)
+        ).fetchone()[0])
+
+    def _tokens(self) -> List[str]:
+        if not self._sources:
+            return []
+        ids = ",".join(str(i) for i in self._sources)
+        rows = self._conn.execute(
+            f"SELECT DISTINCT token FROM tokens WHERE source_id IN ({ids})"
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def __iter__(self) -> Iterator[str]:
+        keys = self._tokens()
+        if self._errors:
+            keys.append("__errors__")
+        return iter(keys)
+
+    def __len__(self) -> int:
+        return len(self._tokens()) + (1 if self._errors else 0)
+
+    def close(self) -> None:
+        if self._conn_obj is not None and self._conn_pid == os.getpid():
+            self._conn_obj.close()
+        self._conn_obj = None
+
+
+# lyric fallback: distinct words considered, tokens kept, and the most
+# matches they may add to a row
+LYRIC_CANDIDATES = 32
+LYRIC_TOKENS = 5
+LYRIC_MAX_MATCHES = 50
+
+
+def is_present(value: Any) -> bool:
+    """Whether a cell holds a value: not empty, and not NaN (a missing CSV cell)."""
+    return bool(value) and not (isinstance(value, float) and value != value)
+
+
+def lyric_tokens(lyrics: Any, limit: int = LYRIC_CANDIDATES) -> List[str]:
+    """The first ``limit`` distinct lower-cased words of ``lyrics``.
+
+    Scanning stops as soon as ``limit`` words are found, so long texts are not
+    tokenised in full.
+    """
+    if not is_present(lyrics):
+        return []
+    seen: Dict[str, None] = {}
+    for m in WORD_RE.finditer(str(lyrics).lower()):
+        seen[m.group()] = None
+        if len(seen) >= limit:
+            break
+    return list(seen)
+
+
+def key_tokens(artist: Any, song: Any) -> List[str]:
+    """Normalised artist and song tokens; missing values (including NaN) are dropped."""
+    tokens = dict.fromkeys(_normalise_token(str(value)) for value in (artist, song) if is_present(value))
+    tokens.pop("", None)
+    return list(tokens)
+
+
+def select_lyric_tokens(
+    candidates: Sequence[str],
+    frequencies: Sequence[int],
+    limit: int = LYRIC_TOKENS,
+    max_matches: int = LYRIC_MAX_MATCHES,
+) -> List[str]:
+    """Pick the most discriminative lyric words within a fan-out budget.
+
+    ``frequencies[i]`` is the number of MSD records indexed under
+    ``candidates[i]``.  Words are taken rarest first (highest IDF, ties in
+    text order), skipping words without matches, until ``limit`` words are
+    chosen or the next word would push the row's lyric matches past
+    ``max_matches``.  Common words such as "the" therefore never fan out
+    into thousands of matches on a large index.
+    """
+    ranked = sorted((f, i) for i, f in enumerate(frequencies) if f > 0)
+    chosen: List[str] = []
+    budget = max_matches
+    for f, i in ranked:
+        if f > budget or len(chosen) >= limit:
+            break
+        chosen.append(candidates[i])
+        budget -= f
+    return chosen
+
+
+def document_frequencies(index: Mapping[str, Dict[str, Any]], tokens: Sequence[str]) -> np.ndarray:
+    """Records per token for any index; :class:`MsdIndex` and :class:`CachedMsdIndex` keep statistics."""
+    stats = getattr(index, "document_frequencies", None)
+    if stats is not None:
+        return stats(tokens)
+    return np.fromiter(
+        (len((index.get(t) or {}).get("matches", [])) for t in tokens), dtype=np.int64, count=len(tokens)
+    )
+
+
+def build_fuzzy_index(
+    index: Mapping[str, Dict[str, Any]], method: str = "trigram", top_k: int = 3, min_score: float = 0.6
+) -> TrigramIndex:
+    """Approximate-match index over the artist/title tokens of ``index``."""
+    if method not in FUZZY_METHODS:
+        raise ValueError(f"unknown fuzzy_match method {method!r}; expected one of {', '.join(FUZZY_METHODS)}")
+    names = getattr(index, "name_tokens", None)
+    keys = names() if names is not None else sorted(t for t in index if t != "__errors__")
+    return TrigramIndex(keys, top_k=top_k, min_score=min_score)
+
+
+def lookup_tokens(
+    artist: Any,
+    song: Any,
+    lyrics: Any,
+    index: Mapping[str, Dict[str, Any]],
+    lyric_limit: int = LYRIC_TOKENS,
+    lyric_max_matches: int = LYRIC_MAX_MATCHES,
+    fuzzy: Optional[TrigramIndex] = None,
+) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
+    """``(token, extra)`` pairs looked up for one row, in match order.
+
+    The artist and song come first, then the lyric words picked by
+    :func:`select_lyric_tokens`.  With ``fuzzy``, an artist or song without
+    exact matches is replaced by its approximate candidates; their ``extra``
+    is ``{"query": token, "score": similarity}``, added to each match.
+    Exact tokens have ``extra=None``.  Each token appears at most once.
+    """
+    keys = key_tokens(artist, song)
+    frequencies = document_frequencies(index, keys).tolist() if keys else []
+    return _row_entries(keys, frequencies, lyric_tokens(lyrics), index, lyric_limit, lyric_max_matches, fuzzy)
+
+
+def _row_entries(
+    keys: List[str],
+    key_frequencies: Sequence[int],
+    candidates: Sequence[str],
+    index: Mapping[str, Dict[str, Any]],
+    lyric_limit: int,
+    lyric_max_matches: int,
+    fuzzy: Optional[TrigramIndex],
+    frequency: Optional[Mapping[str, int]] = None,
+    fuzzy_cache: Optional[Dict[str, List[Tuple[str, float]]]] = None,
+) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
+    # ``frequency``/``fuzzy_cache`` let batch callers reuse per-token results
+    entries: List[Tuple[str, Optional[Dict[str, Any]]]] = []
+    taken = set(keys)
+    for token, f in zip(keys, key_frequencies):
+        if f:
+            entries.append((token, None))
+            continue
+        if fuzzy is None:
+            continue
+        if fuzzy_cache is not None and token in fuzzy_cache:
+            found = fuzzy_cache[token]
+        else:
+            found = fuzzy.query(token)
+            if fuzzy_cache is not None:
+                fuzzy_cache[token] = found
+        for key, score in found:
+            if key not in taken:
+                taken.add(key)
+                entries.append((key, {"query": token, "score": score}))
+    candidates = [w for w in candidates if w not in taken]
+    if candidates:
+        if frequency is not None:
+            frequencies = [frequency[w] for w in candidates]
+        else:
+            frequencies = document_frequencies(index, candidates).tolist()
+        entries.extend((token, None) for token in select_lyric_tokens(
+            candidates, frequencies, lyric_limit, lyric_max_matches
+        ))
+    return entries
+
+
+def lookup_msd(
+    artist: Optional[str],
+    song: Optional[str],
+    lyrics: Optional[str],
+    index: Mapping[str, Dict[str, Any]],
+    lyric_limit: int = LYRIC_TOKENS,
+    lyric_max_matches: int = LYRIC_MAX_MATCHES,
+    fuzzy: Optional[TrigramIndex] = None,
+) -> List[Dict[str, Any]]:
+    """Return MSD matches for the provided artist/song/lyrics tokens.
+
+    Matches are grouped by token in :func:`lookup_tokens` order.  For whole
+    chunks of rows use :func:`lookup_msd_batch`.
+    """
+    matches: List[Dict[str, Any]] = []
+    for token, extra in lookup_tokens(artist, song, lyrics, index, lyric_limit, lyric_max_matches, fuzzy):
+        info = index.get(token)
+        if not info:
+            continue
+        for payload in info.get("matches", []):
+            match = dict(payload)
+            match["token"] = token
+            if extra:
+                match.update(extra)
+            matches.append(match)
+    return matches
+
+
+class MsdMatchBatch(Sequence[List[Dict[str, Any]]]):
+    """MSD matches for a batch of rows; see :func:`lookup_msd_batch`.
+
+    The join result is kept sparse: ``row_tokens[row_ptr[i]:row_ptr[i + 1]]``
+    are codes into ``tokens`` for the tokens of row ``i`` that hit the index,
+    in lookup order, and :meth:`record_ids` gives a token's MSD records.
+    ``extras[code]`` is ``None`` for exact tokens, or the query and score
+    of an approximate match.  ``batch[i]`` is row ``i``'s match list, equal
+    to :func:`lookup_msd` for that row.  Match dicts are built once per
+    code, on first access, and shared by every row with that code; treat
+    them as read-only.
+    """
+
+    __slots__ = ("tokens", "extras", "row_ptr", "row_tokens", "_index", "_sources", "_matches")
+
+    def __init__(
+        self,
+        tokens: List[str],
+        sources: List[Any],
+        row_ptr: np.ndarray,
+        row_tokens: np.ndarray,
+        index: Mapping[str, Dict[str, Any]],
+        extras: Optional[List[Optional[Dict[str, Any]]]] = None,
+    ):
+        self.tokens = tokens
+        self.extras = extras if extras is not None else [None] * len(tokens)
+        self.row_ptr = row_ptr
+        self.row_tokens = row_tokens
+        self._index = index
+        # per token: record ids (MsdIndex) or the index's payload list
+        self._sources = sources
+        self._matches: List[Optional[List[Dict[str, Any]]]] = [None] * len(tokens)
+
+    def __len__(self) -> int:
+        return len(self.row_ptr) - 1
+
+    def record_ids(self, code: int) -> Optional[np.ndarray]:
+        """MSD record ids of ``tokens[code]`` (``None`` unless the index is an :class:`MsdIndex`)."""
+        source = self._sources[code]
+        return source if isinstance(source, np.ndarray) else None
+
+    def token_matches(self, code: int) -> List[Dict[str, Any]]:
+        matches = self._matches[code]
+        if matches is None:
+            token = self.tokens[code]
+            extra = self.extras[code]
+            source = self._sources[code]
+            if isinstance(source, np.ndarray):
+                payload = self._index.payload  # type: ignore[attr-defined]
+                # MsdIndex.payload builds a fresh dict, no copy needed
+                matches = [payload(record_id) for record_id in source.tolist()]
+                for match in matches:
+                    match["token"] = token
+            else:
+                matches = [dict(p, token=token) for p in source]
+            if extra:
+                for match in matches:
+                    match.update(extra)
+            self._matches[code] = matches
+        return matches
+
+    def match_counts(self) -> np.ndarray:
+        """Number of matches per row."""
+        per_token = np.fromiter((len(s) for s in self._sources), dtype=np.int64, count=len(self._sources))
+        rows = np.repeat(np.arange(len(self)), np.diff(self.row_ptr))
+        return np.bincount(rows, weights=per_token[self.row_tokens], minlength=len(self)).astype(np.int64)
+
+    def __getitem__(self, i: int) -> List[Dict[str, Any]]:  # type: ignore[override]
+        if i < 0:
+            i += len(self)
+        codes = self.row_tokens[self.row_ptr[i]:self.row_ptr[i + 1]].tolist()
+        if len(codes) == 1:
+            return list(self.token_matches(codes[0]))
+        matches: List[Dict[str, Any]] = []
+        for code in codes:
+            matches.extend(self.token_matches(code))
+        return matches
+
+
+def lookup_msd_batch(
+    artists: Sequence[Any],
+    songs: Sequence[Any],
+    lyrics: Sequence[Any],
+    index: Mapping[str, Dict[str, Any]],
+    lyric_limit: int = LYRIC_TOKENS,
+    lyric_max_matches: int = LYRIC_MAX_MATCHES,
+    fuzzy: Optional[TrigramIndex] = None,
+    candidates: Optional[Sequence[Optional[List[str]]]] = None,
+    memo: Optional[LruMemo] = None,
+) -> MsdMatchBatch:
+    """:func:`lookup_msd` for whole columns, as a hash join on tokens.
+
+    The artist/song tokens and lyric candidates of the whole batch are
+    deduplicated first.  Document frequencies, approximate candidates and
+    matches are then fetched once per distinct token rather than once per
+    row and token.  Tokens are chosen per row as in :func:`lookup_tokens`,
+    and the hits are returned as a sparse row -> token structure
+    (:class:`MsdMatchBatch`).
+
+    ``candidates`` optionally gives each row's :func:`lyric_tokens` already
+    computed (e.g. from its token ids); rows with ``None`` are tokenised here.
+    Only the rows whose tokens are chosen here are indexed.
+
+    With ``memo`` (see :mod:`analysis.memo`), a row's tokens are chosen
+    once per distinct normalised artist/song and lyrics in this batch, and
+    reused by later batches once the memo admits them (when a batch has
+    them twice, or they were seen in an earlier batch).  A memo must only
+    be used with one index and config.
+    """
+    # per row: its memo key (the row number without a memo) and key tokens
+    row_keys: List[Any] = []
+    chosen: Dict[Any, Optional[List[Tuple[str, Optional[Dict[str, Any]]]]]] = {}
+    todo: Dict[Any, Tuple[int, List[str]]] = {}
+    # keys to be chosen here that more than one row has; the memo keeps them
+    repeated: set = set()
+    for i, (artist, song, text) in enumerate(zip(artists, songs, lyrics)):
+        keys = key_tokens(artist, song)
+        row_key: Any = i
+        if memo is not None:
+            row_key = (tuple(keys), str(text) if is_present(text) else "")
+            if row_key in chosen:
+                if row_key in todo:
+                    repeated.add(row_key)
+                row_keys.append(row_key)
+                continue
+            chosen[row_key] = memo.get(row_key)
+            if chosen[row_key] is not None:
+                row_keys.append(row_key)
+                continue
+        todo[row_key] = (i, keys)
+        row_keys.append(row_key)
+
+    # choose tokens for the rest
+    distinct: Dict[str, None] = {}
+    pending: List[Tuple[Any, List[str], List[str]]] = []
+    for row_key, (i, keys) in todo.items():
+        row_candidates = candidates[i] if candidates is not None else None
+        if row_candidates is None:
+            row_candidates = lyric_tokens(lyrics[i])
+        pending.append((row_key, keys, row_candidates))
+        distinct.update(dict.fromkeys(keys))
+        distinct.update(dict.fromkeys(row_candidates))
+    unique_tokens = list(distinct)
+    frequency = dict(zip(unique_tokens, document_frequencies(index, unique_tokens).tolist()))
+    fuzzy_cache: Dict[str, List[Tuple[str, float]]] = {}
+    for row_key, keys, row_candidates in pending:
+        entries = _row_entries(
+            keys, [frequency[t] for t in keys], row_candidates, index,
+            lyric_limit, lyric_max_matches, fuzzy, frequency, fuzzy_cache,
+        )
+        chosen[row_key] = entries
+        if memo is not None and (row_key in repeated or memo.admit(row_key)):
+            memo.put(row_key, entries, lookup_entry_size(row_key, entries))
+
+    n = len(row_keys)
+    codes: Dict[Tuple[str, Optional[str]], int] = {}
+    tokens: List[str] = []
+    extras: List[Optional[Dict[str, Any]]] = []
+    row_codes: List[int] = []
+    row_lengths: List[int] = []
+    for row_key in row_keys:
+        entries = chosen[row_key]
+        for token, extra in entries:
+            entry_key = (token, extra["query"] if extra else None)
+            code = codes.get(entry_key)
+            if code is None:
+                code = codes[entry_key] = len(tokens)
+                tokens.append(token)
+                extras.append(extra)
+            row_codes.append(code)
+        row_lengths.append(len(entries))
+
+    # probe the index once per distinct token
+    columnar = isinstance(index, MsdIndex)
+    fetched: Dict[str, Any] = {}
+    sources: List[Any] = []
+    for token in tokens:
+        source = fetched.get(token)
+        if source is None:
+            if columnar:
+                source = index.record_ids(token)  # type: ignore[attr-defined]
+            else:
+                info = index.get(token)
+                source = info.get("matches", []) if info else []
+            fetched[token] = source
+        sources.append(source)
+
+    row_ptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.asarray(row_lengths, dtype=np.int64), out=row_ptr[1:])
+    row_tokens = np.asarray(row_codes, dtype=np.int64)
+    return MsdMatchBatch(tokens, sources, row_ptr, row_tokens, index, extras)
@@ -4,18 +4,95 @@ from __future__ import annotations
 
 import json
 import os
-import re
 import sys
-from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+import time
+import warnings
+from array import array
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
 
 import math
 
 import pandas as pd
-import yaml
-from jinja2 import Template
-from pydantic import BaseModel, Field, ValidationError
+from pydantic import BaseModel, Field, PrivateAttr, ValidationError
+
+if __package__ in (None, ""):
+    # allow ``python analysis/pipeline.py`` as well as ``python -m analysis.pipeline``
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis.aggregate import AggregateAccumulator
+from analysis.batch import profile_batch
+from analysis.fuzzy import DEFAULT_MIN_SCORE, DEFAULT_TOP_K
+from analysis.io.arrow import ArrowResultWriter
+from analysis.io.jsonl import JsonlWriter
+from analysis.io.loaders import ColumnSelector, is_glob, iter_csv_frames, resolve_input_paths
+from analysis.lut import LutRegistry, table_signatures
+from analysis.matching import KeywordMatcher
+from analysis.memo import DEFAULT_MEMO_BYTES, LruMemo, text_entry_size
+from analysis.msd import (
+    LYRIC_CANDIDATES,
+    LYRIC_MAX_MATCHES,
+    LYRIC_TOKENS,
+    MsdMatchBatch,
+    build_fuzzy_index,
+    is_present,
+    load_msd_index,
+    lookup_msd,
+    lookup_msd_batch,
+)
+from analysis.profiling import StageStats, profile_hooks
+from analysis.records import FeatureRecord, ResultRecord, ScoreRecord
+from analysis.report import HtmlReportWriter
+from analysis.resultstore import DEFAULT_MAX_BYTES, ResultStore
+from analysis.schema import ARTIST_COLUMNS, LYRICS_COLUMNS, SONG_COLUMNS, InputSchema, is_scenario_column, text_column
+from analysis.text import WORD_RE, Vocabulary, current_vocabulary, use_vocabulary
+
+# rows per task when --workers is given without --chunk-size
+DEFAULT_WORKER_CHUNK_SIZE = 1000
+# tokens a pipeline's vocabulary may hold (about 70 MiB) before the next
+# frame starts a new one
+MAX_VOCABULARY = 1 << 19
+
+
+def _first_present(row: Mapping[str, Any], columns: Sequence[str]) -> Any:
+    for column in columns:
+        value = row.get(column)
+        if is_present(value):
+            return value
+    return None
+
+
+# a new text's records were handed to its first row (see Pipeline.text_records)
+_FIRST_ROW = object()
+
+
+def _text_entry(feats: FeatureRecord, score: ScoreRecord) -> Tuple[Any, ...]:
+    """The parts of a text's records that later rows with the text share."""
+    return (
+        feats.num_chars, feats.num_words, feats.avg_word_len, feats.token_ids,
+        score.psych, score.music, dict(score.details),
+    )
+
+
+class _LyricCandidates(Sequence[Optional[List[str]]]):
+    """Each row's lyric candidates from its token ids, where its lyrics are its text.
+
+    Computed on access, so rows the MSD memo answers are never scanned.
+    """
+
+    def __init__(self, features: Sequence[FeatureRecord], lyrics: Sequence[Any], texts: Sequence[Any]):
+        self._features = features
+        self._lyrics = lyrics
+        self._texts = texts
 
-WORD_RE = re.compile(r"\w+")
+    def __len__(self) -> int:
+        return len(self._features)
+
+    def __getitem__(self, i: int) -> Optional[List[str]]:  # type: ignore[override]
+        if self._lyrics[i] == self._texts[i]:
+            feats = self._features[i]
+            return feats.vocab.distinct_lower(feats.token_ids, LYRIC_CANDIDATES)
+        return None
 
 
 class Features(BaseModel):
@@ -41,46 +118,117 @@ class Result(BaseModel):
     score: Score
 
 
+# writers and aggregates accept the public models as well as pipeline records
+AnyResult = Union[Result, ResultRecord]
+
+
 class MappingConfig(BaseModel):
     categories: Dict[str, Mapping[str, float]] = Field(default_factory=dict)
     crossmap: Dict[str, str] = Field(default_factory=dict)
     scenario_weights: Dict[str, float] = Field(default_factory=dict)
     msd_paths: List[str] = Field(default_factory=list)
     lut_files: List[str] = Field(default_factory=list)
-
-
-def load_csv(input_path: str) -> pd.DataFrame:
-    if not os.path.exists(input_path):
-        raise FileNotFoundError(f"Input path does not exist: {input_path}")
-    # Let pandas infer separator/encoding; assume a single text column if present
-    df = pd.read_csv(input_path)
+    msd_cache: Optional[str] = None
+    # lyric fallback lookups: words kept per row and the matches they may add
+    lyric_tokens: int = LYRIC_TOKENS
+    lyric_max_matches: int = LYRIC_MAX_MATCHES
+    # approximate artist/song matching when there is no exact hit: None or
+    # "trigram" (see analysis.fuzzy)
+    fuzzy_match: Optional[str] = None
+    fuzzy_top_k: int = DEFAULT_TOP_K
+    fuzzy_min_score: float = DEFAULT_MIN_SCORE
+
+    _matcher: Optional[Tuple[int, KeywordMatcher]] = PrivateAttr(default=None)
+
+    def keyword_matcher(self) -> KeywordMatcher:
+        """Return the keyword matcher compiled from ``categories``.
+
+        The matcher is built on first use and reused until ``categories`` is
+        replaced; mutate the config by assignment, not in place.
+        """
+        if self._matcher is None or self._matcher[0] != id(self.categories):
+            self._matcher = (id(self.categories), KeywordMatcher(self.categories))
+        return self._matcher[1]
+
+
+def _prepare_frame(df: pd.DataFrame, offset: int = 0) -> pd.DataFrame:
+    """Add the ``text`` column, drop rows without text and renumber from ``offset``."""
     if df.empty:
         return df
-    # Try to find a text column
-    text_cols = [c for c in df.columns if c.lower() in ("text", "content", "body", "lyrics")]
-    if not text_cols:
-        # fallback to first column
-        text_col = df.columns[0]
-    else:
-        text_col = text_cols[0]
+    text_col = text_column(df.columns)
     if "text" != text_col:
         df["text"] = df[text_col]
-    df = df.dropna(subset=["text"]).reset_index(drop=True)
+    df = df.dropna(subset=["text"])
+    df.index = pd.RangeIndex(offset, offset + len(df))
     return df
 
 
-def extract_features(text: str) -> Features:
+def iter_input_frames(
+    input_path: str,
+    chunk_size: Optional[int] = None,
+    columns: Optional[ColumnSelector] = None,
+) -> Iterator[pd.DataFrame]:
+    """Prepared frames of the CSV file(s) named by ``input_path``.
+
+    ``input_path`` may be a file, a directory or a glob; several files are
+    read in parallel and yielded as one stream (see :mod:`analysis.io.loaders`).
+    Each file is one frame, or frames of at most ``chunk_size`` rows.  Row ids
+    continue across frames and files, so they match a single-frame run.
+    ``columns`` selects the columns to read (see :meth:`Pipeline.input_columns`);
+    by default every column is read.
+    """
+    if chunk_size is not None and chunk_size <= 0:
+        raise ValueError("chunk_size must be a positive integer")
+    offset = 0
+    for df in iter_csv_frames(resolve_input_paths(input_path), columns, chunk_size):
+        df = _prepare_frame(df, offset)
+        offset += len(df)
+        yield df
+
+
+def load_csv(input_path: str, columns: Optional[ColumnSelector] = None) -> pd.DataFrame:
+    frames = list(iter_input_frames(input_path, columns=columns))
+    return frames[0] if len(frames) == 1 else pd.concat(frames)
+
+
+def iter_csv_chunks(
+    input_path: str, chunk_size: int, columns: Optional[ColumnSelector] = None
+) -> Iterator[pd.DataFrame]:
+    """Read ``input_path`` in chunks of at most ``chunk_size`` rows.
+
+    Each chunk is prepared like :func:`load_csv`; row ids continue across
+    chunks so they match the ids of a non-chunked run.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be a positive integer")
+    return iter_input_frames(input_path, chunk_size, columns)
+
+
+def extract_feature_record(text: str, vocab: Optional[Vocabulary] = None) -> FeatureRecord:
+    """Tokenise ``text`` once; the words are kept as ids in ``vocab`` (default: the current one)."""
+    if vocab is None:
+        vocab = current_vocabulary()
     words = WORD_RE.findall(text)
     num_words = len(words)
     num_chars = len(text)
-    avg_word_len = (sum(len(w) for w in words) / num_words) if num_words else 0.0
-    return Features(num_chars=num_chars, num_words=num_words, avg_word_len=avg_word_len, words=words)
+    avg_word_len = (sum(map(len, words)) / num_words) if num_words else 0.0
+    return FeatureRecord(num_chars, num_words, avg_word_len, token_ids=vocab.encode(words), vocab=vocab)
+
+
+def extract_features(text: str) -> Features:
+    return Features(**extract_feature_record(text).dict())
+
+
+# scalar MappingConfig settings passed through as-is by load_mapping_yaml's fallback
+_OPTIONAL_SETTINGS = ("lyric_tokens", "lyric_max_matches", "fuzzy_match", "fuzzy_top_k", "fuzzy_min_score")
 
 
 def load_mapping_yaml(path: str) -> MappingConfig:
     if not path or not os.path.exists(path):
         # return empty config
         return MappingConfig()
+    import yaml  # deferred: only runs with a mapping file need it
+
     with open(path, "r", encoding="utf-8") as fh:
         data = yaml.safe_load(fh) or {}
     # expect structure: categories: {psych: {keyword: weight, ...}, music: {...}}, crossmap: {...}
@@ -93,6 +241,8 @@ def load_mapping_yaml(path: str) -> MappingConfig:
         scenario_weights = data.get("scenario_weights", {})
         msd_paths = data.get("msd_paths") or []
         lut_files = data.get("lut_files") or []
+        msd_cache = data.get("msd_cache") or None
+        options = {k: data[k] for k in _OPTIONAL_SETTINGS if data.get(k) is not None}
         # support single string entries
         if isinstance(msd_paths, str):
             msd_paths = [msd_paths]
@@ -104,135 +254,11 @@ def load_mapping_yaml(path: str) -> MappingConfig:
             scenario_weights=scenario_weights,
             msd_paths=list(msd_paths),
             lut_files=list(lut_files),
+            msd_cache=msd_cache,
+            **options,
         )
 
 
-def _normalise_token(value: Optional[str]) -> str:
-    if not value:
-        return ""
-    return re.sub(r"\s+", " ", value).strip().lower()
-
-
-def load_msd_index(paths: Sequence[str]) -> Dict[str, Dict[str, Any]]:
-    """Load MSD (Million Song Dataset) tag/classification information.
-
-    The loader is intentionally flexible – it accepts the original
-    ``msd_tagtraum_cd2.cls`` format (tab or whitespace separated track id and
-    tag), CSV/TSV files, or JSON documents with either a mapping or list of
-    entries.  The resulting structure is a dictionary keyed by a normalised
-    token (track id, artist name, or song title) with metadata describing the
-    tag hits and provenance path.
-    """
-
-    index: Dict[str, Dict[str, Any]] = {}
-
-    for path in paths or []:
-        if not path:
-            continue
-        if not os.path.exists(path):
-            continue
-        _, ext = os.path.splitext(path)
-        ext = ext.lower()
-        try:
-            if ext in {".json", ".jsonl"}:
-                with open(path, "r", encoding="utf-8") as fh:
-                    data = json.load(fh)
-                entries: Sequence[Mapping[str, Any]]
-                if isinstance(data, Mapping):
-                    entries = [dict(track=k, tag=v) for k, v in data.items()]
-                else:
-                    entries = list(data)
-                for entry in entries:
-                    tokens = {
-                        _normalise_token(entry.get("track")),
-                        _normalise_token(entry.get("artist")),
-                        _normalise_token(entry.get("title")),
-                    }
-                    tokens.discard("")
-                    if not tokens:
-                        continue
-                    payload = {
-                        "tag": entry.get("tag") or entry.get("genre"),
-                        "weight": float(entry.get("weight", 1.0)),
-                        "path": path,
-                        "raw": entry,
-                    }
-                    for token in tokens:
-                        hits = index.setdefault(token, {"matches": []})
-                        hits["matches"].append(payload)
-            elif ext in {".csv", ".tsv"}:
-                sep = "," if ext == ".csv" else "\t"
-                df = pd.read_csv(path, sep=sep)
-                for _, row in df.iterrows():
-                    tokens = {
-                        _normalise_token(str(row.get("track", ""))),
-                        _normalise_token(str(row.get("artist", ""))),
-                        _normalise_token(str(row.get("title", ""))),
-                    }
-                    tokens.discard("")
-                    if not tokens:
-                        continue
-                    payload = {
-                        "tag": row.get("tag") or row.get("genre"),
-                        "weight": float(row.get("weight", 1.0)),
-                        "path": path,
-                        "raw": row.to_dict(),
-                    }
-                    for token in tokens:
-                        hits = index.setdefault(token, {"matches": []})
-                        hits["matches"].append(payload)
-            else:
-                # fall back to .cls style: track tag ...
-                with open(path, "r", encoding="utf-8", errors="ignore") as fh:
-                    for line in fh:
-                        line = line.strip()
-                        if not line or line.startswith("#"):
-                            continue
-                        parts = re.split(r"[\s,]+", line)
-                        if len(parts) < 2:
-                            continue
-                        track_id, tag = parts[0], parts[1]
-                        token = _normalise_token(track_id)
-                        hits = index.setdefault(token, {"matches": []})
-                        hits["matches"].append({
-                            "tag": tag,
-                            "weight": 1.0,
-                            "path": path,
-                            "raw": {"track": track_id, "tag": tag},
-                        })
-        except Exception:
-            # For robustness we simply skip unreadable files, leaving a clue in
-            # the index for later debugging.
-            index.setdefault("__errors__", {}).setdefault(path, 0)
-            index["__errors__"][path] += 1
-    return index
-
-
-def lookup_msd(artist: Optional[str], song: Optional[str], lyrics: Optional[str], index: Mapping[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """Return MSD matches for the provided artist/song/lyrics tokens."""
-
-    tokens = {
-        _normalise_token(artist),
-        _normalise_token(song),
-    }
-    if lyrics:
-        # use a handful of unique words as fallback tokens
-        words = list(dict.fromkeys(WORD_RE.findall(lyrics.lower())))
-        tokens.update(words[:5])
-    tokens.discard("")
-
-    matches: List[Dict[str, Any]] = []
-    for token in tokens:
-        info = index.get(token)
-        if not info:
-            continue
-        for payload in info.get("matches", []):
-            match = dict(payload)
-            match["token"] = token
-            matches.append(match)
-    return matches
-
-
 def build_scenario_vector(row: Mapping[str, Any], scenario_weights: Mapping[str, float]) -> Dict[str, float]:
     vector: Dict[str, float] = {}
     items: Iterable[Tuple[str, float]]
@@ -242,14 +268,15 @@ def build_scenario_vector(row: Mapping[str, Any], scenario_weights: Mapping[str,
         # Automatically pick up columns that look like scenario answers (e.g. Q5*)
         auto: List[Tuple[str, float]] = []
         for key in getattr(row, "index", []):
-            if not isinstance(key, str):
-                continue
-            key_lower = key.lower()
-            if key_lower.startswith("q5") or "scenario" in key_lower:
+            if is_scenario_column(key):
                 try:
-                    auto.append((key, float(row.get(key))))
+                    value = float(row.get(key))
                 except (TypeError, ValueError):
                     continue
+                # a blank answer (NaN) has no weight to fall back to; it
+                # would turn the whole normalised vector into NaN
+                if math.isfinite(value):
+                    auto.append((key, value))
         items = auto
     for key, weight in items:
         value = row.get(key)
@@ -307,13 +334,19 @@ def derive_preference_profile(
         "lexical_density": (
             features.num_words / features.num_chars if features.num_chars else 0.0
         ),
-        "vocabulary_size": len(set(features.words)),
+        "vocabulary_size": len(set(_token_ids(features))),
         "msd_match_count": len(msd_matches),
     }
 
     return profile
 
 
+def _token_ids(features: Features) -> Iterable[Any]:
+    # records carry token ids; the public models only have the words
+    ids = getattr(features, "token_ids", None)
+    return features.words if ids is None else ids
+
+
 def derive_personality_profile(
     features: Features,
     base_scores: Score,
@@ -376,32 +409,12 @@ def feedback_adjust_preference(
     return adjusted
 
 
-def load_lut_files(paths: Sequence[str]) -> List[Any]:
-    """Load lookup/register tables used for correlation building."""
+def load_lut_files(paths: Sequence[str]) -> LutRegistry:
+    """Register lookup/register tables used for correlation building.
 
-    tables: List[Any] = []
-    for path in paths or []:
-        if not path or not os.path.exists(path):
-            continue
-        _, ext = os.path.splitext(path)
-        ext = ext.lower()
-        try:
-            if ext in {".json", ".jsonl"}:
-                with open(path, "r", encoding="utf-8") as fh:
-                    tables.append(json.load(fh))
-            elif ext in {".yml", ".yaml"}:
-                with open(path, "r", encoding="utf-8") as fh:
-                    tables.append(yaml.safe_load(fh))
-            elif ext in {".csv", ".tsv"}:
-                sep = "," if ext == ".csv" else "\t"
-                tables.append(pd.read_csv(path, sep=sep))
-            else:
-                # For TTL/OWL or unknown formats we keep the raw text
-                with open(path, "r", encoding="utf-8", errors="ignore") as fh:
-                    tables.append(fh.read())
-        except Exception:
-            tables.append({"error": f"Failed to read {path}"})
-    return tables
+    Digests are computed here; contents load lazily (see :mod:`analysis.lut`).
+    """
+    return LutRegistry(paths)
 
 
 def build_correlation_matrix(
@@ -436,37 +449,33 @@ def build_correlation_matrix(
         "tables_loaded": len(tables),
     }
 
-    # incorporate hints from LUT/register tables by simply noting their hashes
-    for idx, table in enumerate(tables):
-        key = f"table_{idx}_signature"
-        try:
-            signature = hash(str(table))
-        except Exception:
-            signature = None
-        correlations[key] = signature
+    # incorporate hints from LUT/register tables by noting their stable signatures
+    signatures = table_signatures(tables)
+    for idx, signature in enumerate(signatures):
+        correlations[f"table_{idx}_signature"] = signature
 
     return correlations
 
 
-def score_from_mapping(words: Iterable[str], cfg: MappingConfig) -> Score:
+def score_record_from_mapping(words: Iterable[str], cfg: MappingConfig) -> ScoreRecord:
+    return _score_record(cfg.keyword_matcher().match(words), cfg)
+
+
+def score_record_from_ids(
+    token_ids: Sequence[int], cfg: MappingConfig, vocab: Optional[Vocabulary] = None
+) -> ScoreRecord:
+    """:func:`score_record_from_mapping` for a row's token ids in ``vocab`` (see :mod:`analysis.text`)."""
+    return _score_record(cfg.keyword_matcher().match_ids(token_ids, vocab), cfg)
+
+
+def _score_record(details: Dict[str, Any], cfg: MappingConfig) -> ScoreRecord:
     psych_score = 0.0
     music_score = 0.0
-    details: Dict[str, Any] = {}
-    word_lower = [w.lower() for w in words]
-    for cat, mapping in cfg.categories.items():
-        s = 0.0
-        hits = {}
-        for kw, weight in mapping.items():
-            # count occurrences
-            count = word_lower.count(kw.lower())
-            if count:
-                s += count * float(weight)
-                hits[kw] = count
-        details[cat] = {"score": s, "hits": hits}
+    for cat, detail in details.items():
         if cat.lower() == "psych":
-            psych_score = s
+            psych_score = detail["score"]
         elif cat.lower() == "music":
-            music_score = s
+            music_score = detail["score"]
         else:
             # other categories could be crossmapped
             pass
@@ -482,42 +491,29 @@ def score_from_mapping(words: Iterable[str], cfg: MappingConfig) -> Score:
                 psych_score += s
             elif tgt == "music":
                 music_score += s
-    return Score(psych=psych_score, music=music_score, details=details)
+    return ScoreRecord(psych_score, music_score, details)
+
+
+def score_from_mapping(words: Iterable[str], cfg: MappingConfig) -> Score:
+    return Score(**score_record_from_mapping(words, cfg).dict())
+
+
+def result_model(record: ResultRecord) -> Result:
+    """Validate a pipeline record into the public :class:`Result` model."""
+    return Result(**record.dict())
 
 
-def write_jsonl(path: str, results: Iterable[Result]) -> None:
-    with open(path, "w", encoding="utf-8") as fh:
+def write_jsonl(path: str, results: Iterable[AnyResult], encoder: str = "auto") -> None:
+    with JsonlWriter(path, encoder=encoder) as writer:
         for r in results:
-            fh.write(json.dumps(r.dict(), ensure_ascii=False) + "\n")
+            writer.write(r)
 
 
-def write_aggregate(path: str, results: Iterable[Result]) -> None:
-    results = list(results)
-    if not results:
-        agg = {"count": 0}
-    else:
-        count = len(results)
-        mean_psych = sum(r.score.psych for r in results) / count
-        mean_music = sum(r.score.music for r in results) / count
-        mean_energy = sum(
-            r.score.preference_profile.get("music_energy", 0.0) for r in results
-        ) / count
-        mean_tension = sum(
-            r.score.correlations.get("tension", 0.0) for r in results
-        ) / count
-        mean_expression = sum(
-            r.score.correlations.get("expression", 0.0) for r in results
-        ) / count
-        agg = {
-            "count": count,
-            "mean_psych": mean_psych,
-            "mean_music": mean_music,
-            "mean_music_energy": mean_energy,
-            "mean_tension": mean_tension,
-            "mean_expression": mean_expression,
-        }
-    with open(path, "w", encoding="utf-8") as fh:
-        json.dump(agg, fh, ensure_ascii=False, indent=2)
+def write_aggregate(path: str, results: Iterable[AnyResult]) -> None:
+    acc = AggregateAccumulator()
+    for r in results:
+        acc.add(r)
+    acc.write(path)
 
 
 HTML_TEMPLATE = """
@@ -557,7 +553,9 @@ HTML_TEMPLATE = """
 """
 
 
-def render_html(results: List[Result], template: Optional[str] = None) -> str:
+def render_html(results: Sequence[AnyResult], template: Optional[str] = None) -> str:
+    from jinja2 import Template  # deferred: only HTML output needs it
+
     tpl = Template(template or HTML_TEMPLATE)
     serialised: List[Dict[str, Any]] = []
     for r in results:
@@ -599,13 +597,474 @@ class Pipeline:
     ``mapping`` (YAML pipeline configuration).
     """
 
-    def __init__(self, mapping_path: Optional[str] = None):
+    def __init__(
+        self,
+        mapping_path: Optional[str] = None,
+        msd_cache: Optional[str] = None,
+        drop_words: bool = False,
+        memo_bytes: int = DEFAULT_MEMO_BYTES,
+    ):
+        # drop_words: clear Features.words once a row is scored
+        self.drop_words = drop_words
+        # per-stage timings and counters (see analysis.profiling); reset by run()
+        self.stats = StageStats()
+        # repeated texts and lookups, kept across runs (see analysis.memo)
+        self.memo = LruMemo(memo_bytes)
+        self.configure(mapping_path, msd_cache)
+
+    def configure(self, mapping_path: Optional[str] = None, msd_cache: Optional[str] = None) -> None:
+        """(Re)load the mapping config and the MSD/LUT sources it references.
+
+        ``msd_cache`` overrides the config's ``msd_cache`` SQLite path.  With
+        ``fuzzy_match`` set, the approximate-match index over the MSD artist
+        and title tokens is built here too.  The memo is cleared, and the
+        pipeline starts a new vocabulary (see :mod:`analysis.text`).
+        """
+        self.memo.clear()
+        self.vocab = Vocabulary()
+        use_vocabulary(self.vocab)
         self.mapping_path = mapping_path
+        self.msd_cache = msd_cache
         self.cfg = load_mapping_yaml(mapping_path) if mapping_path else MappingConfig()
-        self.msd_index = load_msd_index(self.cfg.msd_paths)
+        self.msd_index = load_msd_index(self.cfg.msd_paths, cache=msd_cache or self.cfg.msd_cache)
+        self.fuzzy_index = None
+        if self.cfg.fuzzy_match:
+            # built up front so pool workers inherit it
+            self.fuzzy_index = build_fuzzy_index(
+                self.msd_index, self.cfg.fuzzy_match, self.cfg.fuzzy_top_k, self.cfg.fuzzy_min_score
+            )
         self.lut_tables = load_lut_files(self.cfg.lut_files)
+        self._schemas: Dict[Tuple[int, Tuple[Any, ...]], InputSchema] = {}
+
+    def process_row(
+        self,
+        idx: Any,
+        row: Mapping[str, Any],
+        msd_matches: Optional[List[Dict[str, Any]]] = None,
+    ) -> ResultRecord:
+        """Run every per-row stage for a single prepared input row.
+
+        The row's inputs are found by key, row by row; :meth:`process_frame`
+        resolves them once per frame instead (see :mod:`analysis.schema`).
+        ``msd_matches`` are the row's matches from :meth:`lookup_frame`; they
+        are looked up here when not given.  Each stage's time is added to
+        :attr:`stats`.
+        """
+        self._renew_vocabulary()
+        stats = self.stats
+        stats.start()
+        text = str(row["text"])
+        scenario_vector = build_scenario_vector(row, self.cfg.scenario_weights)
+        stats.lap("scenario_vector")
+        if msd_matches is None:
+            artist = _first_present(row, ARTIST_COLUMNS)
+            song = _first_present(row, SONG_COLUMNS)
+            lyrics = _first_present(row, LYRICS_COLUMNS)
+            msd_matches = lookup_msd(
+                artist,
+                song,
+                lyrics,
+                self.msd_index,
+                self.cfg.lyric_tokens,
+                self.cfg.lyric_max_matches,
+                self.fuzzy_index,
+            )
+            stats.lap("lookup_msd")
+        return self._row_result(idx, text, scenario_vector, msd_matches)
+
+    def _row_result(
+        self,
+        idx: Any,
+        text: str,
+        scenario_vector: Dict[str, float],
+        msd_matches: List[Dict[str, Any]],
+        feats: Optional[FeatureRecord] = None,
+    ) -> ResultRecord:
+        """The text and scoring stages for a row whose inputs are resolved."""
+        stats = self.stats
+        stats.start()
+        if feats is None:
+            feats = extract_feature_record(text, self.vocab)
+            stats.lap("extract_features")
+        score = score_record_from_ids(feats.token_ids, self.cfg, feats.vocab)
+        stats.lap("score_mapping")
+        preference_profile = derive_preference_profile(score, scenario_vector, msd_matches, feats)
+        personality_profile = derive_personality_profile(feats, score, preference_profile)
+        adjusted_preference = feedback_adjust_preference(preference_profile, personality_profile)
+        stats.lap("profiles")
+        correlations = build_correlation_matrix(adjusted_preference, personality_profile, self.lut_tables)
+        stats.lap("correlations")
+        stats.count("rows_processed")
+        if msd_matches:
+            stats.count("msd_rows_matched")
+            stats.count("msd_matches", len(msd_matches))
+        return self._result_record(
+            idx, text, feats, score, scenario_vector, msd_matches,
+            adjusted_preference, personality_profile, correlations,
+        )
+
+    def _result_record(
+        self,
+        idx: Any,
+        text: str,
+        feats: FeatureRecord,
+        score: ScoreRecord,
+        scenario_vector: Dict[str, float],
+        msd_matches: List[Dict[str, Any]],
+        adjusted_preference: Dict[str, Any],
+        personality_profile: Dict[str, Any],
+        correlations: Dict[str, Any],
+    ) -> ResultRecord:
+        """Attach a row's profiles and inputs to its score and build the record."""
+        score.preference_profile = adjusted_preference
+        score.personality_profile = personality_profile
+        score.correlations = correlations
+        score.details.update({
+            "scenarios": scenario_vector,
+            "msd_matches": msd_matches,
+        })
+        if self.drop_words:
+            # only needed by the stages above; keeps retained results small
+            feats.token_ids = array("I")
+
+        return ResultRecord(int(idx), text, feats, score)
+
+    def input_schema(self, columns: Sequence[Any]) -> InputSchema:
+        """The :class:`~analysis.schema.InputSchema` for a file with ``columns``.
+
+        Resolved once per distinct set of columns and config; mutate the
+        config's ``scenario_weights`` by assignment, not in place.
+        """
+        key = (id(self.cfg.scenario_weights), tuple(columns))
+        schema = self._schemas.get(key)
+        if schema is None:
+            schema = self._schemas[key] = InputSchema(columns, self.cfg.scenario_weights)
+        return schema
+
+    def input_columns(self, header: Sequence[str]) -> Dict[str, str]:
+        """The input columns the row stages use, with the dtypes to read them as.
+
+        See :meth:`analysis.schema.InputSchema.read_columns`.  Warns when the
+        header lacks configured ``scenario_weights`` columns.
+        """
+        schema = self.input_schema(header)
+        if schema.missing:
+            warnings.warn(
+                f"input has no column for scenario_weights {', '.join(map(str, schema.missing))}; "
+                "their configured weights are used",
+                stacklevel=2,
+            )
+        return schema.read_columns()
+
+    def lookup_frame(
+        self, df: pd.DataFrame, features: Optional[Sequence[FeatureRecord]] = None
+    ) -> MsdMatchBatch:
+        """MSD matches for every row of a prepared frame, in one batched join.
+
+        With the rows' ``features``, lyric words are taken from their token
+        ids wherever a row's lyrics are its text, instead of re-tokenising.
+        Rows whose normalised artist/song and lyrics were looked up before
+        reuse the tokens chosen then (see :mod:`analysis.memo`).
+        """
+        start = time.perf_counter()
+        artists, songs, lyrics = self.input_schema(df.columns).lookup_values(df)
+        candidates = None
+        if features is not None:
+            candidates = _LyricCandidates(features, lyrics, df["text"].tolist())
+        memo = self.memo if self.memo.enabled else None
+        misses = self.memo.misses
+        batch = lookup_msd_batch(
+            artists,
+            songs,
+            lyrics,
+            self.msd_index,
+            self.cfg.lyric_tokens,
+            self.cfg.lyric_max_matches,
+            self.fuzzy_index,
+            candidates,
+            memo,
+        )
+        self.stats.add("lookup_msd", time.perf_counter() - start, len(df))
+        if memo is not None:
+            self._count_memo("msd", len(df), memo.misses - misses)
+        return batch
+
+    def text_records(self, texts: Sequence[str]) -> Tuple[List[FeatureRecord], List[ScoreRecord]]:
+        """Feature and keyword score records for each text.
+
+        With the memo enabled, each distinct text is tokenised and scored
+        once per frame, or not at all when the memo holds it from an earlier
+        frame.  The memo keeps texts repeated within the frame and texts its
+        doorkeeper has seen before.  Rows with the same text get their own
+        records; the token ids and score detail entries are shared between
+        them.
+        """
+        stats = self.stats
+        memo = self.memo
+        vocab = self.vocab
+        if not memo.enabled:
+            start = time.perf_counter()
+            features = [extract_feature_record(text, vocab) for text in texts]
+            stats.add("extract_features", time.perf_counter() - start, len(texts))
+            start = time.perf_counter()
+            scores = [score_record_from_ids(f.token_ids, self.cfg, vocab) for f in features]
+            stats.add("score_mapping", time.perf_counter() - start, len(texts))
+            return features, scores
+
+        start = time.perf_counter()
+        found: Dict[str, Any] = {text: memo.get(text) for text in dict.fromkeys(texts)}
+        missing = [text for text, entry in found.items() if entry is None]
+        stats.add("memo", time.perf_counter() - start)
+        new: Dict[str, Tuple[FeatureRecord, ScoreRecord]] = {}
+        if missing:
+            start = time.perf_counter()
+            new_features = [extract_feature_record(text, vocab) for text in missing]
+            stats.add("extract_features", time.perf_counter() - start, len(missing))
+            start = time.perf_counter()
+            new_scores = [score_record_from_ids(f.token_ids, self.cfg, vocab) for f in new_features]
+            stats.add("score_mapping", time.perf_counter() - start, len(missing))
+            start = time.perf_counter()
+            for text, feats, score in zip(missing, new_features, new_scores):
+                new[text] = (feats, score)
+                if memo.admit(text):
+                    entry = found[text] = _text_entry(feats, score)
+                    memo.put(text, entry, text_entry_size(text, feats.token_ids, score.details))
+            stats.add("memo", time.perf_counter() - start)
+        start = time.perf_counter()
+        features = []
+        scores = []
+        for text in texts:
+            entry = found[text]
+            if entry is None:
+                # the first row with a new text takes the records computed for it
+                feats, score = new[text]
+                found[text] = _FIRST_ROW
+            else:
+                if entry is _FIRST_ROW:
+                    # rows change their records, so repeats copy them; a
+                    # text repeated within the frame is worth keeping
+                    feats, score = new[text]
+                    entry = found[text] = _text_entry(feats, score)
+                    memo.put(text, entry, text_entry_size(text, feats.token_ids, score.details))
+                num_chars, num_words, avg_word_len, token_ids, psych, music, details = entry
+                feats = FeatureRecord(num_chars, num_words, avg_word_len, token_ids=token_ids, vocab=vocab)
+                score = ScoreRecord(psych, music, dict(details))
+            features.append(feats)
+            scores.append(score)
+        stats.add("memo", time.perf_counter() - start)
+        self._count_memo("text", len(texts), len(missing))
+        return features, scores
+
+    def _count_memo(self, kind: str, rows: int, computed: int) -> None:
+        # rows computed, and rows served by the memo or an earlier row of the frame
+        self.stats.count(f"{kind}_memo_misses", computed)
+        self.stats.count(f"{kind}_memo_hits", rows - computed)
+
+    def _renew_vocabulary(self) -> None:
+        # called per frame and row: make this pipeline's vocabulary current and
+        # bound it; memo entries hold its ids, so a new vocabulary clears the memo
+        if len(self.vocab) >= MAX_VOCABULARY:
+            self.vocab = Vocabulary()
+            self.memo.clear()
+        use_vocabulary(self.vocab)
+
+    def _frame_records(self, df: pd.DataFrame) -> Iterator[ResultRecord]:
+        self._renew_vocabulary()
+        if df.empty:
+            return
+        schema = self.input_schema(df.columns)
+        texts = schema.texts(df)
+        features, scores = self.text_records(texts)
+        matches = self.lookup_frame(df, features)
+        stats = self.stats
+        n = len(df)
+        start = time.perf_counter()
+        scenarios = schema.scenario_vectors(df)
+        stats.add("scenario_vector", time.perf_counter() - start, n)
+        start = time.perf_counter()
+        profiles = profile_batch(features, scores, scenarios, matches)
+        preferences = profiles.preference_profiles()
+        personalities = profiles.personality_profiles()
+        stats.add("profiles", time.perf_counter() - start, n)
+        start = time.perf_counter()
+        correlations = profiles.correlations(self.lut_tables)
+        stats.add("correlations", time.perf_counter() - start, n)
+        counts = profiles.match_count
+        stats.count("rows_processed", n)
+        if counts.any():
+            stats.count("msd_rows_matched", int((counts > 0).sum()))
+            stats.count("msd_matches", int(counts.sum()))
+        for i, idx in enumerate(df.index.tolist()):
+            yield self._result_record(
+                idx, texts[i], features[i], scores[i], scenarios[i], matches[i],
+                preferences[i], personalities[i], correlations[i],
+            )
+
+    def process_frame(self, df: pd.DataFrame) -> List[ResultRecord]:
+        """Process every row of a prepared input frame, in order.
+
+        The profiles and correlations of the whole frame are computed at once
+        by :func:`analysis.batch.profile_batch`; :meth:`process_row` uses the
+        per-row functions, which the batch results equal.
+        """
+        return list(self._frame_records(df))
+
+    def iter_results(
+        self,
+        input_path: str,
+        chunk_size: Optional[int] = None,
+        workers: Optional[int] = None,
+    ) -> Iterator[Result]:
+        """Like :meth:`iter_records`, but yields validated :class:`Result` models."""
+        for record in self.iter_records(input_path, chunk_size, workers):
+            yield result_model(record)
+
+    def iter_records(
+        self,
+        input_path: str,
+        chunk_size: Optional[int] = None,
+        workers: Optional[int] = None,
+        store: Optional[ResultStore] = None,
+    ) -> Iterator[ResultRecord]:
+        """Yield a :class:`ResultRecord` per input row without retaining them.
+
+        Only the columns named by :meth:`input_columns` are read, from one
+        or more CSV files (see :func:`iter_input_frames`).  With
+        ``chunk_size`` they are read ``chunk_size`` rows at a time so memory
+        use does not grow with the size of the input.  With ``workers``
+        greater than one, chunks are processed in a pool of that many
+        processes; results are still yielded in input order.  With ``store``
+        (see :mod:`analysis.resultstore`), rows whose content and config are
+        unchanged since an earlier run are read back instead of recomputed,
+        and new results are added to the store.
+        """
+        parallel = bool(workers) and int(workers) > 1
+        if parallel and not chunk_size:
+            chunk_size = DEFAULT_WORKER_CHUNK_SIZE
+        frames: Iterable[pd.DataFrame] = self.stats.timed(
+            "read_input", iter_input_frames(input_path, chunk_size, self.input_columns)
+        )
+        # records from workers and the store are decoded into the current vocabulary
+        if store is None:
+            for records in self._map_frames(frames, int(workers or 1)):
+                self._renew_vocabulary()
+                yield from records
+            return
+
+        fingerprint = self.result_fingerprint(store)
+        lookups: Deque[Tuple[pd.Index, List[bytes], Dict[bytes, bytes]]] = deque()
+
+        def misses() -> Iterator[pd.DataFrame]:
+            # runs ahead of the loop below by the frames in flight
+            for df in frames:
+                start = time.perf_counter()
+                keys = store.row_keys(fingerprint, df.columns, df.itertuples(index=False, name=None))
+                found = store.get_many(keys)
+                self.stats.add("result_cache", time.perf_counter() - start)
+                lookups.append((df.index, keys, found))
+                yield df[[key not in found for key in keys]]
+
+        for records in self._map_frames(misses(), int(workers or 1)):
+            self._renew_vocabulary()
+            index, keys, found = lookups.popleft()
+            computed = iter(records)
+            for idx, key in zip(index, keys):
+                payload = found.get(key)
+                if payload is None:
+                    record = next(computed)
+                    store.put(key, record)
+                else:
+                    record = store.decode(payload, idx)
+                yield record
+
+    def result_fingerprint(self, store: ResultStore) -> bytes:
+        """Fingerprint of the config, sources and options that shape a result."""
+        dump = getattr(self.cfg, "model_dump", None)
+        config = dump() if dump is not None else self.cfg.dict()
+        config.pop("msd_cache", None)  # where the index is cached does not matter
+        return store.fingerprint(
+            config, list(self.cfg.msd_paths) + list(self.cfg.lut_files), drop_words=self.drop_words
+        )
+
+    def _map_frames(self, frames: Iterable[pd.DataFrame], workers: int) -> Iterator[Iterable[ResultRecord]]:
+        """Yield the records of each frame, frame by frame, in order."""
+        if workers > 1:
+            yield from self._map_frames_parallel(frames, workers)
+            return
+        for df in frames:
+            yield self._frame_records(df)
+
+    def _map_frames_parallel(self, frames: Iterable[pd.DataFrame], workers: int) -> Iterator[List[ResultRecord]]:
+        global _WORKER_PIPELINE
+        # deferred: only --workers runs need a process pool
+        import multiprocessing
+        from concurrent.futures import Future, ProcessPoolExecutor
+
+        # compile lazily built state before the workers are forked
+        self.cfg.keyword_matcher()
+        forked = "fork" in multiprocessing.get_all_start_methods()
+        if forked:
+            # workers inherit this pipeline (config, MSD index, LUT tables)
+            # copy-on-write instead of receiving a pickled copy per task
+            _WORKER_PIPELINE = self
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+        else:
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(self.mapping_path, self.msd_cache, self.memo.max_bytes),
+            )
+        pending: Deque[Future] = deque()
+
+        def collect(future: Future) -> List[ResultRecord]:
+            records, stats = future.result()
+            self.stats.merge(stats)
+            return records
+
+        try:
+            for df in frames:
+                pending.append(pool.submit(_process_frame_in_worker, df))
+                # bound the chunks in flight so memory stays flat
+                if len(pending) >= 2 * workers:
+                    yield collect(pending.popleft())
+            while pending:
+                yield collect(pending.popleft())
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            if forked:
+                _WORKER_PIPELINE = None
 
     def run(self, args: Optional[Any] = None) -> List[Result]:
+        """Process ``args.input`` and write the requested outputs.
+
+        When ``args.chunk_size`` is set, results are streamed straight to the
+        JSONL and aggregate outputs and an empty list is returned; use
+        :meth:`iter_results` to consume them programmatically.  The HTML report
+        still needs every row, so it keeps results in memory unless
+        ``args.html_page_size`` selects the paginated report
+        (:mod:`analysis.report`), which streams rows to page files; then no
+        results are kept and an empty list is returned too.  ``args.workers``
+        spreads the rows over a process pool (see :meth:`iter_records`).
+
+        Rows are processed as lightweight :mod:`analysis.records`; they are
+        only validated into pydantic models for the returned list, or for
+        every row before it is written when ``args.validate`` is set.
+        ``args.drop_words`` discards each row's word list after scoring.
+        A JSONL path ending in ``.gz``/``.zst`` is compressed;
+        ``args.jsonl_encoder`` selects the encoder (see :mod:`analysis.io.jsonl`).
+        ``args.parquet`` and ``args.arrow`` (paths or booleans) write typed
+        columns to Parquet and Arrow IPC files in row groups (see
+        :mod:`analysis.io.arrow`; needs ``pyarrow``).
+        ``args.aggregate_state`` also saves the mergeable aggregate state
+        (see :mod:`analysis.aggregate`).  ``args.result_cache`` names an SQLite
+        result store reused across runs (``args.result_cache_size`` caps it,
+        in MiB).  ``args.memo_size`` caps the in-memory memo of repeated texts
+        and MSD lookups, in MiB (see :mod:`analysis.memo`; 0 disables it).
+
+        ``args.profile`` writes per-stage timings and counters as JSON (see
+        :mod:`analysis.profiling`); ``args.cprofile`` and ``args.flamegraph``
+        profile the whole run into a pstats file and folded stack samples.
+        """
         # args can be Namespace or dict; provide flexible access
         if args is None:
             raise ValueError("args is required; pass argparse.Namespace or dict-like with input/jsonl/aggregate/html")
@@ -618,45 +1077,40 @@ class Pipeline:
             except Exception:
                 return default
 
+        cprofile_path = _get("cprofile")
+        flamegraph_path = _get("flamegraph")
+        if cprofile_path or flamegraph_path:
+            with profile_hooks(cprofile_path, flamegraph_path):
+                return self._run(_get)
+        return self._run(_get)
+
+    def _run(self, _get: Any) -> List[Result]:
+        started = time.perf_counter()
+        self.stats = stats = StageStats()
         input_path = _get("input")
         if not input_path:
             raise ValueError("--input is required")
         mapping_path = _get("mapping") or self.mapping_path
-        if mapping_path:
-            self.cfg = load_mapping_yaml(mapping_path)
-            self.msd_index = load_msd_index(self.cfg.msd_paths)
-            self.lut_tables = load_lut_files(self.cfg.lut_files)
-
-        df = load_csv(input_path)
-        results: List[Result] = []
-        for idx, row in df.iterrows():
-            text = str(row["text"])
-            feats = extract_features(text)
-            score = score_from_mapping(feats.words, self.cfg)
-            scenario_vector = build_scenario_vector(row, self.cfg.scenario_weights)
-            artist = row.get("artist") or row.get("respondent_artist")
-            song = row.get("song") or row.get("song_name")
-            lyrics = row.get("lyrics") or text
-            msd_matches = lookup_msd(artist, song, lyrics, self.msd_index)
-            preference_profile = derive_preference_profile(score, scenario_vector, msd_matches, feats)
-            personality_profile = derive_personality_profile(feats, score, preference_profile)
-            adjusted_preference = feedback_adjust_preference(preference_profile, personality_profile)
-            correlations = build_correlation_matrix(adjusted_preference, personality_profile, self.lut_tables)
-
-            score.preference_profile = adjusted_preference
-            score.personality_profile = personality_profile
-            score.correlations = correlations
-            score.details.update({
-                "scenarios": scenario_vector,
-                "msd_matches": msd_matches,
-            })
-
-            res = Result(id=int(idx), text=text, features=feats, score=score)
-            results.append(res)
+        msd_cache = _get("msd_cache") or self.msd_cache
+        if mapping_path != self.mapping_path or msd_cache != self.msd_cache:
+            # sources for the constructor's mapping are already loaded
+            self.configure(mapping_path, msd_cache)
+
+        chunk_size = _get("chunk_size")
+        workers = _get("workers")
+        validate = bool(_get("validate"))
+        if _get("drop_words"):
+            self.drop_words = True
+        memo_mib = _get("memo_size")
+        if memo_mib is not None:
+            self.memo.resize(int(memo_mib * (1 << 20)))
 
         # outputs
-        base_dir = os.path.dirname(os.path.abspath(input_path)) or os.getcwd()
-        base_name = os.path.splitext(os.path.basename(input_path))[0]
+        # a directory or glob of inputs names its outputs after the directory
+        base_path = os.path.dirname(input_path) if is_glob(input_path) and not os.path.exists(input_path) else input_path
+        base_path = os.path.abspath(base_path)
+        base_dir = os.path.dirname(base_path) or os.getcwd()
+        base_name = os.path.basename(base_path) if os.path.isdir(base_path) else os.path.splitext(os.path.basename(base_path))[0]
 
         # JSONL
         jsonl_flag = _get("jsonl")
@@ -685,16 +1139,125 @@ class Pipeline:
         else:
             html_path = None
 
-        if jsonl_path:
-            write_jsonl(jsonl_path, results)
+        # columnar outputs: (timing stage, path, format)
+        columnar: List[Tuple[str, str, str]] = []
+        for key, fmt, suffix in (("parquet", "parquet", ".parquet"), ("arrow", "ipc", ".arrow")):
+            flag = _get(key)
+            if isinstance(flag, str) and flag:
+                columnar.append((f"write_{key}", flag, fmt))
+            elif flag:
+                columnar.append((f"write_{key}", os.path.join(base_dir, base_name + suffix), fmt))
+
+        # profile
+        profile_flag = _get("profile")
+        if isinstance(profile_flag, str) and profile_flag:
+            profile_path = profile_flag
+        elif profile_flag:
+            profile_path = os.path.join(base_dir, base_name + ".profile.json")
+        else:
+            profile_path = None
+
+        if not agg_path and _get("aggregate_state"):
+            agg_path = os.path.join(base_dir, base_name + ".aggregate.json")
+
+        html_page_size = _get("html_page_size")
+        report = None
+        if html_path and html_page_size:
+            report = HtmlReportWriter(html_path, page_size=html_page_size, text_limit=_get("html_text_limit") or 280)
+
+        # the paginated report streams like the other outputs, chunked or not
+        keep_results = report is None and (not chunk_size or bool(html_path))
+        results: List[AnyResult] = []
+        writer = JsonlWriter(jsonl_path, encoder=_get("jsonl_encoder") or "auto") if jsonl_path else None
+        tables = [(stage, ArrowResultWriter(path, fmt)) for stage, path, fmt in columnar]
+        cache_path = _get("result_cache")
+        store = None
+        if cache_path:
+            cache_mib = _get("result_cache_size")
+            store = ResultStore(cache_path, max_bytes=int(cache_mib * (1 << 20)) if cache_mib else DEFAULT_MAX_BYTES)
+        acc = AggregateAccumulator() if agg_path or report is not None else None
+        rows = 0
+        try:
+            for record in self.iter_records(input_path, chunk_size, workers, store=store):
+                rows += 1
+                stats.start()
+                res: AnyResult = record
+                if validate:
+                    res = result_model(record)
+                    stats.lap("validate")
+                if writer is not None:
+                    writer.write(res)
+                    stats.lap("write_jsonl")
+                for stage, table in tables:
+                    table.write(res)
+                    stats.lap(stage)
+                if acc is not None:
+                    acc.add(res)
+                    stats.lap("aggregate")
+                if report is not None:
+                    report.write(res)
+                    stats.lap("write_html")
+                if keep_results:
+                    results.append(res)
+        finally:
+            stats.start()
+            if writer is not None:
+                writer.close()
+                stats.lap("write_jsonl")
+            for stage, table in tables:
+                table.close()
+                stats.lap(stage)
+            if store is not None:
+                # keeps what was computed so far, so an interrupted run resumes
+                store.close()
+                stats.lap("result_cache")
+
+        stats.start()
         if agg_path:
-            write_aggregate(agg_path, results)
-        if html_path:
+            acc.write(agg_path, state_path=_get("aggregate_state"))
+            stats.lap("aggregate")
+        if report is not None:
+            report.close(acc.as_dict())
+            stats.lap("write_html")
+        elif html_path:
             html = render_html(results)
             with open(html_path, "w", encoding="utf-8") as fh:
                 fh.write(html)
+            stats.lap("write_html")
+
+        if profile_path:
+            if store is not None:
+                stats.count("result_cache_hits", store.hits)
+                stats.count("result_cache_misses", store.misses)
+            wall = time.perf_counter() - started
+            parallel = bool(workers) and int(workers) > 1
+            extra: Dict[str, Any] = {"input": input_path, "workers": int(workers or 1)}
+            if not parallel:
+                # row iteration, model building and other glue between stages
+                extra["unattributed_s"] = max(0.0, wall - sum(stats.seconds.values()))
+            with open(profile_path, "w", encoding="utf-8") as fh:
+                json.dump(stats.report(rows, wall, **extra), fh, indent=2)
+
+        if chunk_size or report is not None:
+            return []
+        return [r if isinstance(r, Result) else result_model(r) for r in results]
+
+
+# Pipeline used by pool workers: inherited through fork, or built once per
+# worker by _init_worker where fork is unavailable.
+_WORKER_PIPELINE: Optional[Pipeline] = None
+
+
+def _init_worker(mapping_path: Optional[str], msd_cache: Optional[str], memo_bytes: int = DEFAULT_MEMO_BYTES) -> None:
+    global _WORKER_PIPELINE
+    _WORKER_PIPELINE = Pipeline(mapping_path=mapping_path, msd_cache=msd_cache, memo_bytes=memo_bytes)
+
 
-        return results
+def _process_frame_in_worker(df: pd.DataFrame) -> Tuple[List[ResultRecord], StageStats]:
+    assert _WORKER_PIPELINE is not None, "worker pipeline not initialised"
+    # fresh stats per task; the parent merges them
+    _WORKER_PIPELINE.stats = StageStats()
+    return _WORKER_PIPELINE.process_frame(df), _WORKER_PIPELINE.stats
 
 
 # allow running as a script for quick tests
@@ -702,14 +1265,31 @@ if __name__ == "__main__":
     import argparse
 
     p = argparse.ArgumentParser(description="Run analysis pipeline")
-    p.add_argument("--input", "-i", required=True, help="Path to input CSV")
+    p.add_argument("--input", "-i", required=True, help="Input CSV, directory of CSVs or glob")
     p.add_argument("--mapping", help="YAML mapping file for scoring")
-    p.add_argument("--jsonl", action="store_true", help="Write JSONL output")
+    p.add_argument("--jsonl", nargs="?", const=True, help="Write JSONL output (optionally to PATH; .gz/.zst compress)")
+    p.add_argument("--jsonl-encoder", choices=("auto", "json", "orjson"), default="auto", help="JSONL encoder")
+    p.add_argument("--parquet", nargs="?", const=True, help="Write results as Parquet (optionally to PATH)")
+    p.add_argument("--arrow", nargs="?", const=True, help="Write results as an Arrow IPC file (optionally to PATH)")
     p.add_argument("--aggregate", action="store_true", help="Write aggregate JSON")
-    p.add_argument("--html", action="store_true", help="Write HTML report")
+    p.add_argument("--aggregate-state", help="Also write the mergeable aggregate state to this path")
+    p.add_argument("--html", nargs="?", const=True, help="Write HTML report (optionally to PATH)")
+    p.add_argument("--html-page-size", type=int, help="Write a paginated HTML report with this many rows per page")
+    p.add_argument("--html-text-limit", type=int, default=280, help="Truncate texts in the paginated report")
+    p.add_argument("--chunk-size", type=int, help="Stream the input in chunks of this many rows")
+    p.add_argument("--msd-cache", help="SQLite file caching the compiled MSD index")
+    p.add_argument("--workers", type=int, help="Process rows in a pool of this many processes")
+    p.add_argument("--validate", action="store_true", help="Validate every result with the pydantic models")
+    p.add_argument("--drop-words", action="store_true", help="Drop Features.words after scoring")
+    p.add_argument("--result-cache", help="SQLite file reusing per-row results across runs")
+    p.add_argument("--result-cache-size", type=float, help="Result cache size limit in MiB (default 1024)")
+    p.add_argument("--memo-size", type=float, help="Memory cap in MiB for memoised texts and MSD lookups (default 128; 0 disables)")
+    p.add_argument("--profile", nargs="?", const=True, help="Write per-stage timings and counters as JSON (optionally to PATH)")
+    p.add_argument("--cprofile", help="Profile the run with cProfile and dump the stats to this path")
+    p.add_argument("--flamegraph", help="Sample stacks during the run and write folded stacks to this path")
     ns = p.parse_args()
     try:
-        Pipeline(mapping_path=ns.mapping).run(ns)
+        Pipeline(mapping_path=ns.mapping, msd_cache=ns.msd_cache).run(ns)
     except Exception:
         print("Pipeline run failed", file=sys.stderr)
         raise
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""analysis.profiling
+
+Per-stage timing for pipeline runs, plus optional whole-run profilers.
+
+:class:`StageStats` is always on.  It keeps the cumulative seconds spent in
+each named stage and a few event counters.  A stage costs two
+``perf_counter`` calls and a dict update, which is negligible next to the
+work done per row.  ``Pipeline.run`` writes the stats as JSON when
+``--profile`` is given (see :meth:`StageStats.report`).
+
+:func:`profile_hooks` optionally wraps a run in :mod:`cProfile` (a pstats
+file for snakeviz, flameprof or ``python -m pstats``) and/or a
+:class:`StackSampler`.  The sampler writes folded stacks, one
+``frame;frame;frame count`` line per distinct stack, which flamegraph.pl and
+speedscope read directly.  Both only see the calling process; with
+``--workers`` the per-row stages run in the pool and show up as waits.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+
+class StageStats:
+    """Cumulative seconds and calls per stage, and named event counters.
+
+    Per-row stages are timed with :meth:`start` and :meth:`lap`: each lap
+    charges the time since the previous mark to the given stage.  Instances
+    pickle, so pool workers can send theirs back to be merged.
+    """
+
+    __slots__ = ("seconds", "calls", "counters", "_mark")
+
+    def __init__(self) -> None:
+        self.seconds: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self.counters: Dict[str, int] = {}
+        self._mark = 0.0
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"seconds": self.seconds, "calls": self.calls, "counters": self.counters}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.seconds = state["seconds"]
+        self.calls = state["calls"]
+        self.counters = state["counters"]
+        self._mark = 0.0
+
+    def start(self) -> None:
+        self._mark = time.perf_counter()
+
+    def lap(self, stage: str) -> None:
+        now = time.perf_counter()
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + (now - self._mark)
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+        self._mark = now
+
+    def add(self, stage: str, seconds: float, calls: int = 1) -> None:
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+        self.calls[stage] = self.calls.get(stage, 0) + calls
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, other: "StageStats") -> None:
+        for stage, seconds in other.seconds.items():
+            self.add(stage, seconds, other.calls.get(stage, 0))
+        for name, n in other.counters.items():
+            self.count(name, n)
+
+    def timed(self, stage: str, items: Iterable[T]) -> Iterator[T]:
+        """Yield from ``items``, charging the time spent producing each item to ``stage``."""
+        it = iter(items)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                self.add(stage, time.perf_counter() - start, 0)
+                return
+            self.add(stage, time.perf_counter() - start)
+            yield item
+
+    def report(self, rows: int, wall_s: float, **extra: Any) -> Dict[str, Any]:
+        """JSON-ready summary: throughput, per-stage time and share, counters.
+
+        ``share`` is a stage's fraction of the wall time.  When rows are
+        processed in worker processes the per-row stages add up time across
+        the pool, so their shares can exceed 1.
+        """
+        stages = {
+            stage: {
+                "seconds": seconds,
+                "calls": self.calls.get(stage, 0),
+                "share": seconds / wall_s if wall_s else 0.0,
+            }
+            for stage, seconds in sorted(self.seconds.items(), key=lambda kv: -kv[1])
+        }
+        out: Dict[str, Any] = {
+            "rows": rows,
+            "wall_s": wall_s,
+            "rows_per_s": rows / wall_s if wall_s else 0.0,
+        }
+        out.update(extra)
+        out["stages"] = stages
+        out["counters"] = dict(sorted(self.counters.items()))
+        return out
+
+
+def _frame_label(frame: Any) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Sample one thread's Python stack every ``interval`` seconds.
+
+    Samples are aggregated into folded stacks (root first), the input
+    format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval: float = DEFAULT_SAMPLE_INTERVAL, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def write(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as fh:
+            for stack, n in sorted(self.stacks.items()):
+                fh.write(f"{stack} {n}\n")
+
+
+@contextmanager
+def profile_hooks(
+    cprofile_path: Optional[str] = None,
+    flamegraph_path: Optional[str] = None,
+    interval: float = DEFAULT_SAMPLE_INTERVAL,
+) -> Iterator[None]:
+    """Profile the enclosed block: cProfile stats and/or folded stack samples."""
+    sampler = StackSampler(interval) if flamegraph_path else None
+    profiler = None
+    if cprofile_path:
+        import cProfile
+
+        profiler = cProfile.Profile()
+    if sampler is not None:
+        sampler.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(cprofile_path)
+        if sampler is not None:
+            sampler.stop()
+            sampler.write(flamegraph_path)  # type: ignore[arg-type]
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""analysis.records
+
+Lightweight per-row result records.
+
+The pipeline builds one result per input row.  Constructing and validating
+the pydantic ``Features``/``Score``/``Result`` models for every row is a large
+share of the run time, so the row stages produce these ``__slots__`` records
+instead.  They expose the same attributes and a compatible ``dict()`` so the
+writers accept either form; ``analysis.pipeline.result_model`` converts (and
+validates) a record into the public pydantic model where one is needed.
+
+Words are stored as integer ids in a vocabulary (:mod:`analysis.text`).
+``dict()`` shares the nested containers with the record rather than copying
+them (the word list is decoded afresh); ``from_dict`` rebuilds a record from
+that form (e.g. after a JSON round trip through the result store).
+"""
+from __future__ import annotations
+
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from analysis.text import Vocabulary, current_vocabulary
+
+
+class FeatureRecord:
+    """Text features; the words are kept as ids in ``vocab``.
+
+    ``vocab`` defaults to :func:`analysis.text.current_vocabulary`.
+    ``words`` decodes the ids on access.  Pickling sends the words
+    themselves, since ids are only meaningful in the process that assigned
+    them.
+    """
+
+    __slots__ = ("num_chars", "num_words", "avg_word_len", "token_ids", "vocab")
+
+    def __init__(
+        self,
+        num_chars: int,
+        num_words: int,
+        avg_word_len: float,
+        words: Iterable[str] = (),
+        token_ids: Optional["array[int]"] = None,
+        vocab: Optional[Vocabulary] = None,
+    ):
+        self.num_chars = num_chars
+        self.num_words = num_words
+        self.avg_word_len = avg_word_len
+        self.vocab = vocab if vocab is not None else current_vocabulary()
+        self.token_ids = token_ids if token_ids is not None else self.vocab.encode(words)
+
+    @property
+    def words(self) -> List[str]:
+        return self.vocab.decode(self.token_ids)
+
+    @words.setter
+    def words(self, words: Iterable[str]) -> None:
+        self.token_ids = self.vocab.encode(words)
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return (FeatureRecord, (self.num_chars, self.num_words, self.avg_word_len, self.words))
+
+    def dict(self) -> Dict[str, Any]:
+        return {
+            "num_chars": self.num_chars,
+            "num_words": self.num_words,
+            "avg_word_len": self.avg_word_len,
+            "words": self.words,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FeatureRecord":
+        return cls(data["num_chars"], data["num_words"], data["avg_word_len"], data["words"])
+
+
+class ScoreRecord:
+    __slots__ = ("psych", "music", "details", "preference_profile", "personality_profile", "correlations")
+
+    def __init__(self, psych: float = 0.0, music: float = 0.0, details: Optional[Dict[str, Any]] = None):
+        self.psych = psych
+        self.music = music
+        self.details: Dict[str, Any] = details if details is not None else {}
+        self.preference_profile: Dict[str, Any] = {}
+        self.personality_profile: Dict[str, Any] = {}
+        self.correlations: Dict[str, Any] = {}
+
+    def dict(self) -> Dict[str, Any]:
+        return {
+            "psych": self.psych,
+            "music": self.music,
+            "details": self.details,
+            "preference_profile": self.preference_profile,
+            "personality_profile": self.personality_profile,
+            "correlations": self.correlations,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ScoreRecord":
+        record = cls(data["psych"], data["music"], data["details"])
+        record.preference_profile = data["preference_profile"]
+        record.personality_profile = data["personality_profile"]
+        record.correlations = data["correlations"]
+        return record
+
+
+class ResultRecord:
+    __slots__ = ("id", "text", "features", "score")
+
+    def __init__(self, id: Optional[int], text: str, features: FeatureRecord, score: ScoreRecord):
+        self.id = id
+        self.text = text
+        self.features = features
+        self.score = score
+
+    def dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "text": self.text,
+            "features": self.features.dict(),
+            "score": self.score.dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ResultRecord":
+        return cls(
+            data["id"],
+            data["text"],
+            FeatureRecord.from_dict(data["features"]),
+            ScoreRecord.from_dict(data["score"]),
+        )
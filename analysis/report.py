@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""analysis.report
+
+Streaming, paginated HTML report.
+
+``HtmlReportWriter`` accepts results one at a time and keeps at most one page
+of compact rows (with texts truncated) in memory.  Each full page is rendered
+with ``Template.generate`` directly into ``<stem>.pages/page-NNNNN.html``.
+On close the index page is written to the report path.  It holds summary
+tables and SVG charts taken from the run's aggregate, plus links to every
+page.  Pages left in the directory by an earlier, longer report are removed.
+
+The single-file report from ``analysis.pipeline.render_html`` is unchanged;
+this writer is used when a page size is given (``--html-page-size``).
+"""
+from __future__ import annotations
+
+import os
+import re
+from typing import IO, Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_TEXT_LIMIT = 280
+MAX_CHART_GENRES = 20
+_PAGE_RE = re.compile(r"page-(\d{5})\.html")
+
+_STYLE = """
+    body { font-family: sans-serif; margin: 2rem; }
+    table { border-collapse: collapse; width: 100%; }
+    th, td { padding: 8px; border: 1px solid #ddd; }
+    nav { margin: 1rem 0; }
+    nav a { margin-right: 1rem; }
+    .chart text { font-size: 12px; }
+"""
+
+PAGE_TEMPLATE = """<!doctype html>
+<html>
+<head>
+  <meta charset="utf-8">
+  <title>Analysis Report – page {{ number }}</title>
+  <style>{{ style }}</style>
+</head>
+<body>
+  <h1>Analysis Report – page {{ number }}</h1>
+  <nav>
+    <a href="{{ index_href|e }}">Index</a>
+    {% if prev_href %}<a href="{{ prev_href|e }}">&larr; Previous</a>{% endif %}
+    {% if next_href %}<a href="{{ next_href|e }}">Next &rarr;</a>{% endif %}
+  </nav>
+  <p>Rows {{ first_row }}–{{ last_row }}</p>
+  <table>
+    <thead><tr><th>ID</th><th>Text</th><th>Num words</th><th>Psych</th><th>Music</th><th>Energy</th><th>Tension</th><th>Expression</th></tr></thead>
+    <tbody>
+      {% for id, text, num_words, psych, music, energy, tension, expression in rows %}
+      <tr>
+        <td>{{ id }}</td>
+        <td>{{ text|e }}</td>
+        <td>{{ num_words }}</td>
+        <td>{{ psych }}</td>
+        <td>{{ music }}</td>
+        <td>{{ energy }}</td>
+        <td>{{ tension }}</td>
+        <td>{{ expression }}</td>
+      </tr>
+      {% endfor %}
+    </tbody>
+  </table>
+</body>
+</html>
+"""
+
+INDEX_TEMPLATE = """<!doctype html>
+<html>
+<head>
+  <meta charset="utf-8">
+  <title>Analysis Report</title>
+  <style>{{ style }}</style>
+</head>
+<body>
+  <h1>Analysis Report</h1>
+  <p>Count: {{ count }}</p>
+  {% if stats %}
+  <h2>Scores</h2>
+  <table>
+    <thead><tr><th>Metric</th><th>Mean</th><th>Std dev</th><th>Min</th><th>p05</th><th>p25</th><th>p50</th><th>p75</th><th>p95</th><th>Max</th><th>Distribution</th></tr></thead>
+    <tbody>
+      {% for name, s, box in stats %}
+      <tr>
+        <td>{{ name|e }}</td>
+        <td>{{ s.mean }}</td>
+        <td>{{ s.stddev }}</td>
+        <td>{{ s.min }}</td>
+        <td>{{ s.quantiles.p05 }}</td>
+        <td>{{ s.quantiles.p25 }}</td>
+        <td>{{ s.quantiles.p50 }}</td>
+        <td>{{ s.quantiles.p75 }}</td>
+        <td>{{ s.quantiles.p95 }}</td>
+        <td>{{ s.max }}</td>
+        <td>
+          <svg class="chart" width="220" height="24" viewBox="0 0 220 24">
+            <line x1="{{ box.p05 }}" y1="12" x2="{{ box.p95 }}" y2="12" stroke="#555"/>
+            <rect x="{{ box.p25 }}" y="4" width="{{ box.p75 - box.p25 }}" height="16" fill="#9ecae1" stroke="#555"/>
+            <line x1="{{ box.p50 }}" y1="4" x2="{{ box.p50 }}" y2="20" stroke="#08306b" stroke-width="2"/>
+          </svg>
+        </td>
+      </tr>
+      {% endfor %}
+    </tbody>
+  </table>
+  {% endif %}
+  {% if genres %}
+  <h2>Genres</h2>
+  <svg class="chart" width="640" height="{{ genres|length * 22 + 4 }}" viewBox="0 0 640 {{ genres|length * 22 + 4 }}">
+    {% for genre, g, width in genres %}
+    <text x="0" y="{{ loop.index0 * 22 + 16 }}">{{ genre|e }}</text>
+    <rect x="160" y="{{ loop.index0 * 22 + 4 }}" width="{{ width }}" height="16" fill="#6baed6"/>
+    <text x="{{ 166 + width }}" y="{{ loop.index0 * 22 + 16 }}">{{ '%.1f'|format(g.mean_share * 100) }}% · {{ g.rows }} rows</text>
+    {% endfor %}
+  </svg>
+  {% endif %}
+  <h2>Pages</h2>
+  <ol>
+    {% for href, first_row, last_row in pages %}
+    <li><a href="{{ href|e }}">Rows {{ first_row }}–{{ last_row }}</a></li>
+    {% endfor %}
+  </ol>
+</body>
+</html>
+"""
+
+
+def truncate(text: Any, limit: int) -> str:
+    text = "" if text is None else str(text)
+    if limit and len(text) > limit:
+        return text[: max(0, limit - 1)].rstrip() + "…"
+    return text
+
+
+def _row(r: Any, text_limit: int) -> Tuple[Any, ...]:
+    score = r.score
+    pref = score.preference_profile or {}
+    corr = score.correlations or {}
+    return (
+        r.id,
+        truncate(r.text, text_limit),
+        r.features.num_words,
+        score.psych,
+        score.music,
+        pref.get("music_energy"),
+        corr.get("tension"),
+        corr.get("expression"),
+    )
+
+
+def _box(summary: Mapping[str, Any], width: float = 200.0, pad: float = 10.0) -> Dict[str, float]:
+    """x positions of the p05/p25/p50/p75/p95 marks on a ``width`` px axis."""
+    lo, hi = summary["min"], summary["max"]
+    span = (hi - lo) or 1.0
+    return {key: pad + width * (value - lo) / span for key, value in summary["quantiles"].items()}
+
+
+def _write(fh: IO[str], chunks: Iterator[str]) -> None:
+    for chunk in chunks:
+        fh.write(chunk)
+
+
+class HtmlReportWriter:
+    """Incremental paginated HTML report; see the module docstring."""
+
+    def __init__(self, path: str, page_size: int = DEFAULT_PAGE_SIZE, text_limit: int = DEFAULT_TEXT_LIMIT):
+        self.path = path
+        self.page_size = max(1, int(page_size))
+        self.text_limit = text_limit
+        stem = os.path.splitext(os.path.basename(path))[0]
+        self.pages_dir_name = stem + ".pages"
+        self.pages_dir = os.path.join(os.path.dirname(os.path.abspath(path)), self.pages_dir_name)
+        from jinja2 import Template  # deferred so runs without --html skip it
+
+        self._page_tpl = Template(PAGE_TEMPLATE)
+        self._index_tpl = Template(INDEX_TEMPLATE)
+        self._rows: List[Tuple[Any, ...]] = []
+        self._pages: List[Tuple[str, int, int]] = []
+        self._count = 0
+        self._pending: Optional[Tuple[str, List[Tuple[Any, ...]], int]] = None
+        os.makedirs(self.pages_dir, exist_ok=True)
+
+    def write(self, result: Any) -> None:
+        self._rows.append(_row(result, self.text_limit))
+        self._count += 1
+        if len(self._rows) >= self.page_size:
+            self._end_page()
+
+    def _page_name(self, number: int) -> str:
+        return f"page-{number:05d}.html"
+
+    def _end_page(self) -> None:
+        # a page is rendered once the next one exists (or on close) so that it
+        # can link forward; only one finished page is held back at a time
+        number = len(self._pages) + 1
+        first_row = self._count - len(self._rows) + 1
+        self._pages.append((f"{self.pages_dir_name}/{self._page_name(number)}", first_row, self._count))
+        if self._pending is not None:
+            self._render_page(*self._pending, has_next=True)
+        self._pending = (self._page_name(number), self._rows, number)
+        self._rows = []
+
+    def _render_page(self, name: str, rows: List[Tuple[Any, ...]], number: int, has_next: bool) -> None:
+        _, first_row, last_row = self._pages[number - 1]
+        context = {
+            "style": _STYLE,
+            "number": number,
+            "index_href": os.path.relpath(os.path.abspath(self.path), self.pages_dir),
+            "prev_href": self._page_name(number - 1) if number > 1 else None,
+            "next_href": self._page_name(number + 1) if has_next else None,
+            "first_row": first_row,
+            "last_row": last_row,
+            "rows": rows,
+        }
+        with open(os.path.join(self.pages_dir, name), "w", encoding="utf-8") as fh:
+            _write(fh, self._page_tpl.generate(**context))
+
+    def _remove_stale_pages(self) -> None:
+        # pages past the last one of this report, from an earlier run
+        for name in os.listdir(self.pages_dir):
+            match = _PAGE_RE.fullmatch(name)
+            if match is not None and int(match.group(1)) > len(self._pages):
+                os.remove(os.path.join(self.pages_dir, name))
+
+    def close(self, aggregate: Optional[Mapping[str, Any]] = None) -> None:
+        """Flush the last page and write the index; ``aggregate`` is an
+        :meth:`analysis.aggregate.AggregateAccumulator.as_dict` result."""
+        if self._rows:
+            self._end_page()
+        if self._pending is not None:
+            self._render_page(*self._pending, has_next=False)
+            self._pending = None
+        self._remove_stale_pages()
+        aggregate = aggregate or {}
+        stats = [
+            (name, summary, _box(summary))
+            for name, summary in (aggregate.get("stats") or {}).items()
+            if summary.get("count")
+        ]
+        genres = list((aggregate.get("genres") or {}).items())[:MAX_CHART_GENRES]
+        top = max((g["mean_share"] for _, g in genres), default=0.0) or 1.0
+        context = {
+            "style": _STYLE,
+            "count": aggregate.get("count", self._count),
+            "stats": stats,
+            "genres": [(genre, g, round(400 * g["mean_share"] / top, 1)) for genre, g in genres],
+            "pages": self._pages,
+        }
+        with open(self.path, "w", encoding="utf-8") as fh:
+            _write(fh, self._index_tpl.generate(**context))
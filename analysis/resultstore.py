@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""analysis.resultstore
+
+Content-addressed store of per-row results for incremental re-runs.
+
+Each result is keyed by the SHA-1 of a run fingerprint and the input row.
+The fingerprint covers the effective mapping config, the content digests of
+its MSD and LUT files, the ``drop_words`` setting and a format version.  A
+row whose content and configuration are unchanged is therefore read back
+instead of recomputed; changing the mapping or any source file
+invalidates every key at once.
+
+Results are stored as zlib-compressed JSON in an SQLite file.  New results are
+committed every ``commit_every`` rows, so an interrupted run resumes from the
+last commit on the next invocation.  Each open of the store is a new
+generation.  Hits are stamped with the current generation, and when the
+payloads exceed ``max_bytes`` the least recently used entries are evicted on
+close.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import zlib
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from analysis.io.digest import file_digest, file_signature
+from analysis.io.jsonl import json_default
+from analysis.records import ResultRecord
+
+if TYPE_CHECKING:
+    import sqlite3
+
+# bump when the per-row pipeline changes in a way that alters results
+RESULT_FORMAT_VERSION = 5
+DEFAULT_MAX_BYTES = 1 << 30
+_LOOKUP_BATCH = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    key BLOB PRIMARY KEY,
+    payload BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    used INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_by_used ON results (used);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class ResultStore:
+    """Persistent ``row key -> ResultRecord`` cache; see the module docstring.
+
+    ``hits``/``misses`` count lookups for the current run.  Like
+    :class:`analysis.msd.CachedMsdIndex`, connections are opened per process.
+    """
+
+    def __init__(self, db_path: str, max_bytes: int = DEFAULT_MAX_BYTES, commit_every: int = 1000):
+        self.db_path = db_path
+        self.max_bytes = int(max_bytes)
+        self.commit_every = max(1, int(commit_every))
+        self.hits = 0
+        self.misses = 0
+        self._conn_pid: Optional[int] = None
+        self._conn_obj: Optional[sqlite3.Connection] = None
+        self._pending: List[Tuple[bytes, bytes, int, int]] = []
+        conn = self._conn
+        conn.executescript(_SCHEMA)
+        with conn:
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('generation', 0)")
+            conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'generation'")
+        self.generation = conn.execute("SELECT value FROM meta WHERE name = 'generation'").fetchone()[0]
+        self._bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        if self._conn_obj is None or self._conn_pid != os.getpid():
+            import sqlite3  # deferred: only --result-cache runs need it
+
+            self._conn_obj = sqlite3.connect(self.db_path)
+            self._conn_pid = os.getpid()
+        return self._conn_obj
+
+    def file_digest(self, path: str) -> str:
+        """SHA-1 of ``path``, re-hashed only when its size or mtime changed.
+
+        Returns ``"missing"`` or ``"unreadable"`` for paths that cannot be hashed.
+        """
+        if not path or not os.path.exists(path):
+            return "missing"
+        sig = file_signature(path)
+        conn = self._conn
+        row = conn.execute("SELECT size, mtime_ns, digest FROM files WHERE path = ?", (sig.path,)).fetchone()
+        if row is not None and (row[0], row[1]) == (sig.size, sig.mtime_ns):
+            return row[2]
+        try:
+            digest = file_digest(path)
+        except OSError:
+            # e.g. a directory or an unreadable file; the run reports it as an error
+            return "unreadable"
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", (sig.path, sig.size, sig.mtime_ns, digest))
+        return digest
+
+    def fingerprint(self, config: Mapping[str, Any], paths: Sequence[str], **extra: Any) -> bytes:
+        """Digest of everything besides the row that determines a result."""
+        h = hashlib.sha1()
+        h.update(f"v{RESULT_FORMAT_VERSION}\0".encode())
+        h.update(json.dumps(config, sort_keys=True, default=json_default).encode("utf-8"))
+        for path in paths:
+            h.update(f"\0{path}\0{self.file_digest(path)}".encode("utf-8"))
+        h.update(json.dumps(extra, sort_keys=True, default=json_default).encode("utf-8"))
+        return h.digest()
+
+    @staticmethod
+    def row_keys(fingerprint: bytes, columns: Sequence[Any], rows: Iterable[Sequence[Any]]) -> List[bytes]:
+        """One key per row of values (in ``columns`` order)."""
+        prefix = hashlib.sha1(fingerprint)
+        prefix.update(json.dumps([str(c) for c in columns]).encode("utf-8"))
+        keys = []
+        for values in rows:
+            h = prefix.copy()
+            h.update(json.dumps(values, ensure_ascii=False, default=json_default).encode("utf-8"))
+            keys.append(h.digest())
+        return keys
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, bytes]:
+        """Return the stored payloads for ``keys`` that are present."""
+        conn = self._conn
+        found: Dict[bytes, bytes] = {}
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), _LOOKUP_BATCH):
+            batch = unique[start:start + _LOOKUP_BATCH]
+            marks = ",".join("?" * len(batch))
+            found.update(conn.execute(f"SELECT key, payload FROM results WHERE key IN ({marks})", batch).fetchall())
+        if found:
+            with conn:
+                conn.executemany(
+                    "UPDATE results SET used = ? WHERE key = ?", ((self.generation, key) for key in found)
+                )
+        self.hits += sum(1 for key in keys if key in found)
+        self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    @staticmethod
+    def decode(payload: bytes, idx: Any) -> ResultRecord:
+        record = ResultRecord.from_dict(json.loads(zlib.decompress(payload)))
+        record.id = int(idx)
+        return record
+
+    def put(self, key: bytes, record: ResultRecord) -> None:
+        data = json.dumps(record.dict(), ensure_ascii=False, default=json_default).encode("utf-8")
+        payload = zlib.compress(data, 1)
+        self._pending.append((key, payload, len(payload), self.generation))
+        if len(self._pending) >= self.commit_every:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        # a key can repeat within a batch (duplicate input rows)
+        rows = list({row[0]: row for row in self._pending}.values())
+        conn = self._conn
+        with conn:
+            for key, _, size, _ in rows:
+                old = conn.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+                self._bytes += size - (old[0] if old else 0)
+            conn.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", rows)
+        self._pending = []
+
+    def evict(self) -> int:
+        """Drop least recently used results until under ``max_bytes``."""
+        conn = self._conn
+        removed = 0
+        while self._bytes > self.max_bytes:
+            rows = conn.execute("SELECT key, size FROM results ORDER BY used LIMIT 1000").fetchall()
+            if not rows:
+                break
+            victims = []
+            for key, size in rows:
+                victims.append((key,))
+                self._bytes -= size
+                if self._bytes <= self.max_bytes:
+                    break
+            with conn:
+                conn.executemany("DELETE FROM results WHERE key = ?", victims)
+            removed += len(victims)
+        return removed
+
+    def close(self) -> None:
+        if self._conn_obj is None:
+            return
+        self.flush()
+        self.evict()
+        self._conn_obj.close()
+        self._conn_obj = None
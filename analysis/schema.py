@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""analysis.schema
+
+Where the row stages find their inputs in a file's columns.
+
+An :class:`InputSchema` is resolved once per input file (per distinct set of
+columns), not per row.  It decides:
+
+* the text column: the first ``text``/``content``/``body``/``lyrics`` column
+  in header order, else the first column;
+* the artist, song and lyrics columns for the MSD lookup, in order of
+  preference;
+* the scenario columns: the mapping's ``scenario_weights`` keys, or
+  without them every ``Q5*``/``*scenario*`` column.
+
+Configured scenario columns that the file lacks are listed in
+:attr:`InputSchema.missing`; those answers fall back to their weights.  The
+row stages then read whole columns through the schema
+(:meth:`~InputSchema.texts`, :meth:`~InputSchema.lookup_values`,
+:meth:`~InputSchema.scenario_vectors`) instead of searching each row.
+"""
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analysis.io.loaders import NUMERIC
+from analysis.msd import is_present
+
+# candidates for the text column, in header order; else the first column
+TEXT_COLUMNS = ("text", "content", "body", "lyrics")
+# input columns for the MSD lookup, in order of preference; lyrics fall back to the text
+ARTIST_COLUMNS = ("artist", "respondent_artist")
+SONG_COLUMNS = ("song", "song_name")
+LYRICS_COLUMNS = ("lyrics", "text")
+LOOKUP_COLUMNS = ARTIST_COLUMNS + SONG_COLUMNS + LYRICS_COLUMNS
+
+
+def text_column(columns: Sequence[Any]) -> Any:
+    """The column holding each row's text (``None`` without columns)."""
+    for c in columns:
+        if isinstance(c, str) and c.lower() in TEXT_COLUMNS:
+            return c
+    return columns[0] if len(columns) else None
+
+
+def is_scenario_column(name: Any) -> bool:
+    """Whether ``name`` looks like a scenario answer (``Q5*``, ``*scenario*``)."""
+    if not isinstance(name, str):
+        return False
+    lower = name.lower()
+    return lower.startswith("q5") or "scenario" in lower
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _answers(col: pd.Series) -> np.ndarray:
+    """A scenario column as float64; NaN where missing or not a number."""
+    if pd.api.types.is_numeric_dtype(col.dtype):
+        return col.to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.fromiter((_to_float(v) for v in col.tolist()), dtype=np.float64, count=len(col))
+
+
+class InputSchema:
+    """The resolved input columns of one file; see the module docstring."""
+
+    __slots__ = ("columns", "text", "artist", "song", "lyrics", "scenarios", "weights", "missing")
+
+    def __init__(self, columns: Sequence[Any], scenario_weights: Optional[Mapping[str, float]] = None):
+        self.columns: Tuple[Any, ...] = tuple(columns)
+        present = set(self.columns)
+        self.text = text_column(self.columns)
+        self.artist = tuple(c for c in ARTIST_COLUMNS if c in present)
+        self.song = tuple(c for c in SONG_COLUMNS if c in present)
+        self.lyrics = tuple(c for c in LYRICS_COLUMNS if c in present)
+        # configured weights, in config order, or None to detect the answers
+        self.weights: Optional[Dict[str, float]] = dict(scenario_weights) if scenario_weights else None
+        if self.weights is not None:
+            self.scenarios = tuple(c for c in self.weights if c in present)
+            self.missing = tuple(c for c in self.weights if c not in present)
+        else:
+            self.scenarios = tuple(c for c in self.columns if is_scenario_column(c))
+            self.missing = ()
+
+    def read_columns(self) -> Dict[str, str]:
+        """The columns to read, with their dtypes (see :mod:`analysis.io.loaders`)."""
+        wanted: Dict[str, str] = {}
+        if self.text is not None:
+            wanted[self.text] = "str"
+        wanted.update((c, "str") for c in self.artist + self.song + self.lyrics)
+        wanted.update((c, NUMERIC) for c in self.scenarios if c not in wanted)
+        return wanted
+
+    def texts(self, df: pd.DataFrame) -> List[str]:
+        """Each row's text from a prepared frame (which has a ``text`` column)."""
+        return [str(t) for t in df["text"].tolist()]
+
+    def lookup_values(self, df: pd.DataFrame) -> Tuple[List[Any], List[Any], List[Any]]:
+        """Per-row artist, song and lyrics: the first present value of each group."""
+        width = len(df)
+
+        def pick(names: Tuple[str, ...]) -> List[Any]:
+            if not names:
+                return [None] * width
+            if len(names) == 1:
+                return df[names[0]].tolist()
+            cols = [df[c].tolist() for c in names]
+            return [next((v for v in values if is_present(v)), None) for values in zip(*cols)]
+
+        return pick(self.artist), pick(self.song), pick(self.lyrics)
+
+    def scenario_vectors(self, df: pd.DataFrame) -> List[Dict[str, float]]:
+        """Every row's scenario vector, as :func:`analysis.pipeline.build_scenario_vector` builds it.
+
+        Configured answers that are missing or not finite fall back to their
+        weight; detected answers that are missing or not finite are left out.
+        """
+        n = len(df)
+        if self.weights is not None:
+            keys = list(self.weights)
+            cols = []
+            for key, weight in self.weights.items():
+                if key in self.scenarios:
+                    values = _answers(df[key])
+                    cols.append(np.where(np.isfinite(values), values, float(weight)).tolist())
+                else:
+                    cols.append([float(weight)] * n)
+            return [dict(zip(keys, row)) for row in zip(*cols)] if n else []
+        if not self.scenarios:
+            return [{} for _ in range(n)]
+        keys = list(self.scenarios)
+        values = np.column_stack([_answers(df[c]) for c in keys])
+        finite = np.isfinite(values)
+        rows = values.tolist()
+        if finite.all():
+            return [dict(zip(keys, row)) for row in rows]
+        return [
+            {k: v for k, v, ok in zip(keys, row, mask) if ok}
+            for row, mask in zip(rows, finite.tolist())
+        ]
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""analysis.text
+
+Tokenisation helpers shared by the pipeline stages.
+
+A row's text is tokenised once, with :data:`WORD_RE`, into ids in an
+interned :class:`Vocabulary`.  ``FeatureRecord`` keeps them as a compact
+``array("I")`` instead of a list of strings, together with the vocabulary
+they belong to.  The keyword matcher, the vocabulary size and the MSD lyric
+fallback all work on the ids.  Every token also knows the id of its
+lower-cased form, so those stages never lower-case or re-tokenise the text.
+
+A vocabulary only grows, so ids are stable for its lifetime.  Each
+:class:`~analysis.pipeline.Pipeline` owns one and replaces it when it is
+reconfigured or grows too large; records made earlier keep theirs.
+Callers that do not name a vocabulary use the current one
+(:func:`current_vocabulary`), which a pipeline sets to its own.  Ids are
+not shared between processes, so records cross process boundaries as
+words (see ``FeatureRecord.__reduce__``).  A vocabulary may be grown from
+several threads at once, e.g. by records unpickled off a worker pool.
+"""
+from __future__ import annotations
+
+import re
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence
+
+WORD_RE = re.compile(r"\w+")
+
+
+class _Ids(Dict[str, int]):
+    """Token -> id; unseen tokens are added to the vocabulary on lookup."""
+
+    def __init__(self, vocab: "Vocabulary"):
+        super().__init__()
+        self._vocab = vocab
+
+    def __missing__(self, token: str) -> int:
+        return self._vocab._add(token)
+
+
+class Vocabulary:
+    """Interned tokens, each with an int id and the id of its lower-cased form.
+
+    Lookups of known tokens take no lock; new tokens are added under one,
+    and a token's id is published only once its entries are complete.
+    """
+
+    def __init__(self) -> None:
+        self.tokens: List[str] = []
+        # id -> id of the lower-cased token
+        self.lower: List[int] = []
+        # ids whose lower-cased form is not a single WORD_RE token
+        self.unstable: set = set()
+        self._ids = _Ids(self)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def _add(self, token: str) -> int:
+        with self._lock:
+            # another thread may have added it since the lock-free miss
+            tid = self._ids.get(token)
+            return self._insert(token) if tid is None else tid
+
+    def _insert(self, token: str) -> int:
+        # called with the lock held
+        tid = len(self.tokens)
+        self.tokens.append(token)
+        self.lower.append(tid)
+        low = token.lower()
+        if low != token:
+            low_id = self._ids.get(low)
+            self.lower[tid] = self._insert(low) if low_id is None else low_id
+        if WORD_RE.fullmatch(low) is None:
+            self.unstable.add(tid)
+        self._ids[token] = tid
+        return tid
+
+    def get(self, token: str) -> Optional[int]:
+        """The id of ``token``, or ``None`` if it is not in the vocabulary (never adds it)."""
+        return self._ids.get(token)
+
+    def encode(self, words: Iterable[str]) -> "array[int]":
+        return array("I", map(self._ids.__getitem__, words))
+
+    def decode(self, ids: Iterable[int]) -> List[str]:
+        tokens = self.tokens
+        return [tokens[i] for i in ids]
+
+    def lowered(self, ids: Iterable[int]) -> List[int]:
+        lower = self.lower
+        return [lower[i] for i in ids]
+
+    def distinct_lower(self, ids: Sequence[int], limit: int) -> Optional[List[str]]:
+        """The first ``limit`` distinct lower-cased tokens, in text order.
+
+        This is what tokenising the lower-cased text gives, unless a token
+        changes shape when lower-cased; then ``None`` is returned and the
+        caller should tokenise the text itself.
+        """
+        lower = self.lower
+        unstable = self.unstable
+        seen: Dict[int, None] = {}
+        for i in ids:
+            if i in unstable:
+                return None
+            seen[lower[i]] = None
+            if len(seen) >= limit:
+                break
+        tokens = self.tokens
+        return [tokens[i] for i in seen]
+
+
+_CURRENT = Vocabulary()
+
+
+def current_vocabulary() -> Vocabulary:
+    """The vocabulary used where none is given (see the module docstring)."""
+    return _CURRENT
+
+
+def use_vocabulary(vocab: Vocabulary) -> None:
+    """Make ``vocab`` the current vocabulary."""
+    global _CURRENT
+    _CURRENT = vocab
@@ -0,0 +1,52 @@
+"""Shared fixtures for the ``analysis`` package tests.
+
+Run from the repository root with ``python -m pytest tests``.
+"""
+import os
+import shutil
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis.benchmarks.corpus import generate_corpus, write_mapping  # noqa: E402
+from analysis.pipeline import Pipeline  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def corpus(tmp_path_factory):
+    """A small synthetic survey, mapping, MSD sources and LUTs (read-only)."""
+    return generate_corpus(str(tmp_path_factory.mktemp("corpus")), rows=300, msd_rows=2_000, lut_rows=50)
+
+
+@pytest.fixture
+def own_corpus(tmp_path, corpus):
+    """A copy of :func:`corpus` whose files a test may change."""
+    out = tmp_path / "corpus"
+    out.mkdir()
+    paths = type(corpus)(*(str(out / os.path.basename(p)) for p in corpus))
+    for src, dst in zip(corpus, paths):
+        shutil.copyfile(src, dst)
+    write_mapping(paths.mapping, [paths.msd_cls, paths.msd_csv], [paths.lut_json, paths.lut_csv])
+    return paths
+
+
+@pytest.fixture
+def run_outputs(tmp_path):
+    """Run a pipeline over a corpus; returns the JSONL and aggregate bytes."""
+    runs = iter(range(1_000))
+
+    def run(corpus, pipeline=None, **args):
+        out = tmp_path / f"run-{next(runs)}"
+        out.mkdir()
+        pipeline = pipeline or Pipeline(corpus.mapping)
+        pipeline.run({
+            "input": corpus.survey,
+            "jsonl": str(out / "out.jsonl"),
+            "aggregate": str(out / "aggregate.json"),
+            **args,
+        })
+        return (out / "out.jsonl").read_bytes(), (out / "aggregate.json").read_bytes()
+
+    return run
@@ -0,0 +1,83 @@
+import json
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+from analysis.aggregate import AggregateAccumulator, main
+from analysis.pipeline import Pipeline
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SHARDS = [(0, 70), (70, 71), (71, 300)]
+
+
+@pytest.fixture(scope="module")
+def results(corpus):
+    return Pipeline(corpus.mapping).run({"input": corpus.survey})
+
+
+def _accumulate(results):
+    acc = AggregateAccumulator()
+    for r in results:
+        acc.add(r)
+    return acc
+
+
+def _split_quantiles(agg):
+    agg = json.loads(json.dumps(agg))
+    return agg, {key: stats.pop("quantiles") for key, stats in agg["stats"].items()}
+
+
+def _assert_same_aggregate(merged, single):
+    # everything but the quantile sketches is exact
+    merged, merged_quantiles = _split_quantiles(merged)
+    single, single_quantiles = _split_quantiles(single)
+    assert merged == single
+    for key, stats in single["stats"].items():
+        spread = max(stats["max"] - stats["min"], 1e-12)
+        for name, value in merged_quantiles[key].items():
+            assert abs(value - single_quantiles[key][name]) <= 0.05 * spread
+
+
+def test_merged_shards_match_single_pass(results):
+    single = _accumulate(results).as_dict()
+    assert single["count"] == 300 and single["genres"]
+    merged = AggregateAccumulator()
+    # shards merged out of order, each through a serialised state
+    for start, stop in reversed(SHARDS):
+        state = json.loads(json.dumps(_accumulate(results[start:stop]).to_state()))
+        merged.merge(AggregateAccumulator.from_state(state))
+    _assert_same_aggregate(merged.as_dict(), single)
+
+
+def test_state_round_trip(tmp_path, results):
+    acc = _accumulate(results[:50])
+    acc.write_state(str(tmp_path / "state.json"))
+    assert AggregateAccumulator.read_state(str(tmp_path / "state.json")).as_dict() == acc.as_dict()
+    with pytest.raises(ValueError, match="version"):
+        AggregateAccumulator.from_state({**acc.to_state(), "version": 0})
+
+
+def test_cli_merges_pipeline_states(tmp_path, corpus):
+    single = tmp_path / "single.json"
+    Pipeline(corpus.mapping).run({"input": corpus.survey, "aggregate": str(single)})
+    df = pd.read_csv(corpus.survey)
+    states = []
+    for i, (start, stop) in enumerate(SHARDS):
+        shard = tmp_path / f"shard{i}.csv"
+        df.iloc[start:stop].to_csv(shard, index=False)
+        states.append(str(tmp_path / f"shard{i}.state.json"))
+        Pipeline(corpus.mapping).run({"input": str(shard), "aggregate_state": states[-1]})
+    expected = json.loads(single.read_text())
+
+    main([*states, "-o", str(tmp_path / "main.json"), "--state", str(tmp_path / "merged.state.json")])
+    _assert_same_aggregate(json.loads((tmp_path / "main.json").read_text()), expected)
+    merged = AggregateAccumulator.read_state(str(tmp_path / "merged.state.json"))
+    assert merged.count == 300
+
+    subprocess.run(
+        [sys.executable, "-m", "analysis.aggregate", *states, "-o", str(tmp_path / "cli.json")], check=True, cwd=ROOT
+    )
+    assert (tmp_path / "cli.json").read_bytes() == (tmp_path / "main.json").read_bytes()
@@ -0,0 +1,46 @@
+import sys
+
+import pytest
+
+from analysis import cli
+from analysis.pipeline import Pipeline
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+@pytest.fixture
+def odd_tags(tmp_path):
+    """A mapping whose MSD source has a blank and a numeric tag."""
+    (tmp_path / "msd.csv").write_text("track,artist,title,tag\nT1,Alpha,Beta,\nT2,Alpha,Gamma,3\n")
+    (tmp_path / "mapping.yaml").write_text(
+        f'categories:\n  music:\n    "1990": 2.0\nmsd_paths:\n  - "{tmp_path / "msd.csv"}"\n'
+    )
+    (tmp_path / "survey.csv").write_text("text,artist,song\nsongs of 1990,Alpha,Beta\n")
+    return tmp_path
+
+
+def test_blank_and_numeric_tags_are_written(odd_tags):
+    parquet, arrow = odd_tags / "out.parquet", odd_tags / "out.arrow"
+    Pipeline(str(odd_tags / "mapping.yaml")).run({
+        "input": str(odd_tags / "survey.csv"), "parquet": str(parquet), "arrow": str(arrow),
+    })
+    with pa.memory_map(str(arrow)) as source:
+        ipc = pa.ipc.open_file(source).read_all()
+    for table in (pq.read_table(str(parquet)), ipc):
+        matches = table.column("msd_matches").to_pylist()[0]
+        assert [(m["token"], m["tag"]) for m in matches] == [("alpha", None), ("alpha", "3.0"), ("beta", None)]
+        assert table.column("category_hits").to_pylist() == [[("music", [("1990", 1)])]]
+
+
+def test_cli_reports_errors_raised_inside_run(monkeypatch, capsys):
+    def run(self, args):
+        raise TypeError("writer failed")
+
+    monkeypatch.setattr(Pipeline, "run", run)
+    monkeypatch.setattr(sys, "argv", ["analysis.cli", "--input", "survey.csv"])
+    with pytest.raises(SystemExit):
+        cli.main()
+    err = capsys.readouterr().err
+    assert "TypeError: writer failed" in err
+    assert "args is required" not in err
@@ -0,0 +1,80 @@
+import json
+import math
+import random
+import sys
+
+import pytest
+
+from analysis.batch import profile_batch
+from analysis.io.jsonl import as_dict
+from analysis.pipeline import (
+    Pipeline,
+    build_correlation_matrix,
+    derive_personality_profile,
+    derive_preference_profile,
+    extract_feature_record,
+    feedback_adjust_preference,
+    load_csv,
+)
+from analysis.records import ScoreRecord
+
+TAGS = ["Rock", "rock", "JAZZ", "", None, float("nan"), "Folk", "Électro", 0]
+TOKENS = ["q5_a", "Q5_b", "artist", "song", "x"]
+TABLES = [{"a": 1}, "t"]
+
+
+def _same(a, b):
+    """Equal bit for bit on 3.11; 3.12+ sums floats with compensation (see analysis.batch)."""
+    if sys.version_info < (3, 12):
+        return repr(a) == repr(b)
+    if isinstance(a, dict):
+        return isinstance(b, dict) and list(a) == list(b) and all(_same(a[k], b[k]) for k in a)
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    if isinstance(a, float):
+        return (math.isnan(a) and math.isnan(b)) or math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-12)
+    return a == b
+
+
+def _rows(rnd, n):
+    features, scores, scenarios, matches = [], [], [], []
+    for _ in range(n):
+        words = " ".join(rnd.choice(["a", "bb", "Ccc", "dd", "A"]) for _ in range(rnd.randrange(0, 9)))
+        features.append(extract_feature_record(words))
+        scores.append(ScoreRecord(
+            rnd.choice([0.0, -0.0, 1.5, 2.25, float("nan"), float("inf"), 30.0]),
+            rnd.choice([0.0, -0.0, 3.3, float("nan"), float("-inf"), 0.7]),
+        ))
+        keys = rnd.sample(["Q5_b", "q5_a", "scen", "Q5_c"], rnd.randrange(0, 4))
+        scenarios.append({k: rnd.choice([0.0, 1.0, 2.5, -1.0, 0.3]) for k in keys})
+        matches.append([
+            {"tag": rnd.choice(TAGS), "weight": rnd.choice([1, 0.5, 0.021, 2.0, "0.75"]), "token": rnd.choice(TOKENS)}
+            for _ in range(rnd.randrange(0, 7))
+        ])
+    return features, scores, scenarios, matches
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_profile_batch_matches_per_row_functions(seed):
+    rnd = random.Random(seed)
+    features, scores, scenarios, matches = _rows(rnd, rnd.randrange(1, 200))
+    expected = []
+    for score, scenario, row_matches, feats in zip(scores, scenarios, matches, features):
+        preference = derive_preference_profile(score, scenario, row_matches, feats)
+        personality = derive_personality_profile(feats, score, preference)
+        adjusted = feedback_adjust_preference(preference, personality)
+        expected.append((adjusted, personality, build_correlation_matrix(adjusted, personality, TABLES)))
+    batch = profile_batch(features, scores, scenarios, matches)
+    got = list(zip(batch.preference_profiles(), batch.personality_profiles(), batch.correlations(TABLES)))
+    assert _same(got, expected)
+
+
+def test_process_frame_matches_process_row(corpus):
+    pipeline = Pipeline(corpus.mapping)
+    df = load_csv(corpus.survey)
+    expected = [as_dict(pipeline.process_row(i, row)) for i, row in df.iterrows()]
+    got = [as_dict(record) for record in pipeline.process_frame(df)]
+    if sys.version_info < (3, 12):
+        assert [json.dumps(r) for r in got] == [json.dumps(r) for r in expected]
+    else:
+        assert _same(got, expected)
@@ -0,0 +1,78 @@
+import random
+
+import pytest
+
+from analysis.benchmarks.corpus import write_mapping
+from analysis.fuzzy import TrigramIndex, _gram_codes
+from analysis.pipeline import Pipeline
+
+SYLLABLES = ["the", "ra", "dio", "head", "bo", "ston", "on", "ka", "mi", "lo", "ver", "an", "ne", "th"]
+
+
+def _scores(keys, token):
+    """Every key's Dice score against ``token``, best first, ties in key order."""
+    grams = set(_gram_codes(token))
+    scored = []
+    for position, key in enumerate(dict.fromkeys(keys)):
+        key_grams = set(_gram_codes(key))
+        scored.append((-2.0 * len(grams & key_grams) / (len(grams) + len(key_grams)), position, key))
+    return [(key, -score) for score, _, key in sorted(scored)]
+
+
+def _brute_force(scores, k, min_score):
+    return [(key, score) for key, score in scores if score >= min_score][:k]
+
+
+@pytest.fixture(scope="module")
+def keys():
+    rng = random.Random(0)
+    words = ["".join(rng.choices(SYLLABLES, k=rng.randint(1, 4))) for _ in range(3000)]
+    return [" ".join(rng.choices(words, k=rng.randint(1, 2))) for _ in range(4000)]
+
+
+def test_query_matches_brute_force(keys):
+    # common syllables make long posting lists, so DivideSkip prunes
+    index = TrigramIndex(keys)
+    rng = random.Random(1)
+    queries = [key[:-1] + "x" for key in rng.sample(keys, 60)] + rng.sample(keys, 20) + ["the", "zzz", "th"]
+    for token in queries:
+        scores = _scores(keys, token)
+        for min_score in (0.3, 0.5, 0.6, 0.8):
+            for k in (1, 5):
+                assert index.query(token, k=k, min_score=min_score) == _brute_force(scores, k, min_score)
+
+
+def test_threshold_is_inclusive():
+    index = TrigramIndex(["radiohead", "radio", "boston"])
+    score = dict(_scores(index.keys, "radiohed"))["radiohead"]
+    assert index.query("radiohed", min_score=score) == [("radiohead", score)]
+    assert index.query("radiohed", min_score=score + 1e-6) == []
+    assert index.query("zzzz", min_score=0.01) == []
+
+
+def test_ties_follow_key_order():
+    keys = ["abcx", "abcy", "abcz"]
+    forward = TrigramIndex(keys).query("abc", k=3, min_score=0.1)
+    assert [key for key, _ in forward] == keys
+    assert len({score for _, score in forward}) == 1
+    assert [key for key, _ in TrigramIndex(keys[::-1]).query("abc", k=2, min_score=0.1)] == ["abcz", "abcy"]
+
+
+def test_fuzzy_matches_are_reported_only_when_enabled(tmp_path, corpus):
+    msd = tmp_path / "msd.csv"
+    msd.write_text("track,artist,title,tag\nT1,Radiohead,Creep,Rock\nT2,Boston,More Than a Feeling,Rock\n")
+    survey = tmp_path / "survey.csv"
+    survey.write_text("text,artist,song\nI love it,Radiohed,Creep\n")
+    mapping = tmp_path / "mapping.yaml"
+    write_mapping(str(mapping), [str(msd)], [])
+    plain = Pipeline(str(mapping)).run({"input": str(survey)})[0].score.details["msd_matches"]
+    assert [m["token"] for m in plain] == ["creep"]
+    assert all("query" not in m and "score" not in m for m in plain)
+
+    with open(mapping, "a", encoding="utf-8") as fh:
+        fh.write("fuzzy_match: trigram\n")
+    matches = Pipeline(str(mapping)).run({"input": str(survey)})[0].score.details["msd_matches"]
+    fuzzy = [m for m in matches if "query" in m]
+    assert [(m["token"], m["query"]) for m in fuzzy] == [("radiohead", "radiohed")]
+    assert 0.6 <= fuzzy[0]["score"] < 1.0
+    assert [m for m in matches if "query" not in m] == plain
@@ -0,0 +1,58 @@
+import gzip
+import json
+
+import numpy as np
+import pytest
+
+from analysis.io.jsonl import JsonlWriter, as_dict
+from analysis.pipeline import Pipeline
+
+RECORDS = [
+    {"id": i, "text": f"zeile {i} – ü", "score": i / 7, "count": np.int64(i), "tags": {"rock": i % 3}}
+    for i in range(100)
+]
+EXPECTED = [{**r, "count": int(r["count"])} for r in RECORDS]
+
+
+def _read(path):
+    data = path.read_bytes()
+    if path.suffix == ".gz":
+        data = gzip.decompress(data)
+    elif path.suffix == ".zst":
+        zstandard = pytest.importorskip("zstandard")
+        data = zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return [json.loads(line) for line in data.decode("utf-8").splitlines()]
+
+
+@pytest.mark.parametrize("name", ["out.jsonl", "out.jsonl.gz", "out.jsonl.zst"])
+@pytest.mark.parametrize("encoder", ["auto", "json", "orjson"])
+def test_round_trip(tmp_path, name, encoder):
+    if name.endswith(".zst"):
+        pytest.importorskip("zstandard")
+    path = tmp_path / name
+    with JsonlWriter(str(path), encoder=encoder, batch_size=16) as writer:
+        for record in RECORDS:
+            writer.write(record)
+    assert _read(path) == EXPECTED
+
+
+def test_writes_are_batched_and_flushed_on_close(tmp_path):
+    path = tmp_path / "out.jsonl"
+    writer = JsonlWriter(str(path), batch_size=4)
+    batches = []
+    encode = writer._encode
+    writer._encode = lambda batch: batches.append(len(batch)) or encode(batch)
+    for record in RECORDS[:10]:
+        writer.write(record)
+    assert batches == [4, 4]
+    writer.close()
+    assert batches == [4, 4, 2]
+    assert _read(path) == EXPECTED[:10]
+    writer.close()
+
+
+def test_plain_output_is_the_baseline_format(tmp_path, corpus):
+    path = tmp_path / "out.jsonl"
+    results = Pipeline(corpus.mapping).run({"input": corpus.survey, "jsonl": str(path)})
+    baseline = "".join(json.dumps(as_dict(r), ensure_ascii=False) + "\n" for r in results)
+    assert path.read_bytes() == baseline.encode("utf-8")
@@ -0,0 +1,96 @@
+import io
+import json
+
+import pytest
+
+import analysis.io.jsonstream as jsonstream
+from analysis.io.jsonstream import iter_json_entries, iter_jsonl, load_json
+
+DOCUMENT = [{"track": "T1", "title": "Café\r\nNoir", "n": 12.5}, [1, 2, {"s": "😀\\u00e9"}], 3, "x", None, True]
+
+
+@pytest.fixture
+def small_buffer(monkeypatch):
+    """Make every value straddle buffer refills."""
+    monkeypatch.setattr(jsonstream, "_BUFFER_SIZE", 7)
+
+
+def _entries(path):
+    data = path.read_bytes()
+    out = []
+    for kind, value, offset, length in iter_json_entries(str(path)):
+        # the offsets locate the value's own bytes in the file
+        located = value[1] if kind == "pair" else value
+        assert json.loads(data[offset:offset + length]) == located
+        out.append((kind, value))
+    return out
+
+
+def test_array_items_are_located_in_the_file(tmp_path, small_buffer):
+    path = tmp_path / "doc.json"
+    path.write_bytes(json.dumps(DOCUMENT, ensure_ascii=False).replace(", ", ",\r\n ").encode("utf-8"))
+    assert _entries(path) == [("item", value) for value in DOCUMENT]
+    assert load_json(str(path)) == DOCUMENT
+
+
+def test_object_members_are_pairs(tmp_path, small_buffer):
+    path = tmp_path / "doc.json"
+    members = {"T1": "Rock", "Tü2": {"tag": "Pop"}, "T3": [1.5]}
+    path.write_text(json.dumps(members, ensure_ascii=False, indent=2), encoding="utf-8")
+    assert _entries(path) == [("pair", item) for item in members.items()]
+    assert load_json(str(path)) == members
+
+
+@pytest.mark.parametrize("text, value", [("[]", []), ("{ }", {}), (" 12.5 ", 12.5), ('"x"', "x")])
+def test_empty_containers_and_scalars(tmp_path, text, value):
+    path = tmp_path / "doc.json"
+    path.write_text(text)
+    assert load_json(str(path)) == value
+
+
+def test_jsonl_lines_are_located_in_the_file(tmp_path):
+    path = tmp_path / "doc.jsonl"
+    path.write_bytes(b'{"a": "\xc3\xa9"}\r\n\n  \n[1, 2]\n3')
+    data = path.read_bytes()
+    rows = list(iter_jsonl(str(path)))
+    assert [value for value, _, _ in rows] == [{"a": "é"}, [1, 2], 3]
+    assert [json.loads(data[offset:offset + length]) for _, offset, length in rows] == [{"a": "é"}, [1, 2], 3]
+    assert load_json(str(path)) == [{"a": "é"}, [1, 2], 3]
+
+
+def test_malformed_jsonl_names_the_line(tmp_path):
+    path = tmp_path / "doc.jsonl"
+    path.write_text('{"a": 1}\n{"a": }\n{"a": 3}\n')
+    with pytest.raises(ValueError, match="line 2"):
+        list(iter_jsonl(str(path)))
+
+
+@pytest.mark.parametrize("text, offset", [
+    ('[{"a": 1}, {"a": tru}, {"a": 2}]', 17),
+    ('[{"a": 1} {"a": 2}]', 10),
+    ('{"a": 1, 2: 3}', 9),
+    ('{"a" 1}', 5),
+])
+def test_malformed_json_fails_at_the_bad_token(tmp_path, small_buffer, text, offset):
+    path = tmp_path / "doc.json"
+    path.write_text(text)
+    with pytest.raises(ValueError, match=f"at byte {offset}:"):
+        list(iter_json_entries(str(path)))
+
+
+def test_malformed_json_is_not_read_to_the_end(monkeypatch, tmp_path):
+    path = tmp_path / "doc.json"
+    path.write_text('[{"a": 1}, {"a": tru}, ' + '{"a": 2}, ' * 200_000 + '{"a": 3}]')
+    reads = []
+
+    class CountingFile(io.StringIO):
+        def read(self, size=-1):
+            reads.append(size)
+            return super().read(size)
+
+    text = path.read_text()
+    monkeypatch.setattr(jsonstream, "open", lambda *args, **kwargs: CountingFile(text), raising=False)
+    monkeypatch.setattr(jsonstream, "_BUFFER_SIZE", 4096)
+    with pytest.raises(ValueError, match="at byte 17:"):
+        list(iter_json_entries(str(path)))
+    assert len(reads) == 1
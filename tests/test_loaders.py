@@ -0,0 +1,110 @@
+import gzip
+import threading
+
+import pandas as pd
+import pandas.api.types as ptypes
+import pytest
+
+from analysis.io.loaders import NUMERIC, iter_csv_frames, read_csv_columns, resolve_input_paths
+from analysis.pipeline import Pipeline
+
+HEADER = "respondent,text,artist,Q5_party,note\n"
+
+
+def _rows(start, stop):
+    return "".join(f"{i},text number {i},Artist {i % 7},{i % 5},n{i}\n" for i in range(start, stop))
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    """Three shards in a directory (one gzipped, plus files to skip) and the same rows in one file."""
+    shards = tmp_path / "shards"
+    (shards / "nested.csv").mkdir(parents=True)
+    (shards / "b.csv").write_text(HEADER + _rows(40, 90))
+    (shards / "a.csv").write_text(HEADER + _rows(0, 40))
+    with gzip.open(shards / "c.csv.gz", "wt") as fh:
+        fh.write(HEADER + _rows(90, 130))
+    (shards / "notes.txt").write_text("not an input\n")
+    single = tmp_path / "all.csv"
+    single.write_text(HEADER + _rows(0, 130))
+    return shards, single
+
+
+def _read(path, **kwargs):
+    frames = iter_csv_frames(resolve_input_paths(str(path)), **kwargs)
+    return pd.concat(list(frames), ignore_index=True)
+
+
+def test_directory_glob_and_file_agree(inputs):
+    shards, single = inputs
+    names = [p.rsplit("/", 1)[-1] for p in resolve_input_paths(str(shards))]
+    assert names == ["a.csv", "b.csv", "c.csv.gz"]
+    assert resolve_input_paths(str(shards / "*.csv*")) == resolve_input_paths(str(shards))
+    assert resolve_input_paths(str(single)) == [str(single)]
+    expected = _read(single)
+    pd.testing.assert_frame_equal(_read(shards), expected)
+    pd.testing.assert_frame_equal(_read(shards / "*.csv*", chunk_size=16), expected)
+    with pytest.raises(FileNotFoundError):
+        resolve_input_paths(str(shards / "*.tsv"))
+
+
+def test_pipeline_output_does_not_depend_on_the_input_form(tmp_path, inputs, corpus):
+    shards, single = inputs
+    outputs = []
+    for i, path in enumerate([single, shards, shards / "*.csv*"]):
+        out = tmp_path / f"out{i}.jsonl"
+        Pipeline(corpus.mapping).run({"input": str(path), "jsonl": str(out), "chunk_size": 32})
+        outputs.append(out.read_bytes())
+    assert outputs[0] and outputs[1] == outputs[0] and outputs[2] == outputs[0]
+
+
+@pytest.mark.parametrize("chunk_size", [None, 7])
+def test_selected_columns_are_projected_and_coerced(tmp_path, chunk_size):
+    path = tmp_path / "in.csv"
+    path.write_text("note,Q5_party,text,Q6\nx,1,hello,2\ny,3,world,often\nz,,again,4\n")
+    selector = {"text": "str", "Q5_party": NUMERIC, "Q6": NUMERIC}
+    df = pd.concat(list(read_csv_columns(str(path), lambda header: selector, chunk_size)), ignore_index=True)
+    # header order, unselected columns never read
+    assert df.columns.tolist() == ["Q5_party", "text", "Q6"]
+    assert ptypes.is_numeric_dtype(df["Q5_party"]) and df["Q5_party"].tolist()[:2] == [1, 3]
+    assert df["Q5_party"].isna().tolist() == [False, False, True]
+    # a stray text answer keeps the column as text instead of becoming NaN
+    assert df["Q6"].tolist() == ["2", "often", "4"]
+    assert df["text"].tolist() == ["hello", "world", "again"]
+
+
+def test_threaded_reader_keeps_file_order(tmp_path):
+    paths = []
+    for i, size in enumerate([5, 0, 23, 1, 40, 12, 7]):
+        path = tmp_path / f"part{i}.csv"
+        path.write_text(HEADER + _rows(100 * i, 100 * i + size))
+        paths.append(str(path))
+    serial = [df["respondent"].tolist() for df in iter_csv_frames(paths, chunk_size=4, threads=1)]
+    threaded = [df["respondent"].tolist() for df in iter_csv_frames(paths, chunk_size=4, threads=3)]
+    assert threaded == serial and len(serial) > len(paths)
+
+
+def _reader_threads():
+    return [t for t in threading.enumerate() if t.name.startswith("csv-reader")]
+
+
+def test_threaded_reader_stops_when_the_consumer_does(tmp_path):
+    paths = []
+    for i in range(6):
+        path = tmp_path / f"part{i}.csv"
+        path.write_text(HEADER + _rows(0, 200))
+        paths.append(str(path))
+    frames = iter_csv_frames(paths, chunk_size=5, threads=3)
+    assert len(next(frames)) == 5
+    frames.close()
+    assert _reader_threads() == []
+
+
+def test_threaded_reader_raises_reader_errors(tmp_path):
+    good = tmp_path / "good.csv"
+    good.write_text(HEADER + _rows(0, 10))
+    frames = iter_csv_frames([str(good), str(tmp_path / "missing.csv"), str(good)], threads=2)
+    assert len(next(frames)) == 10
+    with pytest.raises(FileNotFoundError):
+        next(frames)
+    assert _reader_threads() == []
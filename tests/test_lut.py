@@ -0,0 +1,38 @@
+import pandas as pd
+
+from analysis.lut import LutRegistry, table_signature, table_signatures
+
+
+def test_inline_signature_ignores_key_order_and_containers():
+    table = {"tension": {"rock": 0.5, "pop": 0.25}, "rows": [1, 2]}
+    reordered = {"rows": (1, 2), "tension": {"pop": 0.25, "rock": 0.5}}
+    assert table_signature(table) == table_signature(reordered)
+    assert table_signature(table) != table_signature({**table, "rows": [1, 3]})
+
+
+def test_inline_dataframe_signature_covers_every_row():
+    # str() of a large frame elides the middle rows
+    df = pd.DataFrame({"genre": [f"g{i}" for i in range(500)], "arousal": [0.5] * 500})
+    changed = df.copy()
+    changed.loc[250, "arousal"] = 0.75
+    assert table_signature(df) == table_signature(df.copy())
+    assert table_signature(df) != table_signature(changed)
+
+
+def test_registry_signatures_come_from_file_digests(tmp_path):
+    path = tmp_path / "lut.json"
+    path.write_text('{"tension": {"rock": 0.5}}')
+    registry = LutRegistry([str(path)])
+    assert table_signatures(registry) == registry.signatures
+    assert LutRegistry([str(path)]).signatures == registry.signatures
+    assert table_signatures(list(registry)) == [table_signature({"tension": {"rock": 0.5}})]
+
+
+def test_unreadable_file_becomes_an_error_table(tmp_path):
+    unreadable = tmp_path / "lut.json"
+    unreadable.mkdir()
+    registry = LutRegistry([str(unreadable)])
+    error = {"error": f"Failed to read {unreadable}"}
+    assert registry.tables[0].digest is None
+    assert list(registry) == [error]
+    assert registry.signatures == (table_signature(error),)
@@ -0,0 +1,59 @@
+import random
+
+from analysis.matching import KeywordMatcher
+from analysis.text import Vocabulary
+
+CATEGORIES = {
+    "psych": {"happy": 1.5, "Sad": 2.0, "heart break": 3.0, "lonely": 0.5},
+    "music": {"rock": 1.0, "ROCK": 0.25, "drum solo": 2.0, "drum": 0.5, "bass drum solo": 4.0},
+    "emotion": {"happy": 0.75, "heart": 1.0},
+}
+WORDS = ["happy", "Happy", "SAD", "heart", "Break", "drum", "Solo", "bass", "rock", "Rock", "lonely", "the", "a"]
+
+
+def _baseline(words, categories):
+    # the original per-keyword scan, extended to count phrases as runs of words
+    lower = [w.lower() for w in words]
+    details = {}
+    for cat, mapping in categories.items():
+        score, hits = 0.0, {}
+        for kw, weight in mapping.items():
+            parts = kw.lower().split()
+            count = sum(lower[i:i + len(parts)] == parts for i in range(len(lower) - len(parts) + 1))
+            if count:
+                score += count * float(weight)
+                hits[kw] = count
+        details[cat] = {"score": score, "hits": hits}
+    return details
+
+
+def test_matcher_matches_per_keyword_scan():
+    matcher = KeywordMatcher(CATEGORIES)
+    vocab = Vocabulary()
+    rng = random.Random(0)
+    texts = [[], ["drum", "solo"], ["Heart", "BREAK", "heart", "break"], ["bass", "drum", "solo", "drum", "Solo"]]
+    texts += [[rng.choice(WORDS) for _ in range(rng.randrange(1, 30))] for _ in range(300)]
+    for words in texts:
+        expected = _baseline(words, CATEGORIES)
+        assert matcher.match(words) == expected
+        assert matcher.match_ids(vocab.encode(words), vocab) == expected
+
+
+def test_details_keep_mapping_order_and_spelling():
+    details = KeywordMatcher(CATEGORIES).match("Rock rock and a drum solo Happy".split())
+    assert list(details) == ["psych", "music", "emotion"]
+    assert details["music"]["hits"] == {"rock": 2, "ROCK": 2, "drum solo": 1, "drum": 1}
+    assert details["music"]["score"] == 2 * 1.0 + 2 * 0.25 + 2.0 + 0.5
+    assert details["emotion"] == {"score": 0.75, "hits": {"happy": 1}}
+
+
+def test_keywords_are_not_added_to_the_vocabulary():
+    matcher = KeywordMatcher(CATEGORIES)
+    vocab = Vocabulary()
+    ids = vocab.encode(["the", "lonely", "drum"])
+    assert matcher.match_ids(ids, vocab)["psych"]["hits"] == {"lonely": 1}
+    assert sorted(vocab.tokens) == ["drum", "lonely", "the"]
+    # keywords a later text adds are picked up
+    ids = vocab.encode(["Bass", "drum", "solo", "sad"])
+    assert matcher.match_ids(ids, vocab)["music"]["hits"] == {"drum solo": 1, "drum": 1, "bass drum solo": 1}
+    assert vocab.get("heart") is None and vocab.get("break") is None
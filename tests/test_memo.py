@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from analysis.memo import LruMemo
+from analysis.pipeline import Pipeline
+
+
+@pytest.fixture
+def repeated(tmp_path, corpus):
+    """The corpus survey three times over: every text and lookup repeats."""
+    with open(corpus.survey, encoding="utf-8") as fh:
+        header, *rows = fh.readlines()
+    path = tmp_path / "repeated.csv"
+    path.write_text(header + "".join(rows * 3))
+    return corpus._replace(survey=str(path))
+
+
+def test_lru_evicts_least_recently_used_by_size():
+    memo = LruMemo(100)
+    memo.put("a", 1, 40)
+    memo.put("b", 2, 40)
+    assert memo.get("a") == 1
+    memo.put("c", 3, 40)
+    assert "b" not in memo and "a" in memo and "c" in memo
+    assert (memo.nbytes, memo.evictions) == (80, 1)
+    memo.put("huge", 4, 101)
+    assert "huge" not in memo
+    memo.resize(50)
+    assert len(memo) == 1 and "c" in memo
+
+
+def test_keys_are_admitted_on_second_sighting():
+    memo = LruMemo(1 << 20)
+    assert not memo.admit("text")
+    assert memo.admit("text")
+    assert not LruMemo(0).admit("text")
+
+
+@pytest.mark.parametrize("chunk_size", [None, 50])
+def test_memo_does_not_change_output(repeated, run_outputs, chunk_size):
+    expected = run_outputs(repeated, chunk_size=chunk_size, memo_size=0)
+    assert run_outputs(repeated, chunk_size=chunk_size) == expected
+    assert run_outputs(repeated, chunk_size=chunk_size, memo_size=0.01) == expected
+
+
+def test_second_run_is_served_from_memo(tmp_path, repeated, run_outputs):
+    pipeline = Pipeline(repeated.mapping)
+    profile = tmp_path / "profile.json"
+    first = run_outputs(repeated, pipeline, chunk_size=100, profile=str(profile))
+    counters = json.loads(profile.read_text())["counters"]
+    # each frame holds new texts: they are stored on their second sighting
+    # (a frame later) and served from the memo on their third
+    assert counters["text_memo_hits"] >= 300 and counters["msd_memo_hits"] >= 300
+    assert run_outputs(repeated, pipeline, chunk_size=100, profile=str(profile)) == first
+    counters = json.loads(profile.read_text())["counters"]
+    assert counters["text_memo_misses"] == counters["msd_memo_misses"] == 0
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from analysis.benchmarks.msd_ingest import legacy_load_msd_index
+from analysis.msd import load_msd_index
+
+ENTRIES = [
+    {"track": "TR001", "artist": "Alpha  Beta", "title": "Night Drive", "tag": "Rock", "weight": 1.0},
+    {"track": "TR002", "artist": "Alpha Beta", "title": "Home", "tag": "Pop", "weight": 0.5},
+    {"track": "TR003", "artist": "Gamma", "title": "night drive", "tag": "Jazz", "weight": 2.0},
+    {"track": "TR004", "artist": "Delta", "title": "Delta", "tag": "Folk", "weight": 1.0},
+]
+
+
+def _matches(index):
+    """``{token: matches}`` without the source paths, which differ by design."""
+    return {
+        token: [{k: v for k, v in match.items() if k != "path"} for match in index[token]["matches"]]
+        for token in index if token != "__errors__"
+    }
+
+
+def _write_table(path, sep):
+    fields = list(ENTRIES[0])
+    lines = [sep.join(fields)] + [sep.join(str(entry[f]) for f in fields) for entry in ENTRIES]
+    path.write_text("\n".join(lines) + "\n")
+
+
+@pytest.mark.parametrize("name, sep", [("msd.csv", ","), ("msd.tsv", "\t")])
+def test_table_sources_index_like_json(tmp_path, name, sep):
+    json_path = tmp_path / "msd.json"
+    json_path.write_text(json.dumps(ENTRIES))
+    table_path = tmp_path / name
+    _write_table(table_path, sep)
+    expected = _matches(load_msd_index([str(json_path)]))
+    assert "alpha beta" in expected and len(expected["night drive"]) == 2
+    assert _matches(load_msd_index([str(table_path)])) == expected
+
+
+def test_cls_source_indexes_like_json_mapping(tmp_path):
+    json_path = tmp_path / "msd.json"
+    json_path.write_text(json.dumps({e["track"]: e["tag"] for e in ENTRIES}))
+    cls_path = tmp_path / "msd.cls"
+    cls_path.write_text("# track tag\n" + "".join(f"{e['track']}\t{e['tag']}\n" for e in ENTRIES))
+    expected = _matches(load_msd_index([str(json_path)]))
+    assert expected["tr001"] == [{"tag": "Rock", "weight": 1.0, "raw": {"track": "TR001", "tag": "Rock"}}]
+    assert _matches(load_msd_index([str(cls_path)])) == expected
+
+
+def test_compact_index_matches_dict_index(corpus):
+    paths = [corpus.msd_cls, corpus.msd_csv]
+    legacy = legacy_load_msd_index(paths)
+    index = load_msd_index(paths)
+    assert set(index) == set(legacy)
+    for token, info in legacy.items():
+        assert index.get(token) == info
+    assert index.get("no such token") is None and "no such token" not in index
+
+
+def test_json_array_and_jsonl_sources_agree(tmp_path):
+    # non-ASCII text and CRLF line ends must not shift the re-read raw records
+    entries = ENTRIES + [{"track": "TR005", "artist": "Ünïcode 😀", "title": "Café\r\nLine", "tag": "Pop"}]
+    array_path = tmp_path / "msd.json"
+    array_path.write_bytes(json.dumps(entries, ensure_ascii=False, indent=1).replace("\n", "\r\n").encode("utf-8"))
+    jsonl_path = tmp_path / "msd.jsonl"
+    jsonl_path.write_text("\n".join(json.dumps(e, ensure_ascii=False) for e in entries) + "\n\n", encoding="utf-8")
+    expected = _matches(load_msd_index([str(array_path)]))
+    assert expected["ünïcode 😀"][0]["raw"] == entries[-1]
+    assert [m["raw"] for m in expected["night drive"]] == [ENTRIES[0], ENTRIES[2]]
+    assert _matches(load_msd_index([str(jsonl_path)])) == expected
+
+
+@pytest.mark.parametrize("text", ['[{"track": "T1", "tag": "Rock"}, {"track": tru}]', "[1, 2]", '{"T1": "Rock" "T2": "Pop"}'])
+def test_malformed_json_source_is_reported(tmp_path, text):
+    path = tmp_path / "msd.json"
+    path.write_text(text)
+    index = load_msd_index([str(path)])
+    assert index.get("__errors__") == {str(path): 1}
+    assert "t1" not in index
@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+import analysis.msd as msd
+from analysis.msd import CachedMsdIndex, MsdIndex
+
+ROWS = "track,artist,title,tag\nT1,Alpha,Beta,rock\nT2,Alpha,Gamma,pop\n,,,jazz\n"
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "msd.csv"
+    path.write_text(ROWS)
+    return path
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    """Paths re-parsed by ``CachedMsdIndex``."""
+    seen = []
+    read = msd._read_msd_source
+
+    def spy(path):
+        seen.append(path)
+        return read(path)
+
+    monkeypatch.setattr(msd, "_read_msd_source", spy)
+    return seen
+
+
+def _set_mtime(path, mtime_ns):
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_cache_matches_memory_index(tmp_path, source):
+    memory = MsdIndex.from_paths([str(source)])
+    cached = CachedMsdIndex(str(tmp_path / "cache.db"), [str(source)])
+    tokens = ["alpha", "beta", "t1", "missing"]
+    assert cached.get("alpha") == memory.get("alpha")
+    # the row without tokens still counts towards IDF
+    assert cached.document_count == memory.document_count == 3
+    assert cached.document_frequencies(tokens).tolist() == memory.document_frequencies(tokens).tolist()
+    assert "alpha" in cached and "missing" not in cached and 3 not in cached
+    assert cached.name_tokens() == memory.name_tokens()
+
+
+def test_warm_cache_is_not_reparsed(tmp_path, source, parses):
+    db = str(tmp_path / "cache.db")
+    CachedMsdIndex(db, [str(source)]).close()
+    assert len(parses) == 1
+    CachedMsdIndex(db, [str(source)]).close()
+    assert len(parses) == 1
+
+
+def test_touched_source_is_not_reparsed(tmp_path, source, parses):
+    db = str(tmp_path / "cache.db")
+    CachedMsdIndex(db, [str(source)]).close()
+    _set_mtime(source, os.stat(source).st_mtime_ns + 10**9)
+    index = CachedMsdIndex(db, [str(source)])
+    assert len(parses) == 1
+    assert index.get("beta")["matches"][0]["tag"] == "rock"
+
+
+def test_resized_source_is_rebuilt(tmp_path, source, parses):
+    db = str(tmp_path / "cache.db")
+    CachedMsdIndex(db, [str(source)]).close()
+    source.write_text(ROWS + "T3,Delta,Beta,metal\n")
+    index = CachedMsdIndex(db, [str(source)])
+    assert len(parses) == 2
+    assert [m["tag"] for m in index.get("beta")["matches"]] == ["rock", "metal"]
+    assert index.document_count == 4
+
+
+def test_changed_content_of_same_size_is_rebuilt(tmp_path, source, parses):
+    db = str(tmp_path / "cache.db")
+    CachedMsdIndex(db, [str(source)]).close()
+    mtime_ns = os.stat(source).st_mtime_ns
+    source.write_text(ROWS.replace("rock", "folk"))
+    _set_mtime(source, mtime_ns + 10**9)
+    index = CachedMsdIndex(db, [str(source)])
+    assert len(parses) == 2
+    assert index.get("beta")["matches"][0]["tag"] == "folk"
@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+from analysis.msd import MsdIndex, lookup_msd, lookup_msd_batch, lookup_tokens, select_lyric_tokens
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def index(corpus):
+    return MsdIndex.from_paths([corpus.msd_cls, corpus.msd_csv])
+
+
+def test_tokens_are_artist_song_then_lyrics(tmp_path):
+    path = tmp_path / "msd.csv"
+    path.write_text("track,artist,title,tag\nT1,Zeta,Alpha,rock\nT2,Beta,Home,pop\nT3,Gamma,Night,jazz\n")
+    index = MsdIndex.from_paths([str(path)])
+    tokens = lookup_tokens("Zeta", "Alpha", "night falls at home", index)
+    assert [token for token, _ in tokens] == ["zeta", "alpha", "night", "home"]
+
+
+def test_batch_lookup_matches_per_row_lookup(corpus, index):
+    df = pd.read_csv(corpus.survey)
+    artists, songs, lyrics = df["artist"].tolist(), df["song"].tolist(), df["text"].tolist()
+    batch = lookup_msd_batch(artists, songs, lyrics, index)
+    assert sum(map(len, batch)) > 0
+    for i, row in enumerate(zip(artists, songs, lyrics)):
+        assert batch[i] == lookup_msd(*row, index)
+
+
+def test_output_does_not_depend_on_hash_seed(tmp_path, corpus):
+    script = (
+        "import sys; from analysis.pipeline import Pipeline; "
+        "Pipeline(sys.argv[1]).run({'input': sys.argv[2], 'jsonl': sys.argv[3]})"
+    )
+    outputs = []
+    for seed in ("1", "2"):
+        out = tmp_path / f"seed-{seed}.jsonl"
+        env = dict(os.environ, PYTHONHASHSEED=seed)
+        subprocess.run(
+            [sys.executable, "-c", script, corpus.mapping, corpus.survey, str(out)], check=True, cwd=ROOT, env=env
+        )
+        outputs.append(out.read_bytes())
+    assert outputs[0] == outputs[1]
+
+
+def test_lyric_words_are_taken_rarest_first_within_budget():
+    candidates = ["the", "night", "zzz", "home", "city", "road"]
+    frequencies = [60, 3, 0, 1, 3, 2]
+    assert select_lyric_tokens(candidates, frequencies) == ["home", "road", "night", "city"]
+    assert select_lyric_tokens(candidates, frequencies, limit=2) == ["home", "road"]
+    # "night" (3) would take the row past 5 matches
+    assert select_lyric_tokens(candidates, frequencies, max_matches=5) == ["home", "road"]
+
+
+def test_common_lyric_words_do_not_fan_out(tmp_path):
+    rows = ["track,artist,title,tag"]
+    rows += [f"C{i},Artist {i},The,rock" for i in range(60)]
+    rows += ["R1,Someone,Winter,jazz", "R2,Other,Winter,folk"]
+    path = tmp_path / "msd.csv"
+    path.write_text("\n".join(rows) + "\n")
+    index = MsdIndex.from_paths([str(path)])
+    tokens = lookup_tokens(None, None, "the long winter", index)
+    assert tokens == [("winter", None)]
+    matches = lookup_msd(None, None, "the long winter", index, lyric_max_matches=100)
+    assert [m["token"] for m in matches] == ["winter", "winter", "the"] + ["the"] * 59
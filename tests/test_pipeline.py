@@ -0,0 +1,23 @@
+import pytest
+
+from analysis.io.jsonl import as_dict
+from analysis.pipeline import Pipeline, load_csv, result_model
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 128])
+def test_chunked_run_matches_whole_input(corpus, run_outputs, chunk_size):
+    assert run_outputs(corpus, chunk_size=chunk_size) == run_outputs(corpus)
+
+
+def test_record_dict_matches_result_model(corpus):
+    records = Pipeline(corpus.mapping).process_frame(load_csv(corpus.survey))
+    assert len(records) == 300
+    for record in records:
+        assert as_dict(result_model(record)) == record.dict()
+
+
+@pytest.mark.parametrize("workers", [2, 3])
+def test_workers_match_serial_run(corpus, run_outputs, workers):
+    serial = run_outputs(corpus, chunk_size=40)
+    assert run_outputs(corpus, chunk_size=40, workers=workers) == serial
+    assert run_outputs(corpus, workers=workers) == run_outputs(corpus)
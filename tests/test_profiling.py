@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from analysis.pipeline import Pipeline
+
+STAGES = {
+    "read_input", "extract_features", "score_mapping", "scenario_vector", "lookup_msd", "profiles",
+    "correlations", "result_cache", "validate", "write_jsonl", "aggregate", "write_html",
+}
+COUNTERS = {"rows_processed", "msd_rows_matched", "msd_matches", "result_cache_hits", "result_cache_misses"}
+
+
+@pytest.mark.parametrize("chunk_size", [None, 64])
+def test_profile_reports_stages_and_counters(tmp_path, corpus, chunk_size):
+    path = tmp_path / "profile.json"
+    Pipeline(corpus.mapping).run({
+        "input": corpus.survey,
+        "jsonl": str(tmp_path / "out.jsonl"),
+        "aggregate": str(tmp_path / "aggregate.json"),
+        "html": str(tmp_path / "report.html"),
+        "validate": True,
+        "result_cache": str(tmp_path / "results.db"),
+        "chunk_size": chunk_size,
+        "profile": str(path),
+    })
+    profile = json.loads(path.read_text())
+    assert {"rows", "wall_s", "rows_per_s", "input", "workers", "unattributed_s"} <= set(profile)
+    assert profile["rows"] == 300 and profile["input"] == corpus.survey and profile["workers"] == 1
+    assert STAGES <= set(profile["stages"])
+    for stage in profile["stages"].values():
+        assert set(stage) == {"seconds", "calls", "share"}
+        assert stage["seconds"] >= 0 and stage["calls"] > 0
+    assert sum(stage["share"] for stage in profile["stages"].values()) <= 1.0 + 1e-9
+    counters = profile["counters"]
+    assert COUNTERS <= set(counters)
+    assert counters["rows_processed"] == counters["result_cache_misses"] == 300
+    assert counters["result_cache_hits"] == 0
+    assert 0 < counters["msd_rows_matched"] <= 300 <= counters["msd_matches"]
@@ -0,0 +1,26 @@
+import os
+
+from analysis.pipeline import Pipeline
+
+
+def _pages(tmp_path):
+    return sorted(os.listdir(tmp_path / "report.pages"))
+
+
+def test_paginated_report_streams_without_chunks(tmp_path, corpus):
+    html = str(tmp_path / "report.html")
+    results = Pipeline(corpus.mapping).run({"input": corpus.survey, "html": html, "html_page_size": 100})
+    assert results == []
+    assert _pages(tmp_path) == ["page-00001.html", "page-00002.html", "page-00003.html"]
+    with open(html, encoding="utf-8") as fh:
+        assert "report.pages/page-00003.html" in fh.read()
+
+
+def test_shorter_report_removes_stale_pages(tmp_path, corpus):
+    html = str(tmp_path / "report.html")
+    pipeline = Pipeline(corpus.mapping)
+    pipeline.run({"input": corpus.survey, "html": html, "html_page_size": 50})
+    assert len(_pages(tmp_path)) == 6
+    (tmp_path / "report.pages" / "notes.txt").write_text("kept")
+    pipeline.run({"input": corpus.survey, "html": html, "html_page_size": 150})
+    assert _pages(tmp_path) == ["notes.txt", "page-00001.html", "page-00002.html"]
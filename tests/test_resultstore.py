@@ -0,0 +1,72 @@
+import pytest
+
+import analysis.pipeline as pipeline_module
+from analysis.pipeline import Pipeline
+from analysis.resultstore import ResultStore
+
+
+@pytest.fixture
+def stores(monkeypatch):
+    """The result stores opened by runs, in order."""
+    opened = []
+
+    class Store(ResultStore):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            opened.append(self)
+
+    monkeypatch.setattr(pipeline_module, "ResultStore", Store)
+    return opened
+
+
+def _run(corpus, tmp_path, name, stores):
+    out = tmp_path / name
+    out.mkdir()
+    Pipeline(corpus.mapping).run({
+        "input": corpus.survey,
+        "jsonl": str(out / "out.jsonl"),
+        "result_cache": str(tmp_path / "results.db"),
+    })
+    return (out / "out.jsonl").read_bytes(), stores[-1].hits, stores[-1].misses
+
+
+def test_warm_run_reads_every_row_back(tmp_path, own_corpus, stores):
+    cold, hits, misses = _run(own_corpus, tmp_path, "cold", stores)
+    assert (hits, misses) == (0, 300)
+    warm, hits, misses = _run(own_corpus, tmp_path, "warm", stores)
+    assert (hits, misses) == (300, 0)
+    assert warm == cold
+
+
+def test_changed_row_is_recomputed(tmp_path, own_corpus, stores):
+    _run(own_corpus, tmp_path, "cold", stores)
+    with open(own_corpus.survey, encoding="utf-8") as fh:
+        lines = fh.readlines()
+    respondent, rest = lines[5].split(",", 1)
+    lines[5] = f"{respondent},happy {rest}"
+    with open(own_corpus.survey, "w", encoding="utf-8") as fh:
+        fh.writelines(lines)
+    _, hits, misses = _run(own_corpus, tmp_path, "edited", stores)
+    assert (hits, misses) == (299, 1)
+
+
+@pytest.mark.parametrize("source", ["lut_json", "lut_csv", "msd_csv", "mapping"])
+def test_changed_config_or_source_invalidates(tmp_path, own_corpus, stores, source):
+    _run(own_corpus, tmp_path, "cold", stores)
+    with open(getattr(own_corpus, source), "a", encoding="utf-8") as fh:
+        fh.write({
+            "lut_json": " ",
+            "lut_csv": "extra,0.5,0.5\n",
+            "msd_csv": "TRX,Someone,Something,Rock,0.5\n",
+            "mapping": "scenario_weights:\n  Q5_party: 2.0\n",
+        }[source])
+    _, hits, misses = _run(own_corpus, tmp_path, "changed", stores)
+    assert (hits, misses) == (0, 300)
+
+
+def test_unreadable_file_has_a_placeholder_digest(tmp_path):
+    store = ResultStore(str(tmp_path / "results.db"))
+    (tmp_path / "lut.json").mkdir()
+    assert store.file_digest(str(tmp_path / "lut.json")) == "unreadable"
+    assert store.file_digest(str(tmp_path / "missing.json")) == "missing"
+    store.close()
@@ -0,0 +1,43 @@
+import json
+import math
+
+import pandas as pd
+
+from analysis.pipeline import Pipeline, build_scenario_vector
+from analysis.schema import InputSchema
+
+FRAME = pd.DataFrame({
+    "text": ["a", "b", "c"],
+    "Q5_party": [3.0, float("nan"), 1.0],
+    "study_scenario": [1.0, 2.0, float("nan")],
+})
+
+
+def test_blank_detected_answers_are_dropped():
+    vectors = InputSchema(FRAME.columns).scenario_vectors(FRAME)
+    assert vectors == [
+        {"Q5_party": 3.0, "study_scenario": 1.0},
+        {"study_scenario": 2.0},
+        {"Q5_party": 1.0},
+    ]
+    assert vectors == [build_scenario_vector(row, {}) for _, row in FRAME.iterrows()]
+
+
+def test_blank_configured_answers_fall_back_to_weights():
+    weights = {"Q5_party": 1.5, "Q5_missing": 0.5}
+    vectors = InputSchema(FRAME.columns, weights).scenario_vectors(FRAME)
+    assert vectors == [
+        {"Q5_party": 3.0, "Q5_missing": 0.5},
+        {"Q5_party": 1.5, "Q5_missing": 0.5},
+        {"Q5_party": 1.0, "Q5_missing": 0.5},
+    ]
+    assert vectors == [build_scenario_vector(row, weights) for _, row in FRAME.iterrows()]
+
+
+def test_blank_answer_leaves_normalised_vector_finite(tmp_path):
+    (tmp_path / "survey.csv").write_text("text,Q5_party,Q5_study\nhappy,,2\n")
+    out = tmp_path / "out.jsonl"
+    Pipeline().run({"input": str(tmp_path / "survey.csv"), "jsonl": str(out)})
+    vector = json.loads(out.read_text())["score"]["preference_profile"]["scenario_vector"]
+    assert vector == {"Q5_study": 1.0}
+    assert all(math.isfinite(v) for v in vector.values())
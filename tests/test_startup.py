@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFERRED = ["jinja2", "yaml", "pyarrow", "sqlite3", "orjson", "zstandard", "multiprocessing", "concurrent.futures"]
+
+
+def test_import_defers_optional_modules():
+    # pandas itself may import some of these; only what the package adds counts
+    script = (
+        "import sys; import numpy, pandas, pydantic; before = set(sys.modules); "
+        "import analysis.pipeline; print(' '.join(sorted(set(sys.modules) - before)))"
+    )
+    out = subprocess.run([sys.executable, "-c", script], check=True, cwd=ROOT, capture_output=True, text=True)
+    added = out.stdout.split()
+    assert "analysis.pipeline" in added
+    assert [name for name in DEFERRED if name in added] == []
@@ -0,0 +1,50 @@
+import threading
+
+import analysis.pipeline as pipeline_module
+from analysis.pipeline import Pipeline
+from analysis.text import Vocabulary, current_vocabulary
+
+
+def test_configure_starts_a_new_vocabulary(corpus):
+    pipeline = Pipeline(corpus.mapping)
+    records = pipeline.process_frame(pipeline_module.load_csv(corpus.survey).head(20))
+    words = [r.features.words for r in records]
+    old = pipeline.vocab
+    assert current_vocabulary() is old and len(old)
+    pipeline.configure(corpus.mapping)
+    assert pipeline.vocab is not old and current_vocabulary() is pipeline.vocab
+    assert len(pipeline.vocab) < len(old)
+    # records made earlier keep decoding through their own vocabulary
+    assert [r.features.words for r in records] == words
+
+
+def test_vocabulary_is_bounded_across_frames(corpus, run_outputs, monkeypatch):
+    unbounded = run_outputs(corpus, chunk_size=25)
+    monkeypatch.setattr(pipeline_module, "MAX_VOCABULARY", 40)
+    pipeline = Pipeline(corpus.mapping)
+    first = pipeline.vocab
+    assert run_outputs(corpus, pipeline, chunk_size=25) == unbounded
+    assert pipeline.vocab is not first
+
+
+def test_vocabulary_grows_consistently_from_threads():
+    vocab = Vocabulary()
+    words = [f"{case}{i % 500}" for i in range(4000) for case in ("Word", "word", "WORD")]
+    barrier = threading.Barrier(4)
+    results = []
+
+    def encode(offset):
+        barrier.wait()
+        results.append((offset, vocab.encode(words[offset:] + words[:offset]).tolist()))
+
+    threads = [threading.Thread(target=encode, args=(offset,)) for offset in (0, 7, 1500, 3001)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(vocab) == len(set(words)) == len(set(vocab.tokens))
+    for offset, ids in results:
+        assert vocab.decode(ids) == words[offset:] + words[:offset]
+    for tid, token in enumerate(vocab.tokens):
+        assert vocab.get(token) == tid and vocab.tokens[vocab.lower[tid]] == token.lower()
+    assert vocab.get("unseen") is None and "unseen" not in vocab.tokens